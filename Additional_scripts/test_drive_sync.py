@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test Drive folder import and incremental sync against the in-memory fake Drive.
+
+Imports a folder tree into a throwaway course, then checks that a sync with
+no changes does nothing and that renames, moves, trashed files and a
+permanently deleted folder are applied. Everything runs in one transaction
+that is rolled back at the end, so the database is left untouched.
+"""
+import sys
+import uuid
+from yonca import create_app
+from yonca.models import db, User, Course, CourseContent, CourseContentFolder, DriveFolderSync
+from yonca.fake_drive import FakeDriveService
+from yonca.google_drive_service import import_drive_folder
+from yonca.course_content_service import import_drive_folder_to_course
+from yonca.drive_sync import sync_drive_folder
+
+app = create_app()
+failures = []
+
+
+def check(description, condition):
+    print(f"   {'✓' if condition else '✗'} {description}")
+    if not condition:
+        failures.append(description)
+
+
+def add_pdf(drive, name, parent):
+    # Distinct content so the import does not deduplicate files against each other
+    return drive.add_file(name, parent=parent, content=f"{name} {uuid.uuid4()}".encode())
+
+
+def course_items(course):
+    """Map each content title to the title of its folder"""
+    return {
+        content.title: content.folder.title
+        for content in CourseContent.query.filter_by(course_id=course.id)
+    }
+
+
+def course_folders(course):
+    return {folder.title for folder in CourseContentFolder.query.filter_by(course_id=course.id)}
+
+
+with app.app_context():
+    try:
+        suffix = uuid.uuid4().hex[:8]
+        user = User(username=f"drive_sync_test_{suffix}", password='unused')
+        course = Course(title=f"Drive sync test {suffix}")
+        db.session.add_all([user, course])
+        db.session.flush()
+
+        drive = FakeDriveService()
+        root = drive.add_folder('Course Folder')
+        sub = drive.add_folder('Week 1', parent=root)
+        old = drive.add_folder('Archive', parent=root)
+        gone = drive.add_folder('Drafts', parent=root)
+        intro = add_pdf(drive, 'intro.pdf', root)
+        notes = add_pdf(drive, 'notes.pdf', sub)
+        old_notes = add_pdf(drive, 'old_notes.pdf', old)
+        add_pdf(drive, 'draft.pdf', gone)
+
+        # 1. Import
+        print("\n1. Importing the Drive folder...")
+        folder_data = import_drive_folder(drive, root, user_id=user.id)
+        root_folder_id, imported_count = import_drive_folder_to_course(course, folder_data, user, is_published=True)
+        db.session.flush()
+        sync = DriveFolderSync.query.filter_by(folder_id=root_folder_id).first()
+        check("4 files imported", imported_count == 4)
+        check("folder tree recreated", course_folders(course) == {'Course Folder', 'Week 1', 'Archive', 'Drafts'})
+        check("files placed in their folders", course_items(course) == {
+            'intro.pdf': 'Course Folder', 'notes.pdf': 'Week 1',
+            'old_notes.pdf': 'Archive', 'draft.pdf': 'Drafts',
+        })
+        check("sync registered", sync is not None and sync.drive_root_id == root)
+
+        # 2. Sync without changes
+        print("\n2. Syncing without changes...")
+        drive.request_count = 0
+        stats = sync_drive_folder(drive, sync)
+        check("no changes seen", stats == {'changes': 0, 'added': 0, 'updated': 0, 'removed': 0})
+        check("only the Changes API was called", drive.request_count == 1)
+
+        # 3. Rename, move, trash, permanent delete and a new file
+        print("\n3. Syncing rename, move, trash and delete...")
+        drive.rename(intro, 'introduction.pdf')
+        drive.move(notes, root)
+        drive.trash(old_notes)
+        drive.delete(gone)
+        add_pdf(drive, 'homework.pdf', sub)
+        stats = sync_drive_folder(drive, sync)
+        db.session.flush()
+        print(f"   Stats: {stats}")
+        items = course_items(course)
+        check("renamed file has its new title", items.get('introduction.pdf') == 'Course Folder' and 'intro.pdf' not in items)
+        check("moved file is in its new folder", items.get('notes.pdf') == 'Course Folder')
+        check("trashed file removed", 'old_notes.pdf' not in items)
+        check("deleted folder removed with its file", 'Drafts' not in course_folders(course) and 'draft.pdf' not in items)
+        check("new file added", items.get('homework.pdf') == 'Week 1')
+        check("emptied folder kept", 'Archive' in course_folders(course))
+
+        # 4. Nothing left to apply
+        print("\n4. Syncing again...")
+        stats = sync_drive_folder(drive, sync)
+        check("no changes left", stats['changes'] == 0)
+    finally:
+        db.session.rollback()
+
+print(f"\n{'All checks passed' if not failures else f'{len(failures)} check(s) failed'}")
+sys.exit(1 if failures else 0)
@@ -5,7 +5,11 @@ bind = "127.0.0.1:8000"
 
 # Worker processes
 workers = 3
-worker_class = "sync"
+# Threaded workers so open forum event streams (/api/forum/stream) don't tie up a whole process.
+# Each stream holds one thread; FORUM_STREAM_MAX_SUBSCRIBERS (default 8) caps streams per worker
+# so the remaining threads stay free for normal traffic. Clients over the cap fall back to polling.
+worker_class = "gthread"
+threads = 16
 
 # Timeout settings
 # Increased timeout for large file uploads (10 minutes)
@@ -37,3 +41,25 @@ limit_request_field_size = 8190
 # Allow large file uploads (500MB max)
 max_requests = 1000
 max_requests_jitter = 50
+
+# Prometheus metrics (yonca/metrics.py)
+# With PROMETHEUS_MULTIPROC_DIR set, workers share samples through files in that
+# directory: start from an empty directory and drop the live gauges of dead workers.
+import os
+import shutil
+
+
+def on_starting(server):
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,26 @@
+"""Add preview_variants to Resource
+
+Revision ID: a7c3e91d2b40
+Revises: 975d518e8069
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e91d2b40'
+down_revision = '975d518e8069'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('resource', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('resource', schema=None) as batch_op:
+        batch_op.drop_column('preview_variants')
@@ -0,0 +1,41 @@
+"""Add file_hash table for upload deduplication
+
+Revision ID: b3f8d2a61c57
+Revises: a7c3e91d2b40
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f8d2a61c57'
+down_revision = 'a7c3e91d2b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('file_hash',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('md5', sa.String(length=32), nullable=True),
+        sa.Column('drive_file_id', sa.String(length=100), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('file_hash', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_file_hash_sha256'), ['sha256'], unique=False)
+        batch_op.create_index(batch_op.f('ix_file_hash_md5'), ['md5'], unique=False)
+        batch_op.create_index(batch_op.f('ix_file_hash_drive_file_id'), ['drive_file_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('file_hash', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_file_hash_drive_file_id'))
+        batch_op.drop_index(batch_op.f('ix_file_hash_md5'))
+        batch_op.drop_index(batch_op.f('ix_file_hash_sha256'))
+
+    op.drop_table('file_hash')
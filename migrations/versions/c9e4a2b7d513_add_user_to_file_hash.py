@@ -0,0 +1,30 @@
+"""Add owning user to file_hash
+
+Revision ID: c9e4a2b7d513
+Revises: a7d2e9c4f1b8
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e4a2b7d513'
+down_revision = 'a7d2e9c4f1b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('file_hash', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_file_hash_user_id'), ['user_id'], unique=False)
+        batch_op.create_foreign_key('fk_file_hash_user_id_user', 'user', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('file_hash', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_file_hash_user_id_user', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_file_hash_user_id'))
+        batch_op.drop_column('user_id')
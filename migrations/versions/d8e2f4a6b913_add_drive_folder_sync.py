@@ -0,0 +1,54 @@
+"""Add drive_folder_sync table and Drive source ids on course content
+
+Revision ID: d8e2f4a6b913
+Revises: c5a1e7f94d20
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e2f4a6b913'
+down_revision = 'c5a1e7f94d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('drive_folder_sync',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('course_id', sa.Integer(), nullable=False),
+        sa.Column('folder_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('drive_root_id', sa.String(length=100), nullable=False),
+        sa.Column('page_token', sa.String(length=200), nullable=False),
+        sa.Column('publish_new_items', sa.Boolean(), nullable=True),
+        sa.Column('last_synced_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+        sa.ForeignKeyConstraint(['folder_id'], ['course_content_folder.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('folder_id')
+    )
+    with op.batch_alter_table('course_content', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('source_drive_file_id', sa.String(length=100), nullable=True))
+        batch_op.create_index(batch_op.f('ix_course_content_source_drive_file_id'), ['source_drive_file_id'], unique=False)
+
+    with op.batch_alter_table('course_content_folder', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('drive_folder_id', sa.String(length=100), nullable=True))
+        batch_op.create_index(batch_op.f('ix_course_content_folder_drive_folder_id'), ['drive_folder_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('course_content_folder', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_course_content_folder_drive_folder_id'))
+        batch_op.drop_column('drive_folder_id')
+
+    with op.batch_alter_table('course_content', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_course_content_source_drive_file_id'))
+        batch_op.drop_column('source_drive_file_id')
+
+    op.drop_table('drive_folder_sync')
@@ -0,0 +1,28 @@
+"""Add indexes for paginated forum thread loading
+
+Revision ID: e4b7c1d9a2f6
+Revises: d8e2f4a6b913
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c1d9a2f6'
+down_revision = 'd8e2f4a6b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('forum_message', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_forum_message_parent_id'), ['parent_id'], unique=False)
+        batch_op.create_index('idx_forum_message_thread_page', ['channel', 'parent_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('forum_message', schema=None) as batch_op:
+        batch_op.drop_index('idx_forum_message_thread_page')
+        batch_op.drop_index(batch_op.f('ix_forum_message_parent_id'))
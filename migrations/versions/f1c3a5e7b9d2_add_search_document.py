@@ -0,0 +1,43 @@
+"""Add search_document table for full-text search
+
+Revision ID: f1c3a5e7b9d2
+Revises: e4b7c1d9a2f6
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c3a5e7b9d2'
+down_revision = 'e4b7c1d9a2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_document',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(length=50), nullable=False),
+    sa.Column('content_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.Text(), nullable=True),
+    sa.Column('tags', sa.Text(), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('search_vector', sa.Text().with_variant(postgresql.TSVECTOR(), 'postgresql'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_type', 'content_id', name='uq_search_document_content')
+    )
+    with op.batch_alter_table('search_document', schema=None) as batch_op:
+        batch_op.create_index('idx_search_document_vector', ['search_vector'], unique=False, postgresql_using='gin')
+
+    # Existing resources and courses are indexed by running rebuild_search_index.py
+
+
+def downgrade():
+    with op.batch_alter_table('search_document', schema=None) as batch_op:
+        batch_op.drop_index('idx_search_document_vector', postgresql_using='gin')
+
+    op.drop_table('search_document')
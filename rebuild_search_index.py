@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Script to (re)build the full-text search index for resources and courses
+Usage: python rebuild_search_index.py
+
+New and edited items are indexed automatically; run this once after the
+search_document migration, or whenever the index needs rebuilding.
+"""
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env
+load_dotenv()
+
+from yonca import create_app
+from yonca.search_index import rebuild_search_index
+
+def main():
+    """Main function"""
+    config_name = os.environ.get('FLASK_ENV', 'production')
+    app = create_app(config_name)
+
+    with app.app_context():
+        print("Rebuilding search index...")
+        total = rebuild_search_index()
+        print(f"Indexed {total} resources and courses.")
+
+if __name__ == "__main__":
+    main()
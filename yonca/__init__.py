@@ -4,9 +4,8 @@ Application factory and initialization
 from flask import Flask, request, redirect, url_for, jsonify
 from flask_login import LoginManager
 from flask_cors import CORS
-from flask_session import Session
 from flask_babel import Babel
-from yonca.config import config
+from yonca.config import config, engine_options
 from yonca.models import db, User, Course, ForumMessage, ForumChannel, Resource, PDFDocument, TaviTest, HomeContent, Translation
 from flask_migrate import Migrate
 from yonca.admin import init_admin
@@ -17,6 +16,9 @@ import os
 import psycopg2
 from urllib.parse import urlparse
 import logging
+from yonca.log import configure_logging
+
+logger = logging.getLogger(__name__)
 
 def create_database_if_not_exists(database_url):
     """Create PostgreSQL database if it doesn't exist"""
@@ -39,8 +41,13 @@ def create_database_if_not_exists(database_url):
     except Exception as e:
         print(f"Error creating database: {e}")
 
-def create_app(config_name='development'):
-    """Create and configure Flask application"""
+def create_app(config_name='development', process_role='web'):
+    """
+    Create and configure Flask application
+
+    process_role selects the database pool settings: 'web' for request
+    handling, 'worker' for the background job worker's own app.
+    """
     # Get the package directory
     package_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(package_dir)
@@ -49,16 +56,30 @@ def create_app(config_name='development'):
     
     app = Flask(__name__, static_folder=static_dir, static_url_path='/static', template_folder=template_dir)
     
-    # Configure logging
-    logging.basicConfig(level=logging.INFO)
-    
     # Load configuration
     app.config.from_object(config[config_name])
+
+    # Structured, leveled logging (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_SAMPLE_RATES)
+    configure_logging(app)
+    app.config['PROCESS_ROLE'] = process_role
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config, process_role))
     
     # Create PostgreSQL database if it doesn't exist
     # if 'postgresql' in app.config['SQLALCHEMY_DATABASE_URI']:
     #     create_database_if_not_exists(app.config['SQLALCHEMY_DATABASE_URI'])
     
+    # Prometheus counters and histograms, scraped at /metrics
+    from yonca.metrics import init_metrics
+    init_metrics(app)
+
+    # Count queries and time DB/template/external work per request (Server-Timing header)
+    from yonca.request_timing import init_request_timing
+    init_request_timing(app)
+
+    # Send read-only queries to DATABASE_REPLICA_URL when one is configured
+    from yonca.db_routing import init_replica_routing
+    init_replica_routing(app)
+
     # Initialize extensions
     db.init_app(app)
     migrate = Migrate(app, db)
@@ -73,9 +94,13 @@ def create_app(config_name='development'):
             return jsonify({'error': 'Authentication required'}), 401
         return redirect(url_for('auth.login'))
     
+    # Signed-in users come from a short-lived cache of their id, name and roles
+    from yonca.user_principal import user_principal_cache
+    user_principal_cache.init_app(app)
+    
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        return user_principal_cache.load(user_id)
     
     # Initialize Babel for internationalization
     app.config['BABEL_TRANSLATION_DIRECTORIES'] = os.path.join(package_dir, 'translations')
@@ -90,17 +115,17 @@ def create_app(config_name='development'):
         # Check URL parameter first
         lang = request.args.get('lang')
         if lang and lang in ['en', 'az', 'ru']:
-            print(f"DEBUG: Babel get_locale from URL: {lang}")
+            logger.debug('Babel get_locale from URL: %s', lang)
             return lang
         
         # Check if language is set in session
         lang = session.get('language')
         if lang and lang in ['en', 'az', 'ru']:
-            print(f"DEBUG: Babel get_locale from session: {lang}")
+            logger.debug('Babel get_locale from session: %s', lang)
             return lang
         
         # Default to Azerbaijani
-        print("DEBUG: Babel get_locale defaulting to Azerbaijani")
+        logger.debug('Babel get_locale defaulting to Azerbaijani')
         return 'az'
     
     # Set locale selector using the correct attribute
@@ -111,11 +136,40 @@ def create_app(config_name='development'):
     app.jinja_env.globals['_'] = _gettext
     
     # Enable CORS with credentials support
-    CORS(app, supports_credentials=True)
+    CORS(app, supports_credentials=True, expose_headers=['X-Next-Cursor'])
     
     # Initialize session management
-    Session(app)
-    
+    from yonca.session_store import init_session
+    init_session(app)
+
+    # Initialize on-disk cache for the streaming file proxy
+    from yonca.file_cache import drive_file_cache
+    drive_file_cache.init_app(app)
+
+    # Initialize the in-process HomeContent snapshot
+    from yonca.home_content_cache import home_content_cache
+    home_content_cache.init_app(app)
+
+    # Register the {% cache %} template tag for rendered fragments
+    from yonca.fragment_cache import fragment_cache
+    fragment_cache.init_app(app)
+
+    # Version stamps behind the ETags of the JSON list endpoints
+    from yonca.conditional_get import data_versions
+    data_versions.init_app(app)
+
+    # Whole-response cache for anonymous visitors (invalidated by the version stamps above)
+    from yonca.response_cache import response_cache
+    response_cache.init_app(app)
+
+    # Keep the full-text search index in sync with resource and course changes
+    from yonca.search_index import register_search_hooks
+    register_search_hooks()
+
+    # Initialize LISTEN/NOTIFY fan-out for the forum event stream
+    from yonca.forum_events import forum_event_broker
+    forum_event_broker.init_app(app)
+
     # Initialize admin interface
     admin = init_admin(app)
     app.admin = admin
@@ -132,7 +186,7 @@ def create_app(config_name='development'):
         locale = get_locale()
         # Ensure it's always a string, not a Locale object
         locale_str = str(locale) if locale else 'en'
-        print(f"DEBUG: inject_locale() returning: {locale_str} (original: {locale}, type: {type(locale)})")
+        logger.debug('inject_locale() returning: %s (original: %s, type: %s)', locale_str, locale, type(locale))
         return {'current_locale': locale_str}
     
     # Add template helper for content translation
@@ -144,17 +198,32 @@ def create_app(config_name='development'):
         def translate_field(content_type, content_id, field_name, original_text):
             """Get translated content based on current locale"""
             locale = get_locale()
+            # Home content translations are preloaded in the cached snapshot
+            snapshot = _home_content_snapshot(content_type, content_id)
+            if snapshot:
+                return snapshot.translate(field_name, original_text, locale)
             return get_translated_content(content_type, content_id, field_name, original_text, locale)
         
         def translate_json(content_type, content_id, field_name, json_array):
             """Get translated JSON array based on current locale"""
             locale = get_locale()
+            snapshot = _home_content_snapshot(content_type, content_id)
+            if snapshot:
+                return snapshot.translate_json(field_name, json_array, locale)
             return get_translated_json_array(content_type, content_id, field_name, json_array, locale)
         
+        def _home_content_snapshot(content_type, content_id):
+            if content_type != 'home_content' or content_id is None:
+                return None
+            snapshot = home_content_cache.get()
+            return snapshot if snapshot.id == content_id else None
+        
         def get_localized_image(image_dict, fallback=''):
             """Get image URL based on current locale"""
+            from collections.abc import Mapping
             locale = str(get_locale()) if get_locale() else 'en'
-            if isinstance(image_dict, dict):
+            # Home content snapshots hold read-only mappings rather than dicts
+            if isinstance(image_dict, Mapping):
                 return image_dict.get(locale, image_dict.get('en', fallback))
             return fallback
         
@@ -186,6 +255,15 @@ def create_app(config_name='development'):
         result = re.sub(pattern, replace_button, text, flags=re.IGNORECASE)
         return Markup(result)
     
+    @app.template_filter('srcset')
+    def srcset_filter(image):
+        """Build a srcset value from an image item's resized variants"""
+        from collections.abc import Mapping
+        from yonca.image_variants import build_srcset
+        if not isinstance(image, Mapping):
+            return ''
+        return build_srcset(image.get('variants'), image.get('url'), image.get('width'))
+    
     # Create database tables
     # Remove db.create_all(); migrations will handle schema
     with app.app_context():
@@ -193,7 +271,7 @@ def create_app(config_name='development'):
     
     # Start background job worker
     from yonca.job_manager import job_manager
-    job_manager.start_worker()
+    job_manager.start_worker(config_name)
     
     return app
 
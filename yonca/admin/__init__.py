@@ -22,7 +22,12 @@ from yonca.google_drive_service import authenticate, upload_file, create_view_on
 import secrets
 
 def upload_gallery_image_to_drive(file, filename):
-    """Upload a gallery image to Google Drive and return the public URL"""
+    """
+    Upload a gallery image and its resized variants to Google Drive.
+
+    Returns a gallery item dict with 'url', 'drive_file_id', 'width' and 'variants',
+    or None if the upload failed.
+    """
     try:
         # Authenticate with Google Drive
         service = authenticate()
@@ -65,13 +70,22 @@ def upload_gallery_image_to_drive(file, filename):
                 print("Failed to create view link for gallery image")
                 return None
 
+            # Generate and upload smaller variants for srcset
+            from yonca.image_variants import upload_image_variants
+            original_width, variants = upload_image_variants(service, temp_file_path, secure_filename_str)
+
             # Clean up temporary file
             try:
                 os.remove(temp_file_path)
             except:
                 pass
 
-            return view_link
+            return {
+                'url': view_link,
+                'drive_file_id': drive_file_id,
+                'width': original_width,
+                'variants': variants
+            }
 
         except Exception as e:
             print(f"Error uploading gallery image to Drive: {e}")
@@ -105,6 +119,7 @@ def get_google_redirect_uri(redirect_uri=None):
     else:
         return "https://magsud.yonca-sdc.com/admin/google_login/"
 from yonca.models import User, Course, ForumMessage, ForumChannel, TaviTest, Resource, db, HomeContent
+from yonca.home_content_cache import home_content_cache
 
 class AdminIndexView(AdminIndexView):
     """Custom admin index view with authentication and home content management"""
@@ -151,6 +166,7 @@ class AdminIndexView(AdminIndexView):
                 ]
             )
             db.session.add(home_content)
+            home_content_cache.bump_version()
             db.session.commit()
         
         form = HomeContentForm()
@@ -358,10 +374,10 @@ class AdminIndexView(AdminIndexView):
                         if file and file.filename:
                             # Upload to Google Drive instead of local storage
                             try:
-                                drive_url = upload_gallery_image_to_drive(file, file.filename)
-                                if drive_url:
-                                    # Add image with uploaded URL
-                                    gallery_images_dict[index] = {'url': drive_url, 'alt': alt, 'caption': caption, 'drive_file_id': None}
+                                uploaded = upload_gallery_image_to_drive(file, file.filename)
+                                if uploaded:
+                                    # Add image with uploaded URL and its resized variants
+                                    gallery_images_dict[index] = dict(uploaded, alt=alt, caption=caption)
                                 else:
                                     flash(f'Failed to upload gallery image {file.filename} to Google Drive', 'error')
                             except Exception as e:
@@ -398,6 +414,7 @@ class AdminIndexView(AdminIndexView):
                 print(f"DEBUG: home_content.gallery_images: {home_content.gallery_images}")
                 print(f"DEBUG: home_content.site_logo_url: {home_content.site_logo_url}")
                 
+                home_content_cache.bump_version()
                 db.session.commit()
                 print(f"DEBUG: Database commit successful")
                 
@@ -956,6 +973,9 @@ class ResourceView(SecureModelView):
                             # Create view-only link
                             view_link = create_view_only_link(service, drive_file_id, is_image=False)
                             if view_link:
+                                if model.drive_file_id:
+                                    from yonca.file_cache import drive_file_cache
+                                    drive_file_cache.invalidate(model.drive_file_id)
                                 model.drive_file_id = drive_file_id
                                 model.drive_view_link = view_link
                             else:
@@ -1042,6 +1062,7 @@ class AboutCompanyView(BaseView):
                 about_features=[{"title": "Interactive Courses", "description": "Engage with dynamic course content and interactive learning materials."}, {"title": "Study Groups", "description": "Collaborate with fellow learners in our vibrant study communities."}, {"title": "Expert Support", "description": "Get help from our team of educational experts and specialists."}]
             )
             db.session.add(home_content)
+            home_content_cache.bump_version()
             db.session.commit()
         
         form = AboutCompanyForm()
@@ -1117,10 +1138,10 @@ class AboutCompanyView(BaseView):
                         file = request.files[file_key]
                         if file and file.filename:
                             # Upload to Google Drive instead of local storage
-                            drive_url = upload_gallery_image_to_drive(file, file.filename)
-                            if drive_url:
-                                # Add image with uploaded URL
-                                about_gallery_images_dict[index] = {'url': drive_url, 'alt': alt, 'caption': caption, 'drive_file_id': None}
+                            uploaded = upload_gallery_image_to_drive(file, file.filename)
+                            if uploaded:
+                                # Add image with uploaded URL and its resized variants
+                                about_gallery_images_dict[index] = dict(uploaded, alt=alt, caption=caption)
                             else:
                                 flash(f'Failed to upload about gallery image {file.filename} to Google Drive', 'error')
                     else:
@@ -1145,6 +1166,7 @@ class AboutCompanyView(BaseView):
                 
                 home_content.about_gallery_images = about_gallery_images
                 
+                home_content_cache.bump_version()
                 db.session.commit()
                 flash('About Company content updated successfully!', 'success')
                 return redirect(url_for('about_company.index'))
@@ -1254,7 +1276,11 @@ class TranslateContentView(BaseView):
             
             # Delete from Translation cache table
             Translation.query.filter(Translation.target_language.in_(['az', 'ru'])).delete()
-            
+
+            # Bulk deletes bypass the flush hooks that version API responses
+            from yonca.conditional_get import mark_changed
+            mark_changed(db.session, 'courses', 'resources')
+
             db.session.commit()
             
             message = f"Deleted {total_before} total translations ({az_content_count + az_cache_count} Azerbaijani, {ru_content_count + ru_cache_count} Russian)."
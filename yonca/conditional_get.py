@@ -0,0 +1,244 @@
+"""
+Version-based ETags and conditional GET for the JSON list endpoints.
+
+Each dataset (courses, resources, forum channels, PDFs, course reviews) has a
+version stamp in AppSetting under 'data_version:<name>'. Session hooks notice
+every flush that touches the dataset's models and write a new stamp just
+before the transaction commits, so the stamp moves with the data.
+
+An endpoint decorated with @conditional_get('courses', per_user=True) gets an
+ETag built from (endpoint, locale, user bucket, query string, build id and
+dataset versions). When the request's If-None-Match matches, a 304 is sent
+without running the view. Versions are read from a per-process copy that is
+refreshed at most every DATA_VERSION_CHECK_INTERVAL seconds (immediately after
+a commit in the same process), so other workers may answer 304 for that long
+after a change.
+
+Enrollment and resource unlocks are per-user but bump the whole dataset; they
+are rare next to reads.
+"""
+import functools
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from yonca.models import db, AppSetting, Course, CourseReview, Resource, ForumChannel, PDFDocument, ContentTranslation, User
+
+VERSION_PREFIX = 'data_version:'
+_PENDING_KEY = 'data_versions_pending'
+_COMMITTED_KEY = 'data_versions_committed'
+
+
+def _changed_datasets(obj):
+    """Datasets whose responses change when obj is inserted, updated or deleted"""
+    if isinstance(obj, Course):
+        return ('courses',)
+    if isinstance(obj, Resource):
+        return ('resources',)
+    if isinstance(obj, ForumChannel):
+        return ('forum_channels',)
+    if isinstance(obj, PDFDocument):
+        return ('pdfs',)
+    if isinstance(obj, CourseReview):
+        return ('course_reviews',)
+    if isinstance(obj, ContentTranslation):
+        return {'course': ('courses',), 'resource': ('resources',)}.get(obj.content_type, ())
+    if isinstance(obj, User):
+        # Enrollment and unlocked resources change that user's listings
+        attrs = inspect(obj).attrs
+        changed = []
+        if attrs.courses.history.has_changes():
+            changed.append('courses')
+        if attrs.accessed_resources.history.has_changes():
+            changed.append('resources')
+        return changed
+    return ()
+
+
+class DataVersions:
+    """Per-process copy of the dataset version stamps"""
+
+    def __init__(self, check_interval=5):
+        self.enabled = True
+        self.check_interval = check_interval
+        self.build_id = ''
+        self._versions = {}
+        self._pin_deadline = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def init_app(self, app):
+        """Configure from the Flask app config and watch sessions for data changes"""
+        self.enabled = app.config.get('CONDITIONAL_GET_ENABLED', True)
+        self.check_interval = app.config.get('DATA_VERSION_CHECK_INTERVAL', self.check_interval)
+        self.build_id = app.config.get('ETAG_BUILD_ID') or _package_build_id()
+        if not event.contains(Session, 'after_flush', _collect_changes):
+            event.listen(Session, 'after_flush', _collect_changes)
+            event.listen(Session, 'before_commit', _write_versions)
+            event.listen(Session, 'after_commit', _after_commit)
+            event.listen(Session, 'after_rollback', _discard_changes)
+
+    def _refresh(self):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            rows = db.session.query(AppSetting.key, AppSetting.value).filter(AppSetting.key.like(VERSION_PREFIX + '%'))
+            self._versions = {key[len(VERSION_PREFIX):]: value for key, value in rows}
+            # The earliest PIN expiry: after it, resource listings change without a write
+            self._pin_deadline = db.session.query(func.min(Resource.pin_expires_at)).filter(
+                Resource.is_active == True, Resource.access_pin.isnot(None)
+            ).scalar()
+            self._checked_at = time.monotonic()
+
+    def get(self, name):
+        self._refresh()
+        return self._versions.get(name, '')
+
+    def pins_current(self):
+        """False once a resource PIN has expired and is waiting to be rotated"""
+        self._refresh()
+        return self._pin_deadline is None or datetime.utcnow() < self._pin_deadline
+
+    def expire(self):
+        """Re-read the stamps on next use (called after this process commits a change)"""
+        self._checked_at = 0.0
+
+    def add_listener(self, callback):
+        """Call callback(names) after this process commits changes to those datasets"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def _committed(self, names):
+        self.expire()
+        for callback in self._listeners:
+            callback(names)
+
+
+def mark_changed(session, *names):
+    """Bump dataset versions on commit for writes the flush hooks cannot see (bulk updates/deletes)"""
+    session.info.setdefault(_PENDING_KEY, set()).update(names)
+
+
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        pending.update(_changed_datasets(obj))
+
+
+def _write_versions(session):
+    """Store a new stamp for every changed dataset inside the committing transaction"""
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    # Sorted so concurrent writers lock the rows in the same order
+    values = [{'key': VERSION_PREFIX + name, 'value': uuid.uuid4().hex} for name in sorted(pending)]
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(AppSetting).values(values)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[AppSetting.key],
+            set_={'value': stmt.excluded.value, 'updated_at': func.now()}
+        ))
+    else:
+        for item in values:
+            setting = session.query(AppSetting).filter_by(key=item['key']).first()
+            if setting is None:
+                session.add(AppSetting(**item))
+            else:
+                setting.value = item['value']
+    session.info[_COMMITTED_KEY] = pending
+
+
+def _after_commit(session):
+    names = session.info.pop(_COMMITTED_KEY, None)
+    if names:
+        data_versions._committed(names)
+
+
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_COMMITTED_KEY, None)
+
+
+def _package_build_id():
+    """Latest modification time of the package sources, so a deploy changes every ETag"""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    latest = 0.0
+    for root, _dirs, files in os.walk(package_dir):
+        for name in files:
+            if name.endswith(('.py', '.html', '.mo')):
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return str(int(latest))
+
+
+def request_etag(datasets, per_user):
+    """ETag for the current request, or None if it cannot be validated cheaply"""
+    from flask import request, session
+    from flask_login import current_user
+
+    if 'resources' in datasets and not data_versions.pins_current():
+        return None
+
+    if not per_user:
+        bucket = 'public'
+    elif current_user.is_authenticated:
+        # The user's own fields appear in some payloads (/api/bootstrap) and change what others show
+        bucket = f'user:{current_user.id}:{current_user.username}:{int(bool(current_user.is_admin))}'
+    else:
+        bucket = 'anonymous'
+
+    parts = [
+        request.endpoint,
+        session.get('language', 'en'),
+        bucket,
+        request.query_string.decode('latin-1'),
+        data_versions.build_id,
+    ] + [data_versions.get(name) for name in datasets]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def conditional_get(*datasets, per_user=False):
+    """
+    Answer If-None-Match with 304 for a GET endpoint without running it.
+
+    Args:
+        datasets: Names of the datasets the response is built from
+        per_user: Whether the response differs between signed-in users
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import current_app, make_response, request
+
+            if not data_versions.enabled:
+                return view(*args, **kwargs)
+
+            etag = request_etag(datasets, per_user)
+            if etag is None:
+                return view(*args, **kwargs)
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Let the browser keep the body but revalidate it on every use
+            response.headers['Cache-Control'] = 'private, no-cache' if per_user else 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+# Global version cache instance
+data_versions = DataVersions()
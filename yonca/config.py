@@ -11,7 +11,28 @@ class Config:
     if not SQLALCHEMY_DATABASE_URI:
         raise ValueError("DATABASE_URL environment variable is not set")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SESSION_TYPE = 'filesystem'
+
+    # Database connection pools, one per process role (see engine_options below).
+    # Web processes serve short requests; the background job worker gets its own
+    # small pool with a longer statement timeout so long jobs can't starve requests.
+    DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'yonca')
+    DB_POOL_PRE_PING = True  # Test connections on checkout so restarts/failovers don't surface as errors
+    DB_POOL_RECYCLE = 1800  # Seconds before a connection is replaced
+    DB_POOL_TIMEOUT = 10  # Seconds to wait for a free connection before failing the request
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    DB_WORKER_POOL_SIZE = int(os.environ.get('DB_WORKER_POOL_SIZE', 2))
+    DB_WORKER_MAX_OVERFLOW = int(os.environ.get('DB_WORKER_MAX_OVERFLOW', 2))
+    DB_WORKER_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_WORKER_STATEMENT_TIMEOUT_MS', 600000))
+    SQLALCHEMY_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URL')  # Optional read replica (see yonca.db_routing)
+    DB_REPLICA_STICKY_SECONDS = 10  # After a write, that browser reads from the primary for this long
+    SESSION_TYPE = 'database'  # 'database' (yonca.session_store) or any Flask-Session type, e.g. 'filesystem'
+    SESSION_ANONYMOUS_COOKIE = True  # Keep anonymous visitors' sessions in a signed cookie instead of the table
+    SESSION_PURGE_INTERVAL = 3600  # Seconds between batch deletes of expired sessions
+    PIN_ROTATION_INTERVAL = 15  # Seconds between job-worker runs that renew expired resource PINs
+    SESSION_PURGE_BATCH_SIZE = 1000
+    USER_PRINCIPAL_TTL = 60  # Seconds a worker may reuse a signed-in user's cached name and roles
     SESSION_FILE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'flask_session')
     SESSION_COOKIE_NAME = 'yonca_session'
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
@@ -35,10 +56,51 @@ class Config:
     # Google API Key for Picker API (required for file picker functionality)
     GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY', '')
 
+    # Streaming file proxy (/api/file/<id>/content) with a size-bounded on-disk LRU cache
+    FILE_PROXY_ENABLED = os.environ.get('FILE_PROXY_ENABLED', 'false').lower() == 'true'
+    FILE_CACHE_DIR = os.environ.get('FILE_CACHE_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'file_cache')
+    FILE_CACHE_MAX_BYTES = int(os.environ.get('FILE_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))  # 2 GB
+    FILE_CACHE_MAX_AGE = 3600  # Browser cache lifetime for proxied files (seconds)
+
+    # Forum API pagination
+    FORUM_PAGE_SIZE = 20  # Top-level threads per page
+    FORUM_MAX_PAGE_SIZE = 100
+    FORUM_MAX_DEPTH = 10  # Deepest reply level returned
+    FORUM_STREAM_KEEPALIVE = 15  # Seconds between keepalive comments on the forum event stream
+    FORUM_STREAM_MAX_SUBSCRIBERS = int(os.environ.get('FORUM_STREAM_MAX_SUBSCRIBERS', 8))  # Open streams per process; keep well below gunicorn's threads
+    RESOURCES_MAX_PAGE_SIZE = 200  # Largest ?limit accepted by /api/resources
+    SEARCH_PAGE_SIZE = 20  # Results returned by /api/search
+    SEARCH_MAX_PAGE_SIZE = 100
+    HOME_CONTENT_VERSION_CHECK_INTERVAL = 5  # Seconds between checks for home content saved by another worker
+    FRAGMENT_CACHE_ENABLED = True  # Cache {% cache %} blocks in templates
+    FRAGMENT_CACHE_MAX_ENTRIES = 256
+    CONDITIONAL_GET_ENABLED = True  # ETags and 304 responses for the JSON list endpoints
+    DATA_VERSION_CHECK_INTERVAL = 5  # Seconds between checks for data changed by another worker
+    ETAG_BUILD_ID = os.environ.get('ETAG_BUILD_ID')  # Defaults to the newest source file mtime
+    RESPONSE_CACHE_ENABLED = True  # Cache public pages and endpoints for anonymous visitors
+    RESPONSE_CACHE_MAX_ENTRIES = 512
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL')  # Optional shared backend (needs redis)
+    REQUEST_TIMING_ENABLED = True  # Count queries and time DB/template/external work per request
+    SERVER_TIMING_HEADER = True  # Send the counters in a Server-Timing response header
+    SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 1000))  # Log the statement list above this; 0 disables
+    REQUEST_TIMING_MAX_STATEMENTS = 500  # Statements kept per request for the slow-request log
+    METRICS_ENABLED = True  # Prometheus metrics at /metrics (needs prometheus-client)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # If set, scrapes must send "Authorization: Bearer <token>"
+    METRICS_REQUIRE_TOKEN = False  # Without a token, only direct scrapes from this machine are served
+
+    # Logging (yonca/log.py)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')  # Level of the yonca package loggers
+    LOG_LEVELS = os.environ.get('LOG_LEVELS')  # Per-module overrides, e.g. 'yonca.google_drive_service=DEBUG'
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # 'text' (key=value) or 'json'
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES')  # Keep a fraction of sub-WARNING records, e.g. 'yonca.request_timing=0.1'
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     TESTING = False
+    FRAGMENT_CACHE_ENABLED = False  # Template edits show up without a restart
+    RESPONSE_CACHE_ENABLED = False
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
 
 class TestingConfig(Config):
     """Testing configuration"""
@@ -48,11 +110,40 @@ class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     TESTING = False
-    SESSION_TYPE = 'filesystem'
+    SESSION_TYPE = 'database'
     SESSION_COOKIE_SECURE = True  # HTTPS required
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
+    METRICS_REQUIRE_TOKEN = True  # /metrics is not served until METRICS_TOKEN is set
+
+def engine_options(app_config, process_role='web'):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for a process role ('web' or 'worker').
+
+    On PostgreSQL each connection is tagged with application_name
+    '<DB_APPLICATION_NAME>-<role>' (visible in pg_stat_activity) and gets the
+    role's statement_timeout; 0 disables the timeout.
+    """
+    worker = process_role == 'worker'
+    options = {
+        'pool_pre_ping': app_config['DB_POOL_PRE_PING'],
+        'pool_recycle': app_config['DB_POOL_RECYCLE'],
+    }
+    if not app_config['SQLALCHEMY_DATABASE_URI'].startswith(('postgresql', 'postgres')):
+        return options
+
+    statement_timeout = app_config['DB_WORKER_STATEMENT_TIMEOUT_MS' if worker else 'DB_STATEMENT_TIMEOUT_MS']
+    options.update({
+        'pool_size': app_config['DB_WORKER_POOL_SIZE' if worker else 'DB_POOL_SIZE'],
+        'max_overflow': app_config['DB_WORKER_MAX_OVERFLOW' if worker else 'DB_MAX_OVERFLOW'],
+        'pool_timeout': app_config['DB_POOL_TIMEOUT'],
+        'connect_args': {
+            'application_name': f"{app_config['DB_APPLICATION_NAME']}-{process_role}",
+            'options': f'-c statement_timeout={statement_timeout}',
+        },
+    })
+    return options
 
 config = {
     'development': DevelopmentConfig,
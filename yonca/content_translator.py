@@ -2,6 +2,7 @@
 Content translation helper for automatic translation of dynamic content
 """
 import re
+from collections.abc import Mapping
 from yonca.models import ContentTranslation, db
 from yonca.translation_service import translation_service
 
@@ -351,6 +352,38 @@ def get_translated_content(content_type, content_id, field_name, original_text,
     return original_text
 
 
+def get_translated_fields(content_type, content_ids, field_names, target_language):
+    """
+    Prefetch translations of several fields for many content items in one query.
+    
+    Args:
+        content_type: Type of content
+        content_ids: IDs of the content items
+        field_names: Names of the fields
+        target_language: Target language code
+    
+    Returns:
+        Dict mapping (content_id, field_name) to translated text; missing
+        translations are absent, so callers fall back to the original text
+    """
+    content_ids = list(content_ids)
+    if not target_language or not content_ids:
+        return {}
+    
+    translations = db.session.query(
+        ContentTranslation.content_id,
+        ContentTranslation.field_name,
+        ContentTranslation.translated_text
+    ).filter(
+        ContentTranslation.content_type == content_type,
+        ContentTranslation.content_id.in_(content_ids),
+        ContentTranslation.field_name.in_(list(field_names)),
+        ContentTranslation.target_language == target_language
+    ).all()
+    
+    return {(content_id, field_name): text for content_id, field_name, text in translations}
+
+
 def get_translated_json_array(content_type, content_id, field_name, json_array, target_language):
     """
     Get translated JSON array with text fields translated.
@@ -368,49 +401,42 @@ def get_translated_json_array(content_type, content_id, field_name, json_array,
     if not target_language or target_language == 'en' or not json_array:
         return json_array
     
+    return translate_json_items(
+        field_name, json_array,
+        lambda sub_field_name, text: get_translated_content(content_type, content_id, sub_field_name, text, target_language)
+    )
+
+
+# Text keys of JSON array items that have their own translations
+JSON_TEXT_KEYS = ('title', 'description', 'caption', 'text', 'button_text')
+
+
+def translate_json_items(field_name, json_array, lookup):
+    """
+    Translate the text keys of each item in a JSON array.
+    
+    Args:
+        field_name: Name of the JSON field
+        json_array: Original JSON array
+        lookup: Function (sub_field_name, original_text) -> translated text,
+            where sub_field_name looks like "features[0].title"
+    
+    Returns:
+        New list of items with translated text fields
+    """
     translated_array = []
     
     for index, item in enumerate(json_array):
-        if not isinstance(item, dict):
+        if not isinstance(item, Mapping):
             translated_array.append(item)
             continue
         
-        translated_item = item.copy()
-        
-        # Translate title if present
-        if 'title' in item:
-            sub_field_name = f"{field_name}[{index}].title"
-            translated_item['title'] = get_translated_content(
-                content_type, content_id, sub_field_name, item['title'], target_language
-            )
-        
-        # Translate description if present
-        if 'description' in item:
-            sub_field_name = f"{field_name}[{index}].description"
-            translated_item['description'] = get_translated_content(
-                content_type, content_id, sub_field_name, item['description'], target_language
-            )
-        
-        # Translate caption if present (for gallery items)
-        if 'caption' in item:
-            sub_field_name = f"{field_name}[{index}].caption"
-            translated_item['caption'] = get_translated_content(
-                content_type, content_id, sub_field_name, item['caption'], target_language
-            )
+        translated_item = dict(item)
         
-        # Translate text if present (for dropdown menus)
-        if 'text' in item:
-            sub_field_name = f"{field_name}[{index}].text"
-            translated_item['text'] = get_translated_content(
-                content_type, content_id, sub_field_name, item['text'], target_language
-            )
-
-        # Translate button_text if present (for features)
-        if 'button_text' in item:
-            sub_field_name = f"{field_name}[{index}].button_text"
-            translated_item['button_text'] = get_translated_content(
-                content_type, content_id, sub_field_name, item.get('button_text', ''), target_language
-            )
+        # Titles, descriptions, gallery captions, dropdown menu text and feature buttons
+        for key in JSON_TEXT_KEYS:
+            if key in item:
+                translated_item[key] = lookup(f"{field_name}[{index}].{key}", item[key])
         
         translated_array.append(translated_item)
     
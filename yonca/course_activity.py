@@ -0,0 +1,81 @@
+"""
+Preloaded assignment submissions and announcement reply threads for course pages
+"""
+from sqlalchemy.orm import joinedload
+from yonca.models import CourseAssignmentSubmission, CourseAnnouncementReply
+
+
+class SubmissionIndex:
+    """Submissions grouped by assignment, with the viewing user's own submission picked out"""
+
+    def __init__(self, submissions, user_id=None):
+        self._by_assignment = {}
+        self._own = {}
+        for submission in submissions:
+            self._by_assignment.setdefault(submission.assignment_id, []).append(submission)
+            if submission.user_id == user_id:
+                self._own.setdefault(submission.assignment_id, submission)
+
+    def all(self, assignment):
+        return self._by_assignment.get(assignment.id, [])
+
+    def count(self, assignment):
+        return len(self.all(assignment))
+
+    def own(self, assignment):
+        return self._own.get(assignment.id)
+
+
+class ReplyThreads:
+    """Announcement replies arranged into threads in memory"""
+
+    def __init__(self, replies):
+        self._top_level = {}
+        self._children = {}
+        for reply in replies:
+            if reply.parent_reply_id is None:
+                self._top_level.setdefault(reply.announcement_id, []).append(reply)
+            else:
+                self._children.setdefault(reply.parent_reply_id, []).append(reply)
+
+    def top_level(self, announcement):
+        return self._top_level.get(announcement.id, [])
+
+    def children(self, reply):
+        return self._children.get(reply.id, [])
+
+
+def load_submission_index(assignments, user, include_all=False):
+    """
+    Load the submissions shown on a course page in one query.
+
+    Teachers and admins (include_all) get every submission with its author;
+    other users only get their own.
+    """
+    assignment_ids = [assignment.id for assignment in assignments]
+    user_id = user.id if getattr(user, 'is_authenticated', False) else None
+    if not assignment_ids or not (include_all or user_id):
+        return SubmissionIndex([], user_id)
+
+    query = CourseAssignmentSubmission.query.filter(CourseAssignmentSubmission.assignment_id.in_(assignment_ids))
+    if include_all:
+        query = query.options(joinedload(CourseAssignmentSubmission.user))
+    else:
+        query = query.filter_by(user_id=user_id)
+    return SubmissionIndex(query.order_by(CourseAssignmentSubmission.id).all(), user_id)
+
+
+def load_reply_threads(announcements):
+    """Load every reply to the given announcements, with authors, in one query"""
+    announcement_ids = [announcement.id for announcement in announcements]
+    if not announcement_ids:
+        return ReplyThreads([])
+
+    replies = (
+        CourseAnnouncementReply.query
+        .filter(CourseAnnouncementReply.announcement_id.in_(announcement_ids))
+        .options(joinedload(CourseAnnouncementReply.user))
+        .order_by(CourseAnnouncementReply.id)
+        .all()
+    )
+    return ReplyThreads(replies)
@@ -0,0 +1,221 @@
+"""
+Set-based operations on course content and folders
+"""
+from sqlalchemy import select, insert, or_, func
+from yonca.models import db, CourseContent, CourseContentFolder
+
+# Rows per multi-row INSERT statement
+INSERT_CHUNK_SIZE = 500
+
+
+class FolderTree:
+    """Folders and content items of a course grouped by parent, so templates can walk the tree without queries"""
+
+    def __init__(self, folders, contents):
+        self.roots = []
+        self._subfolders = {}
+        self._items = {}
+        for folder in folders:
+            if folder.parent_folder_id is None:
+                self.roots.append(folder)
+            else:
+                self._subfolders.setdefault(folder.parent_folder_id, []).append(folder)
+        for item in contents:
+            if item.folder_id is not None:
+                self._items.setdefault(item.folder_id, []).append(item)
+
+    def subfolders(self, folder):
+        return self._subfolders.get(folder.id, [])
+
+    def items(self, folder):
+        return self._items.get(folder.id, [])
+
+
+def collect_folder_subtree(course_id, folder_ids):
+    """
+    Return the ids of the given folders and all of their descendants.
+
+    Uses a single recursive query instead of walking subfolders one by one.
+    """
+    folder_ids = [int(folder_id) for folder_id in folder_ids]
+    if not folder_ids:
+        return []
+
+    tree = (
+        select(CourseContentFolder.id)
+        .where(CourseContentFolder.id.in_(folder_ids), CourseContentFolder.course_id == course_id)
+        .cte(name='folder_tree', recursive=True)
+    )
+    tree = tree.union(
+        select(CourseContentFolder.id).where(CourseContentFolder.parent_folder_id == tree.c.id)
+    )
+    return [row[0] for row in db.session.execute(select(tree.c.id))]
+
+
+def delete_course_content(course, user, content_ids=(), folder_ids=(), delete_drive_files=True):
+    """
+    Delete content items and folders (with everything inside them) from a course.
+
+    Database rows are removed with one DELETE per table. Drive files that are no
+    longer referenced by any record are removed afterwards by a background job.
+    The caller commits the session.
+
+    Args:
+        course: Course the content belongs to
+        user: User whose Google Drive account owns the files
+        content_ids: Ids of individual content items to delete
+        folder_ids: Ids of folders to delete together with their contents
+        delete_drive_files: Also remove Drive files that are no longer referenced
+
+    Returns:
+        (deleted_count, job_id) - job_id is None when no Drive files need deleting
+    """
+    content_ids = [int(content_id) for content_id in content_ids]
+    subtree_ids = collect_folder_subtree(course.id, folder_ids)
+
+    conditions = []
+    if content_ids:
+        conditions.append(CourseContent.id.in_(content_ids))
+    if subtree_ids:
+        conditions.append(CourseContent.folder_id.in_(subtree_ids))
+    if not conditions:
+        return 0, None
+
+    contents = CourseContent.query.filter(CourseContent.course_id == course.id, or_(*conditions))
+    drive_file_ids = {
+        row[0] for row in contents.with_entities(CourseContent.drive_file_id)
+        if row[0]
+    }
+
+    deleted_count = contents.delete(synchronize_session=False)
+    # Stop the file proxy serving copies of the removed items
+    from yonca.file_cache import drive_file_cache
+    for drive_file_id in drive_file_ids:
+        drive_file_cache.invalidate(drive_file_id)
+    if subtree_ids:
+        CourseContentFolder.query.filter(
+            CourseContentFolder.id.in_(subtree_ids)
+        ).delete(synchronize_session=False)
+    db.session.expire_all()
+
+    job_id = None
+    if drive_file_ids and delete_drive_files:
+        from yonca.file_dedup import referenced_drive_file_ids
+        from yonca.job_manager import job_manager
+
+        orphaned = sorted(drive_file_ids - referenced_drive_file_ids(drive_file_ids))
+        if orphaned:
+            # queue_job commits, which also commits the row deletions above
+            job_id = job_manager.queue_job(
+                job_type='delete_drive_files',
+                job_data={'user_id': user.id, 'drive_file_ids': orphaned}
+            )
+    return deleted_count, job_id
+
+
+def next_folder_order(course_id):
+    """Return the order value for a folder appended to the end of a course"""
+    current = db.session.query(func.max(CourseContentFolder.order)).filter_by(course_id=course_id).scalar()
+    return (current or 0) + 1
+
+
+def next_content_order(course_id):
+    """Return the order value for a content item appended to the end of a course"""
+    current = db.session.query(func.max(CourseContent.order)).filter_by(course_id=course_id).scalar()
+    return (current or 0) + 1
+
+
+def build_file_content(course_id, folder_id, file_data, order, is_published):
+    """Return the column values of a CourseContent row for a file imported from Google Drive"""
+    return dict(
+        course_id=course_id,
+        title=file_data['name'],
+        description=f'Imported from Google Drive: {file_data.get("full_path", file_data["name"])}',
+        content_type='file',
+        content_data=file_data['view_link'],
+        drive_file_id=file_data['file_id'],
+        drive_view_link=file_data['view_link'],
+        source_drive_file_id=file_data.get('source_file_id', file_data['file_id']),
+        order=order,
+        folder_id=folder_id,
+        is_published=is_published,
+        allow_others_to_view=True  # Default to visible for bulk imports
+    )
+
+
+def _bulk_insert(model, rows, *returning):
+    """Insert rows with multi-row INSERT statements and return the requested columns"""
+    results = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        statement = insert(model).values(rows[start:start + INSERT_CHUNK_SIZE]).returning(*returning)
+        results.extend(db.session.execute(statement).all())
+    return results
+
+
+def import_drive_folder_to_course(course, folder_data, user, is_published=False):
+    """
+    Recreate an imported Google Drive folder tree inside a course.
+
+    Orders are read once and assigned in memory. Folders are inserted one tree
+    level per statement and files in chunks, so the number of queries depends on
+    the tree depth rather than on the number of items.
+
+    Args:
+        course: Course to import into
+        folder_data: Result of google_drive_service.import_drive_folder
+        user: User whose Drive account was used (and is used for later syncs)
+        is_published: Whether the imported items are visible to students
+
+    Returns:
+        (root_folder_id, imported_count)
+    """
+    from yonca.drive_sync import start_folder_sync
+
+    folder_order = next_folder_order(course.id)
+    content_order = next_content_order(course.id)
+
+    # Group folders by depth; folders are listed parents-first
+    root_drive_id = folder_data['folder_id']
+    depth = {root_drive_id: 0}
+    levels = [[dict(
+        course_id=course.id,
+        title=folder_data['folder_name'],
+        description='Imported from Google Drive folder',
+        order=folder_order,
+        parent_folder_id=None,
+        drive_folder_id=root_drive_id
+    )]]
+    parents = {}
+    for offset, folder_info in enumerate(folder_data.get('folders', []), start=1):
+        parent_drive_id = folder_info['parent_id'] if folder_info['parent_id'] in depth else root_drive_id
+        depth[folder_info['id']] = depth[parent_drive_id] + 1
+        parents[folder_info['id']] = parent_drive_id
+        if depth[folder_info['id']] == len(levels):
+            levels.append([])
+        levels[depth[folder_info['id']]].append(dict(
+            course_id=course.id,
+            title=folder_info['name'],
+            description=f'Imported from Google Drive: {folder_info["path"]}',
+            order=folder_order + offset,
+            parent_folder_id=None,
+            drive_folder_id=folder_info['id']
+        ))
+
+    folder_ids = {}
+    for rows in levels:
+        for row in rows:
+            if row['drive_folder_id'] in parents:
+                row['parent_folder_id'] = folder_ids[parents[row['drive_folder_id']]]
+        returned = _bulk_insert(CourseContentFolder, rows, CourseContentFolder.id, CourseContentFolder.drive_folder_id)
+        folder_ids.update({drive_id: folder_id for folder_id, drive_id in returned})
+
+    root_folder_id = folder_ids[root_drive_id]
+    content_rows = [
+        build_file_content(course.id, folder_ids.get(file_data.get('parent_id'), root_folder_id),
+                           file_data, content_order + offset, is_published)
+        for offset, file_data in enumerate(folder_data['files'])
+    ]
+    content_ids = _bulk_insert(CourseContent, content_rows, CourseContent.id) if content_rows else []
+
+    start_folder_sync(course, root_folder_id, folder_data, user, is_published)
+    return root_folder_id, len(content_ids)
@@ -0,0 +1,106 @@
+"""
+Read-replica routing for the Flask-SQLAlchemy session.
+
+Off unless DATABASE_REPLICA_URL is set. Then plain SELECTs go to the replica
+when they run in a read-only request (GET/HEAD/OPTIONS) or inside a marked
+code path (@replica_reads / with replica_reads():). Everything else goes to
+the primary: writes, SELECT ... FOR UPDATE, raw SQL and flushes. Once a
+session has used the primary, it stays there for the rest of the request, so
+a request always reads its own writes.
+
+After a request commits a write, the response sets a short-lived cookie that
+sends that browser's following requests to the primary for
+DB_REPLICA_STICKY_SECONDS, covering the replica's replication lag.
+"""
+import contextlib
+import contextvars
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+
+STICKY_COOKIE = 'yonca_primary'
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+_PRIMARY_KEY = 'db_routing_primary'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+class replica_reads(contextlib.ContextDecorator):
+    """Mark a block or view as read-only so its SELECTs may use the replica"""
+
+    def __enter__(self):
+        self._token = _replica_reads.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _replica_reads.reset(self._token)
+        return False
+
+
+def _replica_allowed():
+    from flask import has_request_context, request
+
+    if _replica_reads.get():
+        return True
+    if not has_request_context():
+        return False
+    return request.method in READ_ONLY_METHODS and not request.cookies.get(STICKY_COOKIE)
+
+
+class RoutingSession(Session):
+    """Session that sends eligible reads to the 'replica' bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get(_PRIMARY_KEY):
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                if isinstance(clause, Select) and clause._for_update_arg is None and _replica_allowed():
+                    return replica
+                if mapper is not None or clause is not None:
+                    # From here on this session reads what it writes
+                    self.info[_PRIMARY_KEY] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _after_commit(session):
+    from flask import g, has_request_context
+
+    if session.info.get(_PRIMARY_KEY) and has_request_context():
+        g.db_wrote = True
+
+
+def init_replica_routing(app):
+    """Register the replica bind and the read-your-writes cookie if a replica URL is configured"""
+    from sqlalchemy import event
+    from yonca.config import engine_options
+
+    replica_url = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if not replica_url:
+        return
+
+    process_role = app.config.get('PROCESS_ROLE', 'web')
+    options = engine_options(app.config, process_role)
+    if 'connect_args' in options:
+        options['connect_args'] = dict(
+            options['connect_args'],
+            application_name=f"{app.config['DB_APPLICATION_NAME']}-{process_role}-replica"
+        )
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds['replica'] = dict(options, url=replica_url)
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+    if not event.contains(RoutingSession, 'after_commit', _after_commit):
+        event.listen(RoutingSession, 'after_commit', _after_commit)
+
+    @app.after_request
+    def keep_writer_on_primary(response):
+        from flask import g
+
+        if g.get('db_wrote'):
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=app.config.get('DB_REPLICA_STICKY_SECONDS', 10),
+                httponly=True,
+                samesite='Lax',
+                secure=app.config.get('SESSION_COOKIE_SECURE', False)
+            )
+        return response
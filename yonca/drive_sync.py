@@ -0,0 +1,229 @@
+"""
+Incremental re-sync of imported Google Drive folders using the Drive Changes API
+"""
+import logging
+from datetime import datetime
+from yonca.models import db, CourseContent, CourseContentFolder, DriveFolderSync
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+def start_folder_sync(course, root_folder_id, folder_data, user, is_published=True):
+    """Remember the Drive source of an imported folder so it can be re-synced later"""
+    page_token = folder_data.get('start_page_token')
+    if not page_token:
+        logger.warning('No changes page token for Drive folder %s, sync disabled', folder_data.get('folder_id'))
+        return None
+
+    sync = DriveFolderSync(
+        course_id=course.id,
+        folder_id=root_folder_id,
+        user_id=user.id,
+        drive_root_id=folder_data['folder_id'],
+        page_token=page_token,
+        publish_new_items=is_published,
+        last_synced_at=datetime.now()
+    )
+    db.session.add(sync)
+    return sync
+
+
+def queue_folder_sync(sync):
+    """Queue a background job that applies the Drive changes for one synced folder"""
+    from yonca.job_manager import job_manager
+    return job_manager.queue_job(job_type='sync_drive_folder', job_data={'sync_id': sync.id})
+
+
+def _is_gone(change):
+    """True if the changed file was deleted or trashed"""
+    return change.get('removed') or (change.get('file') or {}).get('trashed')
+
+
+def _tree_parent(change, folders):
+    """Return the Drive id of the file's parent inside the synced tree, or None"""
+    if _is_gone(change):
+        return None
+    for parent_id in (change.get('file') or {}).get('parents') or []:
+        if parent_id in folders:
+            return parent_id
+    return None
+
+
+def sync_drive_folder(service, sync):
+    """
+    Apply the Drive changes made since the last sync to an imported course folder.
+
+    Only the Changes API is queried in the common case; files are fetched
+    individually only when they are newly added to the tree. The caller commits.
+
+    Args:
+        service: Authenticated Drive service (the real client or FakeDriveService)
+        sync: DriveFolderSync row to update
+
+    Returns:
+        Dict with counts of changes seen and items added, updated and removed
+    """
+    from yonca.course_content_service import (
+        collect_folder_subtree, delete_course_content, build_file_content,
+        next_content_order, next_folder_order
+    )
+    from yonca.google_drive_service import list_changes, import_drive_file, list_folder_contents
+    from yonca.file_cache import drive_file_cache
+
+    changes, new_page_token = list_changes(service, sync.page_token)
+    stats = {'changes': len(changes), 'added': 0, 'updated': 0, 'removed': 0}
+    if not changes:
+        sync.page_token = new_page_token or sync.page_token
+        sync.last_synced_at = datetime.now()
+        return stats
+
+    course_id = sync.course_id
+    subtree_ids = collect_folder_subtree(course_id, [sync.folder_id])
+    folders = {
+        folder.drive_folder_id: folder
+        for folder in CourseContentFolder.query.filter(CourseContentFolder.id.in_(subtree_ids))
+        if folder.drive_folder_id
+    }
+    folders[sync.drive_root_id] = sync.folder
+    contents = {
+        content.source_drive_file_id: content
+        for content in CourseContent.query.filter(
+            CourseContent.folder_id.in_(subtree_ids),
+            CourseContent.source_drive_file_id.isnot(None)
+        )
+    }
+
+    # Only the most recent change of each file matters
+    latest = {}
+    for change in changes:
+        latest[change['fileId']] = change
+
+    root_change = latest.pop(sync.drive_root_id, None)
+    if root_change and not _is_gone(root_change) and root_change.get('file', {}).get('name'):
+        if sync.folder.title != root_change['file']['name']:
+            sync.folder.title = root_change['file']['name']
+            stats['updated'] += 1
+
+    folder_order = next_folder_order(course_id)
+    content_order = next_content_order(course_id)
+    removed_folder_ids, removed_content_ids, new_folder_ids = [], [], []
+
+    def add_folder(drive_id, name, parent):
+        nonlocal folder_order
+        folder = CourseContentFolder(
+            course_id=course_id,
+            title=name,
+            description='Imported from Google Drive',
+            order=folder_order,
+            parent_folder_id=parent.id,
+            drive_folder_id=drive_id
+        )
+        folder_order += 1
+        db.session.add(folder)
+        db.session.flush()
+        folders[drive_id] = folder
+        stats['added'] += 1
+        return folder
+
+    def add_file(drive_id, folder):
+        nonlocal content_order
+        file_data = import_drive_file(service, drive_id, user_id=sync.user_id)
+        if not file_data or 'error' in file_data:
+            logger.warning('Skipping Drive file %s during sync: %s', drive_id, file_data)
+            return
+        file_data['source_file_id'] = drive_id
+        content = CourseContent(**build_file_content(course_id, folder.id, file_data, content_order, sync.publish_new_items))
+        content_order += 1
+        db.session.add(content)
+        contents[drive_id] = content
+        stats['added'] += 1
+
+    # Folders first, repeating until every folder whose parent is also changing has been placed
+    pending = {
+        file_id: change for file_id, change in latest.items()
+        if file_id in folders or (change.get('file') or {}).get('mimeType') == FOLDER_MIME_TYPE
+    }
+    folder_change_ids = set(pending)
+    progress = True
+    while pending and progress:
+        progress = False
+        for file_id, change in list(pending.items()):
+            parent_id = _tree_parent(change, folders)
+            if parent_id is None:
+                parents = (change.get('file') or {}).get('parents') or []
+                if not _is_gone(change) and any(p in pending for p in parents):
+                    continue
+                # Deleted, trashed or moved out of the synced tree
+                if file_id in folders:
+                    removed_folder_ids.append(folders.pop(file_id).id)
+                    stats['removed'] += 1
+            else:
+                name = change['file'].get('name')
+                folder = folders.get(file_id)
+                if folder is None:
+                    add_folder(file_id, name, folders[parent_id])
+                    new_folder_ids.append(file_id)
+                elif folder.title != name or folder.parent_folder_id != folders[parent_id].id:
+                    folder.title = name
+                    folder.parent_folder_id = folders[parent_id].id
+                    stats['updated'] += 1
+            del pending[file_id]
+            progress = True
+    # Anything left has a parent cycle outside the tree; treat it as moved out
+    for file_id in pending:
+        if file_id in folders:
+            removed_folder_ids.append(folders.pop(file_id).id)
+            stats['removed'] += 1
+
+    # Folders moved in from elsewhere in Drive bring their existing contents with them
+    while new_folder_ids:
+        drive_id = new_folder_ids.pop()
+        for item in list_folder_contents(service, drive_id):
+            if item['id'] in latest:
+                continue
+            if item.get('mimeType') == FOLDER_MIME_TYPE:
+                if item['id'] not in folders:
+                    add_folder(item['id'], item['name'], folders[drive_id])
+                    new_folder_ids.append(item['id'])
+            elif item['id'] not in contents:
+                add_file(item['id'], folders[drive_id])
+
+    for file_id, change in latest.items():
+        if file_id in folder_change_ids:
+            continue
+        parent_id = _tree_parent(change, folders)
+        content = contents.get(file_id)
+        if parent_id is None:
+            if content:
+                removed_content_ids.append(content.id)
+                stats['removed'] += 1
+        elif content is None:
+            add_file(file_id, folders[parent_id])
+        else:
+            # Any change may be new content under the same id; drop the proxied copy
+            drive_file_cache.invalidate(content.drive_file_id)
+            if content.drive_file_id != file_id:
+                # The import reused an identical file stored elsewhere; follow the source from now on
+                file_data = import_drive_file(service, file_id, user_id=sync.user_id)
+                if file_data and 'error' not in file_data:
+                    content.drive_file_id = file_data['file_id']
+                    content.drive_view_link = file_data['view_link']
+                    content.content_data = file_data['view_link']
+                    stats['updated'] += 1
+            if content.title != change['file'].get('name') or content.folder_id != folders[parent_id].id:
+                content.title = change['file'].get('name')
+                content.folder_id = folders[parent_id].id
+                stats['updated'] += 1
+
+    if removed_content_ids or removed_folder_ids:
+        # The Drive files were removed or moved elsewhere by their owner, so only the rows go
+        db.session.flush()
+        delete_course_content(sync.folder.course, sync.user, content_ids=removed_content_ids,
+                              folder_ids=removed_folder_ids, delete_drive_files=False)
+
+    sync.page_token = new_page_token or sync.page_token
+    sync.last_synced_at = datetime.now()
+    logger.info('Synced Drive folder %s into course %s: %s', sync.drive_root_id, course_id, stats)
+    return stats
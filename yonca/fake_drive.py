@@ -0,0 +1,226 @@
+"""
+In-memory stand-in for the Google Drive v3 client, for exercising Drive code without network access.
+
+Supports the subset of the API used by google_drive_service and drive_sync:
+files().get/list/create/delete, changes().getStartPageToken/list,
+permissions().create/list/delete and batch requests. Every executed call is
+counted in FakeDriveService.request_count.
+
+    drive = FakeDriveService()
+    root = drive.add_folder('Course')
+    drive.add_file('notes.pdf', parent=root)
+    token = drive.changes().getStartPageToken().execute()['startPageToken']
+    drive.rename(...); drive.move(...); drive.trash(...)
+"""
+import hashlib
+import itertools
+import re
+import httplib2
+from googleapiclient.errors import HttpError
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+def _http_error(status, message):
+    return HttpError(httplib2.Response({'status': status}), message.encode())
+
+
+class _Request:
+    """Deferred call, mirroring googleapiclient's HttpRequest.execute()"""
+
+    def __init__(self, drive, handler):
+        self._drive = drive
+        self._handler = handler
+
+    def execute(self, num_retries=0):
+        self._drive.request_count += 1
+        return self._handler()
+
+
+class _Batch:
+    """Mirror of BatchHttpRequest; counts as one request however many calls it holds"""
+
+    def __init__(self, drive, callback):
+        self._drive = drive
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request, callback or self._callback, request_id or str(len(self._requests))))
+
+    def execute(self):
+        self._drive.request_count += 1
+        for request, callback, request_id in self._requests:
+            try:
+                response, exception = request._handler(), None
+            except HttpError as error:
+                response, exception = None, error
+            if callback:
+                callback(request_id, response, exception)
+
+
+class _Files:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def get(self, fileId, fields=None, supportsAllDrives=None):
+        return _Request(self._drive, lambda: dict(self._drive._get(fileId)))
+
+    def list(self, q='', fields=None, pageSize=100, pageToken=None, **kwargs):
+        def run():
+            match = re.search(r"'([^']+)' in parents", q)
+            items = [
+                dict(item) for item in self._drive._files.values()
+                if (not match or match.group(1) in item['parents'])
+                and ('trashed=false' not in q or not item['trashed'])
+            ]
+            return {'files': items}
+        return _Request(self._drive, run)
+
+    def create(self, body=None, media_body=None, fields=None, supportsAllDrives=None):
+        def run():
+            body_ = body or {}
+            parent = (body_.get('parents') or [None])[0]
+            if body_.get('mimeType') == FOLDER_MIME_TYPE:
+                return {'id': self._drive.add_folder(body_.get('name', 'Untitled'), parent=parent)}
+            content = b''
+            if media_body is not None and getattr(media_body, '_filename', None):
+                with open(media_body._filename, 'rb') as f:
+                    content = f.read()
+            return {'id': self._drive.add_file(body_.get('name', 'Untitled'), parent=parent, content=content)}
+        return _Request(self._drive, run)
+
+    def delete(self, fileId, supportsAllDrives=None):
+        def run():
+            self._drive._get(fileId)
+            self._drive.delete(fileId)
+            return ''
+        return _Request(self._drive, run)
+
+
+class _Changes:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return _Request(self._drive, lambda: {'startPageToken': str(len(self._drive._changes))})
+
+    def list(self, pageToken, pageSize=100, includeRemoved=True, **kwargs):
+        def run():
+            start = int(pageToken)
+            end = min(start + pageSize, len(self._drive._changes))
+            changes = []
+            for file_id in self._drive._changes[start:end]:
+                item = self._drive._files.get(file_id)
+                if item is None:
+                    if includeRemoved:
+                        changes.append({'fileId': file_id, 'removed': True})
+                else:
+                    changes.append({'fileId': file_id, 'removed': False, 'file': dict(item)})
+            response = {'changes': changes}
+            if end < len(self._drive._changes):
+                response['nextPageToken'] = str(end)
+            else:
+                response['newStartPageToken'] = str(end)
+            return response
+        return _Request(self._drive, run)
+
+
+class _Permissions:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def create(self, fileId, body=None, fields=None, **kwargs):
+        def run():
+            self._drive._get(fileId)
+            permission = dict(body or {}, id=f"perm-{next(self._drive._ids)}")
+            self._drive._permissions.setdefault(fileId, []).append(permission)
+            return {'id': permission['id']}
+        return _Request(self._drive, run)
+
+    def list(self, fileId, fields=None, **kwargs):
+        return _Request(self._drive, lambda: {'permissions': list(self._drive._permissions.get(fileId, []))})
+
+    def delete(self, fileId, permissionId, **kwargs):
+        def run():
+            permissions = self._drive._permissions.get(fileId, [])
+            self._drive._permissions[fileId] = [p for p in permissions if p['id'] != permissionId]
+            return ''
+        return _Request(self._drive, run)
+
+
+class FakeDriveService:
+    """In-memory Drive with a change log that behaves like the Changes API"""
+
+    def __init__(self):
+        self._files = {}
+        self._changes = []
+        self._permissions = {}
+        self._ids = itertools.count(1)
+        self.request_count = 0
+
+    # API surface used by the application
+
+    def files(self):
+        return _Files(self)
+
+    def changes(self):
+        return _Changes(self)
+
+    def permissions(self):
+        return _Permissions(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    # Helpers for setting up and mutating the fake Drive
+
+    def add_folder(self, name, parent=None):
+        """Create a folder and return its id"""
+        return self._add(name, FOLDER_MIME_TYPE, parent)
+
+    def add_file(self, name, parent=None, content=b'', mime_type='application/pdf'):
+        """Create a file and return its id"""
+        return self._add(name, mime_type, parent, content)
+
+    def rename(self, file_id, name):
+        self._get(file_id)['name'] = name
+        self._changes.append(file_id)
+
+    def move(self, file_id, parent):
+        self._get(file_id)['parents'] = [parent] if parent else []
+        self._changes.append(file_id)
+
+    def trash(self, file_id):
+        self._get(file_id)['trashed'] = True
+        self._changes.append(file_id)
+
+    def delete(self, file_id):
+        """Permanently delete a file (and, like Drive, everything inside a folder)"""
+        for child_id in [i for i, item in self._files.items() if file_id in item['parents']]:
+            self.delete(child_id)
+        self._files.pop(file_id, None)
+        self._changes.append(file_id)
+
+    def _add(self, name, mime_type, parent, content=None):
+        file_id = f"fake-{next(self._ids)}"
+        item = {
+            'id': file_id,
+            'name': name,
+            'mimeType': mime_type,
+            'parents': [parent] if parent else [],
+            'trashed': False,
+            'webViewLink': f"https://drive.google.com/file/d/{file_id}/view",
+            'iconLink': '',
+        }
+        if content is not None:
+            item['size'] = str(len(content))
+            item['md5Checksum'] = hashlib.md5(content).hexdigest()
+        self._files[file_id] = item
+        self._changes.append(file_id)
+        return file_id
+
+    def _get(self, file_id):
+        if file_id not in self._files:
+            raise _http_error(404, f"File not found: {file_id}")
+        return self._files[file_id]
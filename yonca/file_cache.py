@@ -0,0 +1,156 @@
+"""
+On-disk LRU cache for Google Drive file content served through the file proxy
+"""
+import json
+import os
+import re
+import threading
+import uuid
+
+# Drive file IDs only contain these characters; anything else is rejected so an
+# ID can never escape the cache directory.
+FILE_ID_PATTERN = re.compile(r'^[a-zA-Z0-9_-]+$')
+
+
+class DriveFileCache:
+    """Size-bounded on-disk cache of Drive files, evicting the least recently used first"""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+
+    def init_app(self, app):
+        """Configure the cache from the Flask app config"""
+        self.cache_dir = app.config.get('FILE_CACHE_DIR')
+        self.max_bytes = app.config.get('FILE_CACHE_MAX_BYTES')
+        if app.config.get('FILE_PROXY_ENABLED') and self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _data_path(self, file_id):
+        return os.path.join(self.cache_dir, f'{file_id}.bin')
+
+    def _meta_path(self, file_id):
+        return os.path.join(self.cache_dir, f'{file_id}.json')
+
+    def get(self, file_id):
+        """Return (path, metadata) for a cached file, or None if it is not cached"""
+        if not FILE_ID_PATTERN.match(file_id or ''):
+            return None
+
+        data_path = self._data_path(file_id)
+        try:
+            with open(self._meta_path(file_id), 'r') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not os.path.exists(data_path):
+            return None
+
+        # Bump the modification time so eviction sees this file as recently used
+        try:
+            os.utime(data_path, None)
+        except OSError:
+            pass
+        return data_path, metadata
+
+    def get_or_fetch(self, file_id, fetch):
+        """
+        Return (path, metadata) for a file, downloading it on a cache miss.
+
+        Args:
+            file_id: Google Drive file ID
+            fetch: Callable taking a temporary path to download into; returns a
+                metadata dict (mime_type, etag, name) or None on failure
+
+        Returns:
+            (path, metadata) tuple, or None if the file could not be fetched
+        """
+        if not FILE_ID_PATTERN.match(file_id or ''):
+            return None
+
+        cached = self.get(file_id)
+        if cached:
+            return cached
+
+        # Only one request downloads a given file; concurrent readers wait for it
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(file_id, threading.Lock())
+
+        with fetch_lock:
+            cached = self.get(file_id)
+            if cached:
+                return cached
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = os.path.join(self.cache_dir, f'.{file_id}.{uuid.uuid4().hex}.part')
+            try:
+                metadata = fetch(tmp_path)
+                if not metadata or not os.path.exists(tmp_path):
+                    return None
+                metadata['size'] = os.path.getsize(tmp_path)
+
+                os.replace(tmp_path, self._data_path(file_id))
+                tmp_meta_path = f'{tmp_path}.json'
+                with open(tmp_meta_path, 'w') as f:
+                    json.dump(metadata, f)
+                os.replace(tmp_meta_path, self._meta_path(file_id))
+            finally:
+                for leftover in (tmp_path, f'{tmp_path}.json'):
+                    try:
+                        os.remove(leftover)
+                    except OSError:
+                        pass
+                with self._lock:
+                    self._fetch_locks.pop(file_id, None)
+
+        self._evict(keep=file_id)
+        return self.get(file_id)
+
+    def invalidate(self, file_id):
+        """Remove a file from the cache (e.g. after it was deleted or replaced)"""
+        if not FILE_ID_PATTERN.match(file_id or '') or not self.cache_dir:
+            return
+        for path in (self._data_path(file_id), self._meta_path(file_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self, keep=None):
+        """Delete least recently used files until the cache fits in max_bytes"""
+        if not self.max_bytes:
+            return
+
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith('.bin'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.name[:-len('.bin')]))
+                    total += stat.st_size
+        except OSError:
+            return
+
+        if total <= self.max_bytes:
+            return
+
+        for _, size, file_id in sorted(entries):
+            if file_id == keep:
+                continue
+            self.invalidate(file_id)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+# Global cache instance
+drive_file_cache = DriveFileCache()
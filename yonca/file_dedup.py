@@ -0,0 +1,240 @@
+"""
+Content-hash deduplication of files stored on Google Drive
+"""
+import hashlib
+import logging
+from sqlalchemy import select, union
+from googleapiclient.errors import HttpError
+from yonca.models import db, FileHash
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class FileDigests:
+    """Hashes and size of an uploaded file, computed while it is written to disk"""
+
+    def __init__(self):
+        self._sha256 = hashlib.sha256()
+        self._md5 = hashlib.md5()
+        self.size = 0
+
+    def update(self, chunk):
+        self._sha256.update(chunk)
+        self._md5.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    @property
+    def md5(self):
+        return self._md5.hexdigest()
+
+
+def save_upload(file_storage, dest_path):
+    """Stream an uploaded file to dest_path, hashing it on the way, and return its FileDigests"""
+    digests = FileDigests()
+    with open(dest_path, 'wb') as out:
+        while True:
+            chunk = file_storage.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digests.update(chunk)
+            out.write(chunk)
+    return digests
+
+
+def _owner_id(user_id):
+    """The given user id, or the current user's (the account authenticate() uses by default)"""
+    if user_id is not None:
+        return user_id
+    from flask import has_request_context
+    from flask_login import current_user
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def _drive_file_state(service, drive_file_id):
+    """
+    Check an indexed Drive file with its owner's service.
+
+    Returns:
+        True if it is usable, False if Drive confirms it is gone (404 or trashed),
+        None if the check failed for another reason
+    """
+    try:
+        metadata = service.files().get(fileId=drive_file_id, fields='id, trashed', supportsAllDrives=True).execute()
+        return not metadata.get('trashed')
+    except HttpError as error:
+        if error.resp.status == 404:
+            return False
+        logger.warning('Could not check Drive file %s: %s', drive_file_id, error)
+        return None
+    except (ConnectionResetError, ConnectionError, TimeoutError, OSError) as error:
+        logger.warning('Could not check Drive file %s: %s', drive_file_id, error)
+        return None
+
+
+def find_drive_file(service=None, sha256=None, md5=None, user_id=None):
+    """
+    Look up an existing Drive file with the same content owned by the same account.
+
+    The app only has the drive.file scope, so a file created with another
+    user's token is invisible to this one and is never matched.
+
+    Args:
+        service: The owner's Drive service, used to verify the match is still usable (optional)
+        sha256: SHA-256 hex digest of the content
+        md5: MD5 hex digest (matches Drive's md5Checksum)
+        user_id: Owning user (defaults to the current user)
+
+    Returns:
+        Matching FileHash row, or None
+    """
+    user_id = _owner_id(user_id)
+    if user_id is None:
+        return None
+    query = None
+    if sha256:
+        query = FileHash.query.filter_by(sha256=sha256, user_id=user_id)
+    elif md5:
+        query = FileHash.query.filter_by(md5=md5, user_id=user_id)
+    if query is None:
+        return None
+
+    for entry in query.order_by(FileHash.created_at.desc()).limit(5).all():
+        if service is None:
+            return entry
+        state = _drive_file_state(service, entry.drive_file_id)
+        if state:
+            return entry
+        if state is False:
+            # The owner's credentials confirm the file is gone
+            db.session.delete(entry)
+    return None
+
+
+def register_drive_file(drive_file_id, sha256=None, md5=None, size=None, user_id=None):
+    """Record the content hash of a Drive file so later uploads by its owner can reuse it"""
+    if not drive_file_id or not (sha256 or md5):
+        return
+    user_id = _owner_id(user_id)
+    existing = FileHash.query.filter_by(drive_file_id=drive_file_id).first()
+    if existing:
+        existing.sha256 = existing.sha256 or sha256
+        existing.md5 = existing.md5 or md5
+        existing.size = existing.size or size
+        existing.user_id = existing.user_id or user_id
+        return
+    db.session.add(FileHash(drive_file_id=drive_file_id, sha256=sha256, md5=md5, size=size, user_id=user_id))
+
+
+def upload_file_deduplicated(service, file_path, file_name, digests, user_id=None):
+    """
+    Upload a file to Drive unless the same account already stored identical content there.
+
+    Args:
+        user_id: User whose Drive service is passed in (defaults to the current user)
+
+    Returns:
+        (drive_file_id, reused) - drive_file_id is None if the upload failed
+    """
+    from yonca.google_drive_service import upload_file
+
+    user_id = _owner_id(user_id)
+    existing = find_drive_file(service, sha256=digests.sha256, user_id=user_id)
+    if existing:
+        logger.info('Reusing Drive file %s for %s (identical content)', existing.drive_file_id, file_name)
+        return existing.drive_file_id, True
+
+    drive_file_id = upload_file(service, file_path, file_name)
+    if drive_file_id:
+        register_drive_file(drive_file_id, sha256=digests.sha256, md5=digests.md5, size=digests.size, user_id=user_id)
+    return drive_file_id, False
+
+
+def drive_file_reference_count(drive_file_id):
+    """Count the database records that point at a Drive file"""
+    from yonca.models import CourseContent, CourseAssignmentSubmission, Resource, PDFDocument
+
+    return (
+        CourseContent.query.filter_by(drive_file_id=drive_file_id).count()
+        + CourseAssignmentSubmission.query.filter_by(drive_file_id=drive_file_id).count()
+        + Resource.query.filter_by(drive_file_id=drive_file_id).count()
+        + Resource.query.filter_by(preview_drive_file_id=drive_file_id).count()
+        + PDFDocument.query.filter_by(drive_file_id=drive_file_id).count()
+    )
+
+
+def referenced_drive_file_ids(drive_file_ids):
+    """Return the subset of drive_file_ids still referenced by any database record"""
+    from yonca.models import CourseContent, CourseAssignmentSubmission, Resource, PDFDocument
+
+    drive_file_ids = list(set(drive_file_ids))
+    if not drive_file_ids:
+        return set()
+
+    columns = (
+        CourseContent.drive_file_id,
+        CourseAssignmentSubmission.drive_file_id,
+        Resource.drive_file_id,
+        Resource.preview_drive_file_id,
+        PDFDocument.drive_file_id,
+    )
+    query = union(*[select(column).where(column.in_(drive_file_ids)) for column in columns])
+    return {row[0] for row in db.session.execute(query)}
+
+
+def drive_file_needs_public_access(drive_file_id):
+    """Whether any record that points at a Drive file makes it viewable by others"""
+    from sqlalchemy import or_
+    from yonca.models import CourseContent, CourseAssignmentSubmission, Resource, PDFDocument
+
+    queries = (
+        CourseContent.query.filter_by(drive_file_id=drive_file_id, allow_others_to_view=True),
+        CourseAssignmentSubmission.query.filter_by(drive_file_id=drive_file_id, allow_others_to_view=True),
+        # Preview images are always public
+        Resource.query.filter(or_(
+            Resource.preview_drive_file_id == drive_file_id,
+            (Resource.drive_file_id == drive_file_id) & Resource.allow_others_to_view.is_(True)
+        )),
+        PDFDocument.query.filter_by(drive_file_id=drive_file_id, allow_others_to_view=True),
+    )
+    return any(db.session.query(query.exists()).scalar() for query in queries)
+
+
+def update_drive_file_visibility(service, drive_file_id):
+    """
+    Make a Drive file public or private to match the records that point at it.
+
+    A deduplicated file can back several records, so it only loses its public
+    permission once none of them is visible to others. Call this after
+    changing a record's allow_others_to_view.
+    """
+    from yonca.google_drive_service import set_file_permissions
+
+    make_public = drive_file_needs_public_access(drive_file_id)
+    return set_file_permissions(service, drive_file_id, make_public=make_public)
+
+
+def delete_unreferenced_drive_file(service, drive_file_id):
+    """
+    Delete a Drive file only if the record being removed is its last user.
+
+    Call this before deleting the record from the database.
+    """
+    from yonca.file_cache import drive_file_cache
+    from yonca.google_drive_service import delete_file
+
+    # The proxy must stop serving the copy through this record either way
+    drive_file_cache.invalidate(drive_file_id)
+    if drive_file_reference_count(drive_file_id) > 1:
+        logger.info('Keeping Drive file %s: still referenced by other records', drive_file_id)
+        return False
+
+    FileHash.query.filter_by(drive_file_id=drive_file_id).delete()
+    return delete_file(service, drive_file_id)
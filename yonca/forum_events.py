@@ -0,0 +1,152 @@
+"""
+Real-time forum updates using PostgreSQL LISTEN/NOTIFY, streamed to browsers as Server-Sent Events
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from sqlalchemy import text
+from yonca.models import db
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'forum_events'
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+# Events buffered per open stream before the client is told to reload
+SUBSCRIBER_QUEUE_SIZE = 100
+# Open streams per process; each holds a server thread for as long as it is open
+DEFAULT_MAX_SUBSCRIBERS = 8
+
+
+def notify_forum_event(event, message):
+    """
+    Publish a forum message change.
+
+    The notification is sent by PostgreSQL when the current transaction
+    commits, so listeners never see changes that were rolled back.
+
+    Args:
+        event: 'created', 'updated' or 'deleted'
+        message: ForumMessage that changed (flushed, so it has an id)
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+
+    payload = {
+        'event': event,
+        'id': message.id,
+        'channel': message.channel,
+        'parent_id': message.parent_id,
+    }
+    if event != 'deleted':
+        payload.update({
+            'username': message.username,
+            'message': message.message,
+            'timestamp': message.timestamp.isoformat() if message.timestamp else None,
+        })
+
+    data = json.dumps(payload)
+    if len(data.encode()) > MAX_PAYLOAD_BYTES:
+        # Too large to send inline; clients fetch the message instead
+        payload.pop('message', None)
+        payload['truncated'] = True
+        data = json.dumps(payload)
+
+    db.session.execute(text("SELECT pg_notify(:channel, :payload)"), {'channel': NOTIFY_CHANNEL, 'payload': data})
+
+
+class ForumEventBroker:
+    """Fans out forum notifications from one LISTEN connection to every open stream in this process"""
+
+    def __init__(self):
+        self._dsn = None
+        self.max_subscribers = DEFAULT_MAX_SUBSCRIBERS
+        self._subscribers = {}  # forum channel slug -> set of queues
+        self._subscriber_count = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+        if uri.startswith('postgres'):
+            # psycopg2 takes a libpq URI without the SQLAlchemy driver suffix
+            scheme, rest = uri.split('://', 1)
+            self._dsn = f"postgresql://{rest}"
+        self.max_subscribers = app.config.get('FORUM_STREAM_MAX_SUBSCRIBERS', DEFAULT_MAX_SUBSCRIBERS)
+        app.extensions['forum_event_broker'] = self
+
+    @property
+    def available(self):
+        return self._dsn is not None
+
+    def subscribe(self, channel):
+        """Return a queue that receives events for a forum channel, or None if this process is at capacity"""
+        subscription = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if self._subscriber_count >= self.max_subscribers:
+                return None
+            self._subscribers.setdefault(channel, set()).add(subscription)
+            self._subscriber_count += 1
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._listen, daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, channel, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._subscriber_count -= 1
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def _dispatch(self, raw_payload):
+        try:
+            event = json.loads(raw_payload)
+        except ValueError:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers.get(event.get('channel'), ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                # The client is too far behind; drop its backlog and ask it to reload
+                with subscription.mutex:
+                    subscription.queue.clear()
+                subscription.put_nowait({'event': 'reset', 'channel': event.get('channel')})
+
+    def _listen(self):
+        """Hold a LISTEN connection and dispatch notifications, reconnecting on errors"""
+        import psycopg2
+
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self._dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL};")
+                logger.info('Forum event listener connected')
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error('Forum event listener error: %s', e)
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+# Global broker instance
+forum_event_broker = ForumEventBroker()
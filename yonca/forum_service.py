@@ -0,0 +1,85 @@
+"""
+Paginated loading of forum threads
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import select, tuple_, literal_column
+from yonca.models import db, ForumMessage
+
+
+def encode_cursor(message):
+    """Opaque keyset cursor pointing just after a top-level message"""
+    raw = f"{message.timestamp.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) from a cursor, or None if it is malformed"""
+    try:
+        timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class ThreadPage:
+    """One page of top-level messages with their replies arranged in memory"""
+
+    def __init__(self, roots, replies, max_depth, next_cursor):
+        self.roots = roots
+        self.max_depth = max_depth
+        self.next_cursor = next_cursor
+        self._children = {}
+        for reply in replies:
+            self._children.setdefault(reply.parent_id, []).append(reply)
+
+    def replies(self, message):
+        return self._children.get(message.id, [])
+
+
+def load_thread_page(channel, limit, cursor=None, max_depth=10):
+    """
+    Load a page of threads (newest first) and all their replies in one query.
+
+    A recursive CTE starts from the page of top-level messages and walks down to
+    max_depth. One more level is fetched so that truncated threads can be flagged.
+
+    Args:
+        channel: Channel slug
+        limit: Number of top-level messages per page
+        cursor: Cursor returned with the previous page, or None for the first page
+        max_depth: Deepest reply level to include (top-level messages are depth 0)
+
+    Returns:
+        ThreadPage
+    """
+    page = select(ForumMessage.id).where(ForumMessage.channel == channel, ForumMessage.parent_id.is_(None))
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        page = page.where(tuple_(ForumMessage.timestamp, ForumMessage.id) < tuple_(*position))
+    page = page.order_by(ForumMessage.timestamp.desc(), ForumMessage.id.desc()).limit(limit + 1).subquery()
+
+    tree = select(
+        page.c.id, page.c.id.label('root_id'), literal_column('0').label('depth')
+    ).cte(name='thread_tree', recursive=True)
+    tree = tree.union_all(
+        select(ForumMessage.id, tree.c.root_id, tree.c.depth + 1)
+        .where(ForumMessage.parent_id == tree.c.id, tree.c.depth <= max_depth)
+    )
+
+    rows = (
+        db.session.query(ForumMessage, tree.c.root_id, tree.c.depth)
+        .join(tree, ForumMessage.id == tree.c.id)
+        .order_by(ForumMessage.timestamp.asc(), ForumMessage.id.asc())
+        .all()
+    )
+
+    roots = sorted((m for m, _, depth in rows if depth == 0), key=lambda m: (m.timestamp, m.id), reverse=True)
+    next_cursor = None
+    if len(roots) > limit:
+        roots = roots[:limit]
+        next_cursor = encode_cursor(roots[-1])
+    root_ids = {root.id for root in roots}
+
+    replies = [message for message, root_id, depth in rows if depth > 0 and root_id in root_ids]
+    return ThreadPage(roots, replies, max_depth, next_cursor)
@@ -0,0 +1,94 @@
+"""
+Rendered-fragment cache for Jinja templates.
+
+Wrap a section whose output depends only on the locale and the active home
+content in a cache block:
+
+    {% cache 'site_footer' %}
+        ...
+    {% endcache %}
+
+The block is rendered once per (fragment, locale, home content version,
+auth bucket) and then served from a bounded per-process LRU. Do not cache
+anything that shows per-user data, flashed messages or CSRF tokens.
+"""
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """Size-bounded in-memory LRU of rendered template fragments"""
+
+    def __init__(self, max_entries=256):
+        self.enabled = True
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the cache from the Flask app config and register the {% cache %} tag"""
+        self.enabled = app.config.get('FRAGMENT_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', self.max_entries)
+        app.jinja_env.add_extension(FragmentCacheExtension)
+
+    def get(self, key):
+        with self._lock:
+            rendered = self._entries.get(key)
+            if rendered is not None:
+                self._entries.move_to_end(key)
+            return rendered
+
+    def set(self, key, rendered):
+        with self._lock:
+            self._entries[key] = rendered
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def fragment_key(name):
+    """Cache key for a fragment in the current request"""
+    from flask_babel import get_locale
+    from flask_login import current_user
+    from yonca.home_content_cache import home_content_cache
+
+    if not current_user.is_authenticated:
+        auth_bucket = 'anonymous'
+    elif getattr(current_user, 'is_admin', False):
+        auth_bucket = 'admin'
+    else:
+        auth_bucket = 'user'
+    return (name, str(get_locale() or 'en'), home_content_cache.get().version, auth_bucket)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the {% cache 'name' %}...{% endcache %} tag"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_fragment', args), [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, name, caller):
+        if not fragment_cache.enabled:
+            return caller()
+
+        key = fragment_key(name)
+        rendered = fragment_cache.get(key)
+        if rendered is None:
+            rendered = caller()
+            fragment_cache.set(key, rendered)
+        return rendered
+
+
+# Global cache instance
+fragment_cache = FragmentCache()
@@ -4,6 +4,7 @@ Google Drive service for file uploads and sharing
 from __future__ import print_function
 import os.path
 import json
+import logging
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
@@ -11,6 +12,9 @@ from googleapiclient.errors import HttpError
 from flask import url_for, current_app
 from datetime import datetime, timedelta, timedelta
 import requests
+from yonca.request_timing import timed_external
+
+logger = logging.getLogger(__name__)
 
 # Google Drive API scopes - using drive.file scope for least privilege access
 # Only allows access to files created by the app or selected by user via Picker
@@ -24,7 +28,7 @@ def authenticate(user=None):
         user = current_user
     
     if not user or not user.google_access_token:
-        print('No Google OAuth tokens available for user')
+        logger.warning('No Google OAuth tokens available for user')
         return None
 
     creds = None
@@ -35,7 +39,7 @@ def authenticate(user=None):
             creds = refresh_credentials(user)
             if not creds:
                 # Refresh failed, clear tokens
-                print('Token refresh failed, clearing tokens')
+                logger.warning('Token refresh failed, clearing tokens')
                 user.google_access_token = None
                 user.google_refresh_token = None
                 user.google_token_expiry = None
@@ -43,7 +47,7 @@ def authenticate(user=None):
                 db.session.commit()
                 return None
         else:
-            print('Access token expired and no refresh token available')
+            logger.warning('Access token expired and no refresh token available')
             # Clear expired token
             user.google_access_token = None
             user.google_refresh_token = None
@@ -78,10 +82,10 @@ def authenticate(user=None):
                 if hasattr(service._http, 'http') and hasattr(service._http.http, 'timeout'):
                     service._http.http.timeout = 300  # Also set on underlying httplib2.Http
             
-            print("Google Drive service authenticated successfully using OAuth (with 5min timeout)")
+            logger.debug('Google Drive service authenticated successfully using OAuth (with 5min timeout)')
             return service
         except Exception as e:
-            print(f'Failed to build Google Drive service: {e}')
+            logger.error('Failed to build Google Drive service: %s', e)
             # Clear invalid tokens so user can re-authenticate
             user.google_access_token = None
             user.google_refresh_token = None
@@ -90,7 +94,7 @@ def authenticate(user=None):
             db.session.commit()
             return None
     else:
-        print('Failed to authenticate with Google Drive')
+        logger.error('Failed to authenticate with Google Drive')
         return None
 
 def get_linked_google_account(user=None):
@@ -108,7 +112,7 @@ def get_linked_google_account(user=None):
             creds = refresh_credentials(user)
             if not creds:
                 # Refresh failed, clear tokens
-                print('Token refresh failed for account info, clearing tokens')
+                logger.warning('Token refresh failed for account info, clearing tokens')
                 user.google_access_token = None
                 user.google_refresh_token = None
                 user.google_token_expiry = None
@@ -116,7 +120,7 @@ def get_linked_google_account(user=None):
                 db.session.commit()
                 return {'error': 'Token refresh failed'}
         else:
-            print('Access token expired and no refresh token available for account info')
+            logger.warning('Access token expired and no refresh token available for account info')
             # Clear expired token
             user.google_access_token = None
             user.google_refresh_token = None
@@ -141,7 +145,7 @@ def get_linked_google_account(user=None):
     except requests.HTTPError as e:
         if e.response.status_code == 401:
             # Token is invalid/expired, clear it
-            print('Token is invalid (401), clearing tokens')
+            logger.warning('Token is invalid (401), clearing tokens')
             user.google_access_token = None
             user.google_refresh_token = None
             user.google_token_expiry = None
@@ -149,12 +153,13 @@ def get_linked_google_account(user=None):
             db.session.commit()
             return {'error': 'Invalid or expired token'}
         else:
-            print(f'Failed to get Google account info: HTTP {e.response.status_code}')
+            logger.error('Failed to get Google account info: HTTP %s', e.response.status_code)
             return {'error': f'HTTP {e.response.status_code}: {e.response.text}'}
     except Exception as e:
-        print(f'Failed to get Google account info: {e}')
+        logger.error('Failed to get Google account info: %s', e)
         return {'error': str(e)}
 
+@timed_external('drive')
 def refresh_credentials(user):
     """Refresh expired access token"""
     client_id = current_app.config.get('GOOGLE_CLIENT_ID')
@@ -193,9 +198,10 @@ def refresh_credentials(user):
             scopes=SCOPES
         )
     except Exception as e:
-        print(f'Failed to refresh token: {e}')
+        logger.warning('Failed to refresh token: %s', e)
         return None
 
+@timed_external('drive')
 def upload_file(service, file_path, file_name=None, folder_id=None):
     """Upload a file and return its file ID"""
     if file_name is None:
@@ -215,24 +221,26 @@ def upload_file(service, file_path, file_name=None, folder_id=None):
         ).execute()
         return uploaded_file['id']
     except HttpError as error:
-        print(f'An error occurred: {error}')
+        logger.error('An error occurred: %s', error)
         return None
 
+@timed_external('drive')
 def create_view_only_link(service, file_id, is_image=False):
     """Create a view-only link for files - returns direct Google Drive link"""
-    print(f"DEBUG: create_view_only_link called with file_id={file_id}, is_image={is_image}")
+    logger.debug('create_view_only_link called with file_id=%s, is_image=%s', file_id, is_image)
     
     if is_image:
         # For images, return direct Google Drive image link
         view_link = f"https://lh3.googleusercontent.com/d/{file_id}"
-        print(f"DEBUG: Returning image view_link: {view_link}")
+        logger.debug('Returning image view_link: %s', view_link)
         return view_link
     else:
         # For non-images (PDFs, documents), return direct Google Drive viewer link
         view_link = f"https://drive.google.com/file/d/{file_id}/view"
-        print(f"DEBUG: Returning file view_link: {view_link}")
+        logger.debug('Returning file view_link: %s', view_link)
         return view_link
 
+@timed_external('drive')
 def set_file_permissions(service, file_id, make_public=False, max_retries=3):
     """Set file permissions on Google Drive file with retry logic and timeout handling"""
     import time
@@ -252,9 +260,9 @@ def set_file_permissions(service, file_id, make_public=False, max_retries=3):
                     fields='id'
                 ).execute()
                 elapsed = time.time() - start_time
-                print(f"DEBUG: File {file_id} made public (took {elapsed:.2f}s)")
+                logger.debug('File %s made public (took %.2fs)', file_id, elapsed)
                 if elapsed > 30:  # Warn if taking more than 30 seconds
-                    print(f"WARNING: Making file public took {elapsed:.2f}s - approaching timeout limits")
+                    logger.warning('Making file public took %.2fs - approaching timeout limits', elapsed)
                 return True
             else:
                 # Remove public permissions to make file private
@@ -266,47 +274,90 @@ def set_file_permissions(service, file_id, make_public=False, max_retries=3):
                     for permission in permissions.get('permissions', []):
                         if permission.get('type') == 'anyone':
                             service.permissions().delete(fileId=file_id, permissionId=permission['id']).execute()
-                            print(f"DEBUG: Removed public permission from file {file_id}")
+                            logger.debug('Removed public permission from file %s', file_id)
                     
                     elapsed = time.time() - start_time
-                    print(f"DEBUG: File {file_id} made private (took {elapsed:.2f}s)")
+                    logger.debug('File %s made private (took %.2fs)', file_id, elapsed)
                     if elapsed > 30:  # Warn if taking more than 30 seconds
-                        print(f"WARNING: Making file private took {elapsed:.2f}s - approaching timeout limits")
+                        logger.warning('Making file private took %.2fs - approaching timeout limits', elapsed)
                     return True
                 except HttpError as error:
-                    print(f'Error removing public permissions: {error}')
+                    logger.error('Error removing public permissions: %s', error)
                     # If removing fails, still return True to not break the flow
-                    print(f"DEBUG: File {file_id} kept as is (may already be private)")
+                    logger.debug('File %s kept as is (may already be private)', file_id)
                     return True
         except HttpError as error:
             elapsed = time.time() - start_time
-            print(f'An error occurred setting permissions (attempt {attempt + 1}/{max_retries + 1}, {elapsed:.2f}s): {error}')
+            logger.warning('An error occurred setting permissions (attempt %s/%s, %.2fs): %s', attempt + 1, max_retries + 1, elapsed, error)
             if attempt < max_retries:
-                print(f'Retrying in 1 second...')
+                logger.info('Retrying in 1 second...')
                 time.sleep(1)
                 continue
             return False
         except (ConnectionResetError, ConnectionError, TimeoutError, OSError) as error:
             elapsed = time.time() - start_time
-            print(f'Network/timeout error occurred setting permissions for file {file_id} (attempt {attempt + 1}/{max_retries + 1}, {elapsed:.2f}s): {error}')
+            logger.warning('Network/timeout error occurred setting permissions for file %s (attempt %s/%s, %.2fs): %s', file_id, attempt + 1, max_retries + 1, elapsed, error)
             if attempt < max_retries:
                 # Exponential backoff for timeout errors
                 delay = min(2 ** attempt, 10)  # Max 10 seconds delay
-                print(f'Retrying in {delay} seconds...')
+                logger.info('Retrying in %s seconds...', delay)
                 time.sleep(delay)
                 continue
-            print(f'DEBUG: File {file_id} permissions unchanged due to network/timeout issues after {max_retries + 1} attempts - continuing import')
+            logger.debug('File %s permissions unchanged due to network/timeout issues after %s attempts - continuing import', file_id, max_retries + 1)
             return True  # Return True to not break the import flow
 
+@timed_external('drive')
 def delete_file(service, file_id):
     """Delete a file from Google Drive"""
+    from yonca.file_cache import drive_file_cache
     try:
         service.files().delete(fileId=file_id).execute()
+        drive_file_cache.invalidate(file_id)
         return True
     except HttpError as error:
-        print(f'An error occurred: {error}')
+        logger.error('An error occurred: %s', error)
         return False
 
+# Google Drive accepts at most 100 calls per batch request
+DRIVE_BATCH_SIZE = 100
+
+@timed_external('drive')
+def delete_files_batch(service, file_ids):
+    """
+    Delete many files from Google Drive using batch requests.
+
+    Files that no longer exist count as deleted.
+
+    Returns:
+        (deleted_ids, failed_ids)
+    """
+    from yonca.file_cache import drive_file_cache
+    deleted, failed = [], []
+
+    def on_response(request_id, response, exception):
+        if exception is None or (isinstance(exception, HttpError) and exception.resp.status == 404):
+            deleted.append(request_id)
+            drive_file_cache.invalidate(request_id)
+        else:
+            logger.error('Error deleting file %s: %s', request_id, exception)
+            failed.append(request_id)
+
+    file_ids = list(dict.fromkeys(file_ids))
+    for start in range(0, len(file_ids), DRIVE_BATCH_SIZE):
+        chunk = file_ids[start:start + DRIVE_BATCH_SIZE]
+        batch = service.new_batch_http_request(callback=on_response)
+        for file_id in chunk:
+            batch.add(service.files().delete(fileId=file_id, supportsAllDrives=True), request_id=file_id)
+        try:
+            batch.execute()
+        except (HttpError, ConnectionResetError, ConnectionError, TimeoutError, OSError) as error:
+            logger.error('Batch delete request failed: %s', error)
+            answered = set(deleted) | set(failed)
+            failed.extend(file_id for file_id in chunk if file_id not in answered)
+
+    return deleted, failed
+
+@timed_external('drive')
 def download_file(service, file_id, local_path):
     """Download a file from Google Drive to local path"""
     from googleapiclient.http import MediaIoBaseDownload
@@ -319,12 +370,72 @@ def download_file(service, file_id, local_path):
             done = False
             while done is False:
                 status, done = downloader.next_chunk()
-                print(f"Download {int(status.progress() * 100)}%.")
+                logger.debug('Download %s%%.', int(status.progress() * 100))
         return True
     except HttpError as error:
-        print(f'An error occurred downloading file: {error}')
+        logger.error('An error occurred downloading file: %s', error)
         return False
 
+def _content_metadata(file_id, metadata):
+    """Build the cache metadata (mime type, ETag) for a downloaded Drive file"""
+    version = metadata.get('md5Checksum') or f"{file_id}-{metadata.get('modifiedTime', '')}"
+    return {
+        'name': metadata.get('name'),
+        'mime_type': metadata.get('mimeType') or 'application/octet-stream',
+        'etag': version
+    }
+
+@timed_external('drive')
+def fetch_file_content(service, file_id, local_path):
+    """Download a Drive file to local_path and return its metadata, or None on failure"""
+    from googleapiclient.http import MediaIoBaseDownload
+    import io
+
+    try:
+        metadata = service.files().get(
+            fileId=file_id,
+            fields='id, name, mimeType, md5Checksum, modifiedTime',
+            supportsAllDrives=True
+        ).execute()
+        request = service.files().get_media(fileId=file_id)
+        with io.FileIO(local_path, 'wb') as fh:
+            downloader = MediaIoBaseDownload(fh, request, chunksize=8 * 1024 * 1024)
+            done = False
+            while done is False:
+                status, done = downloader.next_chunk()
+        return _content_metadata(file_id, metadata)
+    except HttpError as error:
+        logger.error('An error occurred fetching file content for %s: %s', file_id, error)
+        return None
+    except (ConnectionResetError, ConnectionError, TimeoutError, OSError) as error:
+        logger.warning('Network/timeout error fetching file content for %s: %s', file_id, error)
+        return None
+
+@timed_external('drive')
+def fetch_public_file_content(file_id, local_path, api_key):
+    """Download a publicly shared Drive file using only the API key"""
+    if not api_key:
+        return None
+
+    file_url = f'https://www.googleapis.com/drive/v3/files/{file_id}'
+    try:
+        response = requests.get(file_url, params={
+            'fields': 'id, name, mimeType, md5Checksum, modifiedTime',
+            'key': api_key
+        }, timeout=30)
+        response.raise_for_status()
+        metadata = response.json()
+
+        with requests.get(file_url, params={'alt': 'media', 'key': api_key}, stream=True, timeout=300) as media:
+            media.raise_for_status()
+            with open(local_path, 'wb') as fh:
+                for chunk in media.iter_content(chunk_size=1024 * 1024):
+                    fh.write(chunk)
+        return _content_metadata(file_id, metadata)
+    except requests.RequestException as error:
+        logger.error('Failed to fetch public file content for %s: %s', file_id, error)
+        return None
+
 def extract_file_id_from_url(drive_url):
     """Extract Google Drive file ID from various URL formats"""
     import re
@@ -347,6 +458,7 @@ def extract_file_id_from_url(drive_url):
     
     return None
 
+@timed_external('drive')
 def get_file_metadata(service, file_id):
     """Get metadata for a Google Drive file"""
     import time
@@ -355,24 +467,25 @@ def get_file_metadata(service, file_id):
     try:
         file = service.files().get(
             fileId=file_id,
-            fields='id, name, mimeType, size, webViewLink, iconLink'
+            fields='id, name, mimeType, size, md5Checksum, webViewLink, iconLink'
         ).execute()
         
         elapsed = time.time() - start_time
-        print(f"DEBUG: get_file_metadata for {file_id} took {elapsed:.2f}s")
+        logger.debug('get_file_metadata for %s took %.2fs', file_id, elapsed)
         if elapsed > 30:  # Warn if taking more than 30 seconds
-            print(f"WARNING: get_file_metadata took {elapsed:.2f}s - approaching timeout limits")
+            logger.warning('get_file_metadata took %.2fs - approaching timeout limits', elapsed)
         return file
     except HttpError as error:
         elapsed = time.time() - start_time
-        print(f'An error occurred getting file metadata after {elapsed:.2f}s: {error}')
+        logger.error('An error occurred getting file metadata after %.2fs: %s', elapsed, error)
         # Return error information for better handling
         return {'error': str(error), 'error_code': error.resp.status}
     except (ConnectionResetError, ConnectionError, TimeoutError, OSError) as error:
         elapsed = time.time() - start_time
-        print(f'Network/timeout error occurred getting file metadata for {file_id} after {elapsed:.2f}s: {error}')
+        logger.warning('Network/timeout error occurred getting file metadata for %s after %.2fs: %s', file_id, elapsed, error)
         return {'error': f'Network/timeout error: {str(error)}', 'error_code': 0}
 
+@timed_external('drive')
 def list_folder_contents(service, folder_id):
     """List all files and folders in a Google Drive folder"""
     import time
@@ -381,25 +494,61 @@ def list_folder_contents(service, folder_id):
     try:
         results = service.files().list(
             q=f"'{folder_id}' in parents and trashed=false",
-            fields='files(id, name, mimeType, size, webViewLink, iconLink)',
+            fields='files(id, name, mimeType, size, md5Checksum, webViewLink, iconLink)',
             pageSize=1000  # Increase page size to handle more files
         ).execute()
         
         elapsed = time.time() - start_time
         items_count = len(results.get('files', []))
-        print(f"DEBUG: list_folder_contents for {folder_id} returned {items_count} items in {elapsed:.2f}s")
+        logger.debug('list_folder_contents for %s returned %s items in %.2fs', folder_id, items_count, elapsed)
         if elapsed > 30:  # Warn if taking more than 30 seconds
-            print(f"WARNING: list_folder_contents took {elapsed:.2f}s - approaching timeout limits")
+            logger.warning('list_folder_contents took %.2fs - approaching timeout limits', elapsed)
         return results.get('files', [])
     except HttpError as error:
         elapsed = time.time() - start_time
-        print(f'An error occurred listing folder contents after {elapsed:.2f}s: {error}')
+        logger.error('An error occurred listing folder contents after %.2fs: %s', elapsed, error)
         return []
     except (ConnectionResetError, ConnectionError, TimeoutError, OSError) as error:
         elapsed = time.time() - start_time
-        print(f'Network/timeout error occurred listing folder contents for {folder_id} after {elapsed:.2f}s: {error}')
+        logger.warning('Network/timeout error occurred listing folder contents for %s after %.2fs: %s', folder_id, elapsed, error)
         return []
 
+@timed_external('drive')
+def get_start_page_token(service):
+    """Return the current Changes API page token, or None if it cannot be retrieved"""
+    try:
+        response = service.changes().getStartPageToken(supportsAllDrives=True).execute()
+        return response.get('startPageToken')
+    except HttpError as error:
+        logger.warning('An error occurred getting the changes start page token: %s', error)
+        return None
+
+@timed_external('drive')
+def list_changes(service, page_token):
+    """
+    List all changes since page_token using the Drive Changes API.
+
+    Returns:
+        (changes, new_page_token) - new_page_token is the cursor for the next sync
+    """
+    changes = []
+    while page_token:
+        response = service.changes().list(
+            pageToken=page_token,
+            pageSize=1000,
+            includeRemoved=True,
+            spaces='drive',
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True,
+            fields='nextPageToken, newStartPageToken, changes(fileId, removed, file(id, name, mimeType, parents, trashed, size, md5Checksum, webViewLink, iconLink))'
+        ).execute()
+        changes.extend(response.get('changes', []))
+        if 'newStartPageToken' in response:
+            return changes, response['newStartPageToken']
+        page_token = response.get('nextPageToken')
+    return changes, page_token
+
+@timed_external('drive')
 def collect_folder_structure(service, folder_id, base_path=""):
     """Recursively collect all files and folders from a Google Drive folder structure"""
     structure = {
@@ -430,26 +579,32 @@ def collect_folder_structure(service, folder_id, base_path=""):
                     'path': item_path,
                     'mime_type': item.get('mimeType'),
                     'size': item.get('size'),
+                    'md5_checksum': item.get('md5Checksum'),
                     'web_view_link': item.get('webViewLink'),
                     'icon_link': item.get('iconLink')
                 })
         
         return structure
     except Exception as e:
-        print(f'Error collecting folder structure: {e}')
+        logger.error('Error collecting folder structure: %s', e)
         return structure
 
-def import_drive_file(service, file_id_or_url):
-    """Import a single file from Google Drive and return its metadata with view link"""
-    print(f"DEBUG: import_drive_file called with: {file_id_or_url}")
+@timed_external('drive')
+def import_drive_file(service, file_id_or_url, user_id=None):
+    """
+    Import a single file from Google Drive and return its metadata with view link.
+
+    user_id is the account whose service is passed in (defaults to the current user).
+    """
+    logger.debug('import_drive_file called with: %s', file_id_or_url)
     file_id = extract_file_id_from_url(file_id_or_url)
-    print(f"DEBUG: extracted file_id: {file_id}")
+    logger.debug('extracted file_id: %s', file_id)
     if not file_id:
-        print("DEBUG: No file_id extracted, returning None")
+        logger.debug('No file_id extracted, returning None')
         return None
     
     metadata = get_file_metadata(service, file_id)
-    print(f"DEBUG: get_file_metadata returned: {metadata}")
+    logger.debug('get_file_metadata returned: %s', metadata)
     
     # Check if metadata contains an error
     if isinstance(metadata, dict) and 'error' in metadata:
@@ -462,7 +617,7 @@ def import_drive_file(service, file_id_or_url):
             return {'error': f'Google Drive API error: {metadata["error"]}'}
     
     if not metadata:
-        print("DEBUG: No metadata retrieved, returning None")
+        logger.debug('No metadata retrieved, returning None')
         return {'error': 'Failed to retrieve file metadata'}
     
     # Ensure file has proper sharing permissions
@@ -477,24 +632,36 @@ def import_drive_file(service, file_id_or_url):
         'name': metadata.get('name'),
         'mime_type': metadata.get('mimeType'),
         'size': metadata.get('size'),
+        'md5_checksum': metadata.get('md5Checksum'),
         'view_link': view_link or metadata.get('webViewLink'),
         'icon_link': metadata.get('iconLink')
     }
-    print(f"DEBUG: import_drive_file returning: {result['name']}")
+    
+    # Index the content hash so identical uploads can reuse this file
+    if result['md5_checksum']:
+        from yonca.file_dedup import register_drive_file
+        register_drive_file(file_id, md5=result['md5_checksum'], size=int(result['size']) if result['size'] else None,
+                            user_id=user_id)
+    logger.debug('import_drive_file returning: %s', result['name'])
     return result
 
-def import_drive_folder(service, folder_id_or_url):
-    """Import all files and folders from a Google Drive folder recursively and return metadata"""
-    print(f"DEBUG: import_drive_folder called with: {folder_id_or_url}")
+@timed_external('drive')
+def import_drive_folder(service, folder_id_or_url, user_id=None):
+    """
+    Import all files and folders from a Google Drive folder recursively and return metadata.
+
+    user_id is the account whose service is passed in (defaults to the current user).
+    """
+    logger.debug('import_drive_folder called with: %s', folder_id_or_url)
     folder_id = extract_file_id_from_url(folder_id_or_url)
-    print(f"DEBUG: extracted folder_id: {folder_id}")
+    logger.debug('extracted folder_id: %s', folder_id)
     if not folder_id:
-        print("DEBUG: No folder_id extracted, returning None")
+        logger.debug('No folder_id extracted, returning None')
         return None
     
     # Get folder metadata
     folder_metadata = get_file_metadata(service, folder_id)
-    print(f"DEBUG: folder_metadata: {folder_metadata}")
+    logger.debug('folder_metadata: %s', folder_metadata)
     
     # Check if folder_metadata contains an error
     if isinstance(folder_metadata, dict) and 'error' in folder_metadata:
@@ -507,17 +674,21 @@ def import_drive_folder(service, folder_id_or_url):
             return {'error': f'Google Drive API error: {folder_metadata["error"]}'}
     
     if not folder_metadata or folder_metadata.get('mimeType') != 'application/vnd.google-apps.folder':
-        print("DEBUG: Invalid folder metadata or not a folder, returning None")
+        logger.debug('Invalid folder metadata or not a folder, returning None')
         return {'error': 'Invalid folder. Please make sure the URL points to a Google Drive folder.'}
     
+    # Take the changes cursor before listing so edits made during the import are picked up by the next sync
+    start_page_token = get_start_page_token(service)
+
     # Recursively collect all files and folders
     folder_structure = collect_folder_structure(service, folder_id)
-    print(f"DEBUG: Collected folder structure with {len(folder_structure['folders'])} folders and {len(folder_structure['files'])} files")
+    logger.debug('Collected folder structure with %s folders and %s files', len(folder_structure['folders']), len(folder_structure['files']))
     
     # Flatten the structure into a list of files with their folder paths
     all_files = []
+    all_folders = []
     
-    def flatten_structure(structure, current_path=""):
+    def flatten_structure(structure, current_path="", parent_id=folder_id):
         """Flatten the nested folder structure into a list of files with paths"""
         # Add files from current level
         for file_info in structure['files']:
@@ -527,8 +698,10 @@ def import_drive_folder(service, folder_id_or_url):
                 'name': file_info['name'],
                 'path': file_path,
                 'folder_path': current_path,
+                'parent_id': parent_id,
                 'mime_type': file_info['mime_type'],
                 'size': file_info['size'],
+                'md5_checksum': file_info.get('md5_checksum'),
                 'web_view_link': file_info['web_view_link'],
                 'icon_link': file_info['icon_link']
             })
@@ -536,26 +709,55 @@ def import_drive_folder(service, folder_id_or_url):
         # Recursively process subfolders
         for folder_info in structure['folders']:
             folder_path = f"{current_path}/{folder_info['name']}" if current_path else folder_info['name']
-            flatten_structure(folder_info['structure'], folder_path)
+            all_folders.append({
+                'id': folder_info['id'],
+                'name': folder_info['name'],
+                'path': folder_path,
+                'parent_id': parent_id
+            })
+            flatten_structure(folder_info['structure'], folder_path, folder_info['id'])
     
     flatten_structure(folder_structure)
     
     # Process each file to get proper view links and permissions
+    from yonca.file_dedup import find_drive_file
     imported_files = []
+    reused_count = 0
     for file_info in all_files:
-        # Import the file (this sets permissions and creates view links)
-        file_data = import_drive_file(service, file_info['file_id'])
-        if file_data:
+        # Files whose content is already on Drive (same md5Checksum) reuse the
+        # existing file and skip the per-file metadata and permission calls
+        existing = find_drive_file(service, md5=file_info.get('md5_checksum'), user_id=user_id) if file_info.get('md5_checksum') else None
+        if existing:
+            is_image = (file_info.get('mime_type') or '').startswith('image/')
+            file_data = {
+                'file_id': existing.drive_file_id,
+                'name': file_info['name'],
+                'mime_type': file_info.get('mime_type'),
+                'size': file_info.get('size'),
+                'md5_checksum': file_info.get('md5_checksum'),
+                'view_link': create_view_only_link(service, existing.drive_file_id, is_image),
+                'icon_link': file_info.get('icon_link')
+            }
+            reused_count += 1
+        else:
+            # Import the file (this sets permissions and creates view links)
+            file_data = import_drive_file(service, file_info['file_id'], user_id=user_id)
+        if file_data and 'error' not in file_data:
             # Add folder path information
             file_data['folder_path'] = file_info['folder_path']
             file_data['full_path'] = file_info['path']
+            file_data['parent_id'] = file_info['parent_id']
+            file_data['source_file_id'] = file_info['file_id']
             imported_files.append(file_data)
     
     result = {
         'folder_name': folder_metadata.get('name'),
         'folder_id': folder_id,
+        'start_page_token': start_page_token,
+        'folders': all_folders,
         'files': imported_files,
-        'total_files': len(imported_files)
+        'total_files': len(imported_files),
+        'reused_files': reused_count
     }
-    print(f"DEBUG: import_drive_folder returning {len(imported_files)} files from recursive import")
+    logger.debug('import_drive_folder returning %s files from recursive import (%s reused by content hash)', len(imported_files), reused_count)
     return result
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+In-process snapshot of the active HomeContent row and its translations
+"""
+import threading
+import time
+import uuid
+from types import MappingProxyType
+from yonca.models import db, HomeContent, ContentTranslation, AppSetting
+
+# AppSetting row whose value changes whenever home content is saved
+VERSION_KEY = 'home_content_version'
+
+
+def _freeze(value):
+    """Read-only copy of a JSON value"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class HomeContentSnapshot:
+    """
+    Immutable copy of the active HomeContent, with every translation preloaded.
+
+    Attribute access mirrors the model (home_content.site_name, .features, ...).
+    JSON columns come back as tuples and read-only mappings.
+    """
+
+    def __init__(self, values, translations, version):
+        object.__setattr__(self, '_values', values)
+        object.__setattr__(self, '_translations', translations)  # (language, field_name) -> text
+        object.__setattr__(self, '_resolved_json', {})  # (language, field_name) -> translated items
+        object.__setattr__(self, 'version', version)
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError('HomeContentSnapshot is read-only')
+
+    def translate(self, field_name, original_text, language):
+        """Translated text of a field, or the original if there is no translation"""
+        if not language:
+            return original_text
+        return self._translations.get((str(language), field_name), original_text)
+
+    def translate_json(self, field_name, json_array, language):
+        """Translated items of a JSON array field; resolved once per language"""
+        from yonca.content_translator import translate_json_items
+
+        if not language or str(language) == 'en' or not json_array:
+            return json_array
+        key = (str(language), field_name)
+        if key not in self._resolved_json:
+            self._resolved_json[key] = _freeze(translate_json_items(
+                field_name, json_array,
+                lambda sub_field_name, text: self.translate(sub_field_name, text, language)
+            ))
+        return self._resolved_json[key]
+
+    def __repr__(self):
+        return f'<HomeContentSnapshot {self._values.get("id")} v{self.version}>'
+
+
+class HomeContentCache:
+    """
+    Serves the active HomeContent from memory.
+
+    Each process keeps one snapshot and compares it with the version stamp in
+    AppSetting at most every HOME_CONTENT_VERSION_CHECK_INTERVAL seconds.
+    Admin saves call bump_version(), so other workers pick up changes within
+    that interval and the saving worker does so immediately.
+    """
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the cache from the Flask app config"""
+        self.check_interval = app.config.get('HOME_CONTENT_VERSION_CHECK_INTERVAL', self.check_interval)
+
+    def get(self):
+        """Return the current HomeContentSnapshot"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            version = db.session.query(AppSetting.value).filter_by(key=VERSION_KEY).scalar()
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._load(version)
+                self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def bump_version(self, session=None):
+        """Mark home content as changed; call before committing the change"""
+        session = session or db.session
+        setting = session.query(AppSetting).filter_by(key=VERSION_KEY).first()
+        if setting is None:
+            setting = AppSetting(key=VERSION_KEY, value='')
+            session.add(setting)
+        setting.value = uuid.uuid4().hex
+        self._snapshot = None
+
+    def _load(self, version):
+        home_content = HomeContent.query.filter_by(is_active=True).first()
+        values = {
+            column.key: _freeze(getattr(home_content, column.key)) if home_content else None
+            for column in HomeContent.__table__.columns
+        }
+
+        translations = {}
+        if home_content:
+            for language, field_name, text in db.session.query(
+                ContentTranslation.target_language,
+                ContentTranslation.field_name,
+                ContentTranslation.translated_text
+            ).filter_by(content_type='home_content', content_id=home_content.id):
+                translations[(language, field_name)] = text
+
+        return HomeContentSnapshot(values, translations, version)
+
+
+# Global cache instance
+home_content_cache = HomeContentCache()
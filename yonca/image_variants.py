@@ -0,0 +1,122 @@
+"""
+Image pipeline that builds resized, recompressed variants of uploaded images for srcset
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps, features
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    logger.warning("Pillow not available, responsive image variants will not be generated")
+
+# Widths (in pixels) of the generated variants; larger widths than the original are skipped
+VARIANT_WIDTHS = (320, 640, 1280)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Formats that are passed through untouched (vector or possibly animated)
+SKIP_EXTENSIONS = {'.svg', '.gif'}
+
+
+def _output_format():
+    """Return (PIL format, extension, mime type) for variants, preferring WebP"""
+    if features.check('webp'):
+        return 'WEBP', '.webp', 'image/webp'
+    return 'JPEG', '.jpg', 'image/jpeg'
+
+
+def generate_image_variants(source_path, widths=VARIANT_WIDTHS):
+    """
+    Write resized copies of an image next to the source file.
+
+    Args:
+        source_path: Path to the original image
+        widths: Target widths in pixels
+
+    Returns:
+        (original_width, variants) where variants is a list of dicts with
+        'width', 'path' and 'mime_type'. Returns (None, []) if the image cannot
+        be processed.
+    """
+    if not PIL_AVAILABLE or os.path.splitext(source_path)[1].lower() in SKIP_EXTENSIONS:
+        return None, []
+
+    try:
+        with Image.open(source_path) as img:
+            img = ImageOps.exif_transpose(img)
+            original_width = img.width
+            pil_format, ext, mime_type = _output_format()
+            if pil_format == 'JPEG' or img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGB' if pil_format == 'JPEG' else 'RGBA')
+
+            base_path = os.path.splitext(source_path)[0]
+            variants = []
+            for width in sorted(widths):
+                if width >= original_width:
+                    continue
+                height = max(1, round(img.height * width / original_width))
+                resized = img.resize((width, height), Image.LANCZOS)
+                variant_path = f"{base_path}_w{width}{ext}"
+                if pil_format == 'WEBP':
+                    resized.save(variant_path, pil_format, quality=WEBP_QUALITY, method=4)
+                else:
+                    resized.save(variant_path, pil_format, quality=JPEG_QUALITY, optimize=True, progressive=True)
+                variants.append({'width': width, 'path': variant_path, 'mime_type': mime_type})
+            return original_width, variants
+    except Exception as e:
+        logger.error('Error generating image variants for %s: %s', source_path, e)
+        return None, []
+
+
+def upload_image_variants(service, source_path, filename):
+    """
+    Generate variants for a local image and upload them to Google Drive as public files.
+
+    Args:
+        service: Authenticated Google Drive service
+        source_path: Path to the original image (already saved locally)
+        filename: Original filename, used to name the variants on Drive
+
+    Returns:
+        (original_width, variants) where variants is a list of dicts with
+        'width', 'drive_file_id' and 'url'
+    """
+    from yonca.google_drive_service import upload_file, set_file_permissions, create_view_only_link
+
+    original_width, local_variants = generate_image_variants(source_path)
+    name = os.path.splitext(filename)[0]
+    uploaded = []
+
+    for variant in local_variants:
+        try:
+            ext = os.path.splitext(variant['path'])[1]
+            drive_file_id = upload_file(service, variant['path'], f"{name}_w{variant['width']}{ext}")
+            if not drive_file_id:
+                continue
+            set_file_permissions(service, drive_file_id, make_public=True)
+            uploaded.append({
+                'width': variant['width'],
+                'drive_file_id': drive_file_id,
+                'url': create_view_only_link(service, drive_file_id, is_image=True)
+            })
+        except Exception as e:
+            logger.error('Error uploading image variant %s: %s', variant['path'], e)
+        finally:
+            try:
+                os.remove(variant['path'])
+            except OSError:
+                pass
+
+    return original_width, uploaded
+
+
+def build_srcset(variants, original_url=None, original_width=None):
+    """Build an HTML srcset attribute value from stored variants (and optionally the original)"""
+    entries = [f"{v['url']} {v['width']}w" for v in (variants or []) if v.get('url') and v.get('width')]
+    if entries and original_url and original_width:
+        entries.append(f"{original_url} {original_width}w")
+    return ', '.join(entries)
@@ -1,6 +1,7 @@
 """
 Background job system for long-running tasks like content translation
 """
+import logging
 import threading
 import time
 from datetime import datetime
@@ -8,6 +9,8 @@ from typing import Dict, Any, Optional
 import json
 from yonca.models import db, BackgroundJob as BackgroundJobModel
 
+logger = logging.getLogger(__name__)
+
 class JobStatus:
     """Job status constants"""
     QUEUED = 'queued'
@@ -37,6 +40,10 @@ class BackgroundJob:
     def status(self, value):
         self.model.status = value
 
+    @property
+    def payload(self):
+        return self.model.payload or {}
+
     @property
     def progress(self):
         return self.model.progress
@@ -104,16 +111,20 @@ class JobManager:
     def __init__(self):
         self.worker_thread = None
         self.running = False
+        self.last_session_purge = 0.0
+        self.last_pin_rotation = 0.0
+        self.config_name = 'development'
 
-    def start_worker(self):
+    def start_worker(self, config_name='development'):
         """Start the background worker thread"""
         if self.worker_thread and self.worker_thread.is_alive():
             return
 
+        self.config_name = config_name
         self.running = True
         self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
         self.worker_thread.start()
-        print("Background job worker started")
+        logger.info('Background job worker started')
 
     def stop_worker(self):
         """Stop the background worker"""
@@ -131,16 +142,15 @@ class JobManager:
             id=job_id,
             type=job_type,
             status=JobStatus.QUEUED,
+            payload=job_data,
             message='',
             error=''
         )
         db.session.add(job_model)
         db.session.commit()
 
-        # Store function reference for when job is executed
-        # Note: This won't persist across app restarts, but for now we'll handle this
-        # by having the worker know which functions to call based on job type
-        print(f"Queued job {job_id} of type {job_type}")
+        # The worker picks the handler based on job type and reads its input from the payload
+        logger.info('Queued job %s of type %s', job_id, job_type)
         return job_id
 
     def get_job(self, job_id: str) -> Optional[BackgroundJob]:
@@ -160,35 +170,93 @@ class JobManager:
         # Import here to avoid circular imports
         from yonca import create_app
         
-        app = create_app()
+        # A separate app, and so a separate connection pool, sized for the worker
+        app = create_app(self.config_name, process_role='worker')
         
         with app.app_context():
             while self.running:
                 try:
-                    # Get next queued job from database
-                    job_model = BackgroundJobModel.query.filter_by(status=JobStatus.QUEUED).order_by(BackgroundJobModel.created_at).first()
+                    # Expired PINs are renewed here even while long jobs keep the worker busy
+                    self._rotate_pins_if_due(app)
+
+                    # Take the next queued job; every web process runs a worker, so the claim must be atomic
+                    job_model = self._claim_next_job()
                     
                     if job_model:
                         job = BackgroundJob(job_model)
                         self._execute_job(job)
                     else:
-                        # No jobs, wait before checking again
+                        # No jobs: do periodic housekeeping, then wait before checking again
+                        self._purge_sessions_if_due(app)
                         time.sleep(1)
                 except Exception as e:
-                    print(f"Error in worker loop: {e}")
+                    logger.error('Error in worker loop: %s', e)
                     time.sleep(5)  # Wait longer on error
 
+    def _claim_next_job(self):
+        """
+        Mark the oldest queued job as running and return it, or None if there is none.
+
+        SKIP LOCKED lets the workers of other processes pass over a job that is
+        being claimed, so each job is run exactly once.
+        """
+        job_model = (
+            BackgroundJobModel.query.filter_by(status=JobStatus.QUEUED)
+            .order_by(BackgroundJobModel.created_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job_model is None:
+            db.session.rollback()
+            return None
+        job_model.status = JobStatus.RUNNING
+        job_model.started_at = datetime.now()
+        db.session.commit()
+        return job_model
+
+    def _rotate_pins_if_due(self, app):
+        """Renew expired resource PINs every PIN_ROTATION_INTERVAL seconds"""
+        if time.monotonic() - self.last_pin_rotation < app.config.get('PIN_ROTATION_INTERVAL', 15):
+            return
+        self.last_pin_rotation = time.monotonic()
+
+        from yonca.models import Resource
+        rotated = Resource.rotate_expired_pins()
+        if rotated:
+            logger.info('Rotated %s expired resource PINs', rotated)
+
+    def _purge_sessions_if_due(self, app):
+        """Delete expired database sessions every SESSION_PURGE_INTERVAL seconds"""
+        if app.config.get('SESSION_TYPE') != 'database':
+            return
+        if time.monotonic() - self.last_session_purge < app.config.get('SESSION_PURGE_INTERVAL', 3600):
+            return
+        self.last_session_purge = time.monotonic()
+
+        from yonca.session_store import purge_expired_sessions
+        purged = purge_expired_sessions(app.config.get('SESSION_PURGE_BATCH_SIZE', 1000))
+        if purged:
+            logger.info('Purged %s expired sessions', purged)
+
     def _execute_job(self, job: BackgroundJob):
         """Execute a single job"""
+        from flask import current_app
+        from yonca.metrics import observe_job, update_pool_gauges
+
+        started_at = time.monotonic()
         try:
             job.status = JobStatus.RUNNING
             job.started_at = datetime.now()
             job.save()
-            print(f"Starting job {job.id}")
+            logger.info('Starting job %s', job.id)
 
             # Execute the job function based on type
             if job.type == 'translate_content':
                 result = self._execute_translate_content_job(job)
+            elif job.type == 'delete_drive_files':
+                result = self._execute_delete_drive_files_job(job)
+            elif job.type == 'sync_drive_folder':
+                result = self._execute_sync_drive_folder_job(job)
             else:
                 raise ValueError(f"Unknown job type: {job.type}")
 
@@ -199,17 +267,21 @@ class JobManager:
             job.completed_at = datetime.now()
             job.save()
 
-            print(f"Completed job {job.id}")
+            logger.info('Completed job %s', job.id)
+            observe_job(job.type, time.monotonic() - started_at)
 
         except Exception as e:
             import traceback
             error_details = traceback.format_exc()
-            print(f"Failed job {job.id}: {error_details}")
+            logger.error('Failed job %s: %s', job.id, error_details)
             
             job.status = JobStatus.FAILED
             job.error = str(e)
             job.completed_at = datetime.now()
             job.save()
+            observe_job(job.type, time.monotonic() - started_at, failed=True)
+        finally:
+            update_pool_gauges(db.engine, current_app.config.get('PROCESS_ROLE', 'worker'))
 
     def _execute_translate_content_job(self, job):
         """Execute the translate content job"""
@@ -253,7 +325,7 @@ class JobManager:
                     job.message = f"Translated {stats['courses']} courses..."
                     job.save()
                 except Exception as e:
-                    print(f"Failed to translate course {course.id}: {e}")
+                    logger.warning('Failed to translate course %s: %s', course.id, e)
                     continue
 
             # Process resources
@@ -269,7 +341,7 @@ class JobManager:
                     job.message = f"Translated {stats['resources']} resources..."
                     job.save()
                 except Exception as e:
-                    print(f"Failed to translate resource {resource.id}: {e}")
+                    logger.warning('Failed to translate resource %s: %s', resource.id, e)
                     continue
 
             # Process home content
@@ -285,9 +357,14 @@ class JobManager:
                     job.message = f"Translated {stats['home_content']} home content items..."
                     job.save()
                 except Exception as e:
-                    print(f"Failed to translate home content {home_content.id}: {e}")
+                    logger.warning('Failed to translate home content %s: %s', home_content.id, e)
                     continue
 
+            if stats['home_content']:
+                # Serve the new translations instead of the cached snapshot
+                from yonca.home_content_cache import home_content_cache
+                home_content_cache.bump_version()
+
             # Commit all changes
             db.session.commit()
 
@@ -300,8 +377,68 @@ class JobManager:
         except Exception as e:
             import traceback
             error_details = traceback.format_exc()
-            print(f"Translation job error: {error_details}")
+            logger.error('Translation job error: %s', error_details)
             raise
 
+    def _execute_delete_drive_files_job(self, job):
+        """Delete Drive files left behind by a bulk content deletion"""
+        from yonca.google_drive_service import authenticate, delete_files_batch, DRIVE_BATCH_SIZE
+        from yonca.file_dedup import referenced_drive_file_ids
+        from yonca.models import User, FileHash
+
+        user = db.session.get(User, job.payload.get('user_id'))
+        drive_file_ids = job.payload.get('drive_file_ids', [])
+
+        # Skip files that were reused by an upload after the job was queued
+        still_referenced = referenced_drive_file_ids(drive_file_ids)
+        drive_file_ids = [file_id for file_id in drive_file_ids if file_id not in still_referenced]
+
+        service = authenticate(user) if drive_file_ids else None
+        if drive_file_ids and not service:
+            raise RuntimeError("Google Drive is not connected for the user who deleted the content")
+
+        stats = {'deleted': 0, 'failed': [], 'kept': len(still_referenced)}
+        for start in range(0, len(drive_file_ids), DRIVE_BATCH_SIZE):
+            chunk = drive_file_ids[start:start + DRIVE_BATCH_SIZE]
+            deleted, failed = delete_files_batch(service, chunk)
+            if deleted:
+                FileHash.query.filter(FileHash.drive_file_id.in_(deleted)).delete(synchronize_session=False)
+            stats['deleted'] += len(deleted)
+            stats['failed'].extend(failed)
+            job.progress = int(min(start + DRIVE_BATCH_SIZE, len(drive_file_ids)) / len(drive_file_ids) * 100)
+            job.message = f"Deleted {stats['deleted']} of {len(drive_file_ids)} files from Google Drive..."
+            job.save()
+
+        return stats
+
+    def _execute_sync_drive_folder_job(self, job):
+        """Apply Google Drive changes to an imported course folder"""
+        from yonca.google_drive_service import authenticate
+        from yonca.drive_sync import sync_drive_folder
+        from yonca.models import DriveFolderSync
+
+        sync = db.session.get(DriveFolderSync, job.payload.get('sync_id'))
+        if not sync:
+            raise ValueError("The synced folder no longer exists")
+
+        service = authenticate(sync.user)
+        if not service:
+            raise RuntimeError("Google Drive is not connected for the user who imported the folder")
+
+        job.message = f"Syncing {sync.folder.title} from Google Drive..."
+        job.save()
+
+        # Hold the row until the commit so two syncs of one folder never apply the same changes;
+        # a waiting sync then reads the page token the first one saved
+        sync = (
+            DriveFolderSync.query.filter_by(id=sync.id)
+            .with_for_update()
+            .populate_existing()
+            .first()
+        )
+        stats = sync_drive_folder(service, sync)
+        db.session.commit()
+        return stats
+
 # Global job manager instance
 job_manager = JobManager()
\ No newline at end of file
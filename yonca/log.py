@@ -0,0 +1,133 @@
+"""
+Structured, leveled logging.
+
+Modules log through the standard library (logger = logging.getLogger(__name__))
+and configure_logging() installs one handler that writes either key=value
+lines or JSON objects (LOG_FORMAT). Structured fields go in extra:
+
+    logger.info('request', extra={'fields': {'path': request.path, 'status': 200}})
+
+Levels are set for the yonca package (LOG_LEVEL) and per module (LOG_LEVELS,
+e.g. 'yonca.google_drive_service=DEBUG,yonca.request_timing=WARNING').
+LOG_SAMPLE_RATES keeps only a fraction of a chatty module's records below
+WARNING (e.g. 'yonca.request_timing=0.1').
+
+Debug diagnostics must cost nothing when disabled: pass values as %-style
+arguments instead of f-strings, and wrap anything that has to be computed
+(queries, large reprs) in lazy():
+
+    logger.debug('folders: %s', lazy(lambda: [f.id for f in course.folders]))
+"""
+import json
+import logging
+import random
+import sys
+from datetime import datetime, timezone
+
+_HANDLER_MARK = '_yonca_handler'
+
+
+class lazy:
+    """Defers computing a log argument until the record is actually formatted"""
+
+    def __init__(self, func):
+        self.func = func
+
+    def __str__(self):
+        return str(self.func())
+
+    def __repr__(self):
+        return repr(self.func())
+
+
+def _quote(value):
+    text = str(value)
+    if text and not any(c in text for c in ' "=\n\t'):
+        return text
+    return json.dumps(text, ensure_ascii=False)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as key=value lines, or as one JSON object per line"""
+
+    def __init__(self, json_output=False):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+
+        if self.json_output:
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        # Lists and tracebacks go on their own indented lines after the record
+        inline, blocks = [], []
+        for key, value in entry.items():
+            if isinstance(value, (list, tuple)):
+                blocks.extend(f'  {item}' for item in value)
+            elif key == 'exc':
+                blocks.append(value)
+            else:
+                inline.append(f'{key}={_quote(value)}')
+        return '\n'.join([' '.join(inline)] + blocks)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes only a fraction of the sub-WARNING records of selected loggers"""
+
+    def __init__(self, rates):
+        super().__init__()
+        # Longest prefix first so 'yonca.a.b' overrides 'yonca.a'
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + '.'):
+                return random.random() < rate
+        return True
+
+
+def _parse_mapping(value, convert):
+    """Accept a dict or a 'name=value,name=value' string"""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return {name: convert(item) for name, item in value.items()}
+    mapping = {}
+    for pair in value.split(','):
+        if '=' in pair:
+            name, item = pair.split('=', 1)
+            mapping[name.strip()] = convert(item.strip())
+    return mapping
+
+
+def configure_logging(app):
+    """Install the structured handler and apply the configured levels (safe to call more than once)"""
+    root = logging.getLogger()
+    handler = next((h for h in root.handlers if getattr(h, _HANDLER_MARK, False)), None)
+    if handler is None:
+        handler = logging.StreamHandler(sys.stderr)
+        setattr(handler, _HANDLER_MARK, True)
+        root.addHandler(handler)
+    if root.level == logging.NOTSET or root.level > logging.INFO:
+        root.setLevel(logging.INFO)
+
+    handler.setFormatter(StructuredFormatter(json_output=app.config.get('LOG_FORMAT', 'text') == 'json'))
+    handler.filters = []
+    rates = _parse_mapping(app.config.get('LOG_SAMPLE_RATES'), float)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    logging.getLogger('yonca').setLevel(app.config.get('LOG_LEVEL', 'INFO').upper())
+    for name, level in _parse_mapping(app.config.get('LOG_LEVELS'), str.upper).items():
+        logging.getLogger(name).setLevel(level)
@@ -0,0 +1,191 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Exposes request latency per endpoint, translation cache lookups, latency and
+errors of external calls (Google Drive, translation), background job
+throughput, job queue depth and database pool usage.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory before the
+workers start (gunicorn_config.py clears it and reports dead workers); every
+worker then writes its samples there and a scrape of any worker returns the
+totals. Without prometheus_client installed, recording is a no-op and
+/metrics is not registered.
+
+Scrapes must send METRICS_TOKEN as a bearer token. Without a token, only
+requests from the loopback interface that did not pass through a reverse
+proxy are served; with METRICS_REQUIRE_TOKEN (the production default) the
+endpoint is not registered at all until a token is set.
+"""
+import ipaddress
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+    )
+    from prometheus_client.core import GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    logger.warning("prometheus_client not available, /metrics is disabled. Install with: pip install prometheus-client")
+
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+if PROMETHEUS_AVAILABLE:
+    REQUEST_COUNT = Counter(
+        'yonca_http_requests_total', 'HTTP requests handled', ['method', 'endpoint', 'status']
+    )
+    REQUEST_LATENCY = Histogram(
+        'yonca_http_request_duration_seconds', 'Time to produce a response', ['method', 'endpoint'],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    )
+    TRANSLATION_LOOKUPS = Counter(
+        'yonca_translation_lookups_total', 'TranslationService lookups by cache result', ['result']
+    )
+    EXTERNAL_CALLS = Counter(
+        'yonca_external_calls_total', 'Calls to external services', ['service', 'operation', 'outcome']
+    )
+    EXTERNAL_LATENCY = Histogram(
+        'yonca_external_call_duration_seconds', 'Latency of calls to external services', ['service', 'operation'],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+    )
+    JOBS = Counter(
+        'yonca_jobs_total', 'Background jobs finished', ['type', 'outcome']
+    )
+    JOB_DURATION = Histogram(
+        'yonca_job_duration_seconds', 'Background job run time', ['type'],
+        buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+    )
+    DB_POOL_CONNECTIONS = Gauge(
+        'yonca_db_pool_connections', 'Database pool connections per state', ['role', 'state'],
+        multiprocess_mode='livesum'
+    )
+
+
+def observe_request(method, endpoint, status, seconds):
+    if PROMETHEUS_AVAILABLE:
+        REQUEST_COUNT.labels(method, endpoint, status).inc()
+        REQUEST_LATENCY.labels(method, endpoint).observe(seconds)
+
+
+def observe_translation_lookup(hit):
+    if PROMETHEUS_AVAILABLE:
+        TRANSLATION_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+
+def observe_external_call(service, operation, seconds, error=False):
+    if PROMETHEUS_AVAILABLE:
+        EXTERNAL_CALLS.labels(service, operation, 'error' if error else 'ok').inc()
+        EXTERNAL_LATENCY.labels(service, operation).observe(seconds)
+
+
+def observe_job(job_type, seconds, failed=False):
+    if PROMETHEUS_AVAILABLE:
+        JOBS.labels(job_type, 'failed' if failed else 'completed').inc()
+        JOB_DURATION.labels(job_type).observe(seconds)
+
+
+def update_pool_gauges(engine, role):
+    """Record how many of this process's pooled connections are in use"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    pool = engine.pool
+    for state, read in (('checked_out', 'checkedout'), ('idle', 'checkedin'), ('overflow', 'overflow')):
+        if hasattr(pool, read):
+            DB_POOL_CONNECTIONS.labels(role, state).set(max(getattr(pool, read)(), 0))
+
+
+_queue_collector_registered = False
+
+
+class JobQueueCollector:
+    """Reads the job queue depth from the database at scrape time"""
+
+    def describe(self):
+        return [GaugeMetricFamily('yonca_job_queue_depth', 'Background jobs waiting or running', labels=['status'])]
+
+    def collect(self):
+        from sqlalchemy import func
+        from yonca.db_routing import replica_reads
+        from yonca.job_manager import JobStatus
+        from yonca.models import db, BackgroundJob as BackgroundJobModel
+
+        depth = GaugeMetricFamily('yonca_job_queue_depth', 'Background jobs waiting or running', labels=['status'])
+        # A slightly stale count is fine, so scrapes may read from the replica
+        with replica_reads():
+            counts = dict(
+                db.session.query(BackgroundJobModel.status, func.count(BackgroundJobModel.id))
+                .filter(BackgroundJobModel.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+                .group_by(BackgroundJobModel.status)
+            )
+        for status in (JobStatus.QUEUED, JobStatus.RUNNING):
+            depth.add_metric([status], counts.get(status, 0))
+        yield depth
+
+
+def _direct_local_request(request):
+    """True for requests from this machine that did not come through a reverse proxy"""
+    if request.headers.get('X-Forwarded-For') or request.headers.get('Forwarded'):
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+
+def init_metrics(app):
+    """Record request metrics and register /metrics"""
+    from flask import Response, abort, g, request
+
+    if not PROMETHEUS_AVAILABLE or not app.config.get('METRICS_ENABLED', True):
+        return
+
+    global _queue_collector_registered
+    queue_collector = JobQueueCollector()
+    if not MULTIPROCESS and not _queue_collector_registered:
+        REGISTRY.register(queue_collector)
+        _queue_collector_registered = True
+
+    @app.before_request
+    def start_metrics_timer():
+        g.metrics_started_at = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        from yonca.models import db
+
+        started_at = g.pop('metrics_started_at', None)
+        if started_at is not None and request.endpoint not in ('static', 'metrics'):
+            observe_request(request.method, request.endpoint or 'unmatched', response.status_code,
+                            time.perf_counter() - started_at)
+            update_pool_gauges(db.engine, app.config.get('PROCESS_ROLE', 'web'))
+        return response
+
+    def metrics():
+        """Prometheus scrape endpoint"""
+        from yonca.models import db
+
+        token = app.config.get('METRICS_TOKEN')
+        if token:
+            if request.headers.get('Authorization') != f'Bearer {token}':
+                abort(401)
+        elif not _direct_local_request(request):
+            abort(404)
+
+        update_pool_gauges(db.engine, app.config.get('PROCESS_ROLE', 'web'))
+        if MULTIPROCESS:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            registry.register(queue_collector)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+    if app.config.get('METRICS_REQUIRE_TOKEN') and not app.config.get('METRICS_TOKEN'):
+        logger.warning("METRICS_TOKEN is not set, /metrics is disabled")
+        return
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -2,10 +2,12 @@
 Database models for Yonca application
 """
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from yonca.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Association table for many-to-many relationship between User and Course
 user_courses = db.Table('user_courses',
@@ -104,12 +106,16 @@ class ForumMessage(db.Model):
     username = db.Column(db.String(80))
     message = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, server_default=db.func.now())
-    parent_id = db.Column(db.Integer, db.ForeignKey('forum_message.id'), nullable=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('forum_message.id'), nullable=True, index=True)
     channel = db.Column(db.String(50), default='general', nullable=False)  # Channel/category for the message
     
     # Relationship for replies
     replies = db.relationship('ForumMessage', backref=db.backref('parent', remote_side=[id]), lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('idx_forum_message_thread_page', 'channel', 'parent_id', 'timestamp', 'id'),
+    )
+
     def __repr__(self):
         return f'<ForumMessage {self.id}>'
 
@@ -158,6 +164,7 @@ class Resource(db.Model):
     preview_image = db.Column(db.String(300))  # Preview image URL or path
     preview_drive_file_id = db.Column(db.String(100))  # Google Drive file ID for preview image
     preview_drive_view_link = db.Column(db.String(300))  # Google Drive view link for preview image
+    preview_variants = db.Column(db.JSON)  # Resized preview image variants: [{"width", "drive_file_id", "url"}]
     drive_file_id = db.Column(db.String(100))  # Google Drive file ID
     drive_view_link = db.Column(db.String(300))  # Google Drive view link
     is_image_file = db.Column(db.Boolean, default=False)  # Whether the main file is an image
@@ -175,15 +182,57 @@ class Resource(db.Model):
         if not self.access_pin:
             self.generate_new_pin()
 
+    @staticmethod
+    def _new_pin_values(now):
+        """Column values for a fresh random 6-character PIN valid for 10 minutes from now"""
+        import random
+        import string
+        from datetime import timedelta
+
+        return {
+            'access_pin': ''.join(random.choices(string.ascii_uppercase + string.digits, k=6)),
+            'pin_expires_at': now + timedelta(minutes=10),
+            'pin_last_reset': now,
+        }
+
     def generate_new_pin(self):
         """Generate a new random 6-character PIN and set expiration to 10 minutes from now"""
-        import random
+        from datetime import datetime
+
+        for column, value in self._new_pin_values(datetime.utcnow()).items():
+            setattr(self, column, value)
+
+    @classmethod
+    def rotate_expired_pins(cls):
+        """
+        Give every active resource whose PIN has expired a new PIN, in one UPDATE statement.
+
+        The new PINs are generated by the database (random() is evaluated per
+        row). A concurrent run waits on the row locks and then skips rows that
+        were already renewed. Commits and returns the number of PINs rotated.
+        """
         import string
         from datetime import datetime, timedelta
-
-        self.access_pin = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        self.pin_expires_at = datetime.utcnow() + timedelta(minutes=10)
-        self.pin_last_reset = datetime.utcnow()
+        from sqlalchemy import Integer, String, func, literal, update
+        from yonca.conditional_get import mark_changed
+
+        alphabet = literal(string.ascii_uppercase + string.digits)
+        random_char = func.substr(alphabet, func.floor(func.random() * 36).cast(Integer) + 1, 1, type_=String)
+        new_pin = random_char
+        for _ in range(5):
+            new_pin = new_pin.concat(random_char)
+
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(cls)
+            .where(cls.is_active == True, cls.access_pin.isnot(None), cls.pin_expires_at < now)
+            .values(access_pin=new_pin, pin_expires_at=now + timedelta(minutes=10), pin_last_reset=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            mark_changed(db.session, 'resources')
+        db.session.commit()
+        return result.rowcount
 
     def is_pin_expired(self):
         """Check if the current PIN has expired"""
@@ -349,6 +398,25 @@ class ContentTranslation(db.Model):
     def __repr__(self):
         return f'<ContentTranslation {self.content_type}:{self.content_id}.{self.field_name} -> {self.target_language}>'
 
+class SearchDocument(db.Model):
+    """Denormalized search text for a resource or course, including its translations (see yonca.search_index)"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_type = db.Column(db.String(50), nullable=False)  # 'resource' or 'course'
+    content_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.Text)  # Original and translated titles
+    tags = db.Column(db.Text)  # Lower-cased tags in every language, space separated
+    body = db.Column(db.Text)  # Original and translated descriptions
+    search_vector = db.Column(db.Text().with_variant(TSVECTOR(), 'postgresql'))  # Weighted tsvector, maintained on PostgreSQL only
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('content_type', 'content_id', name='uq_search_document_content'),
+        db.Index('idx_search_document_vector', 'search_vector', postgresql_using='gin'),
+    )
+
+    def __repr__(self):
+        return f'<SearchDocument {self.content_type}:{self.content_id}>'
+
 class CourseContent(db.Model):
     """Course content modules/sections"""
     id = db.Column(db.Integer, primary_key=True)
@@ -363,6 +431,7 @@ class CourseContent(db.Model):
     is_published = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     allow_others_to_view = db.Column(db.Boolean, default=True)  # Allow other users to view this file
+    source_drive_file_id = db.Column(db.String(100), index=True)  # Drive file this item was imported from (for folder sync)
     
     course = db.relationship('Course', backref=db.backref('contents', lazy='dynamic'))
     folder_id = db.Column(db.Integer, db.ForeignKey('course_content_folder.id'), nullable=True)
@@ -380,6 +449,7 @@ class CourseContentFolder(db.Model):
     description = db.Column(db.Text)
     order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    drive_folder_id = db.Column(db.String(100), index=True)  # Drive folder this folder was imported from (for folder sync)
 
     course = db.relationship('Course', backref=db.backref('content_folders', lazy='dynamic'))
     parent_folder = db.relationship('CourseContentFolder', remote_side=[id], backref=db.backref('subfolders', lazy='dynamic'))
@@ -389,6 +459,24 @@ class CourseContentFolder(db.Model):
     def __repr__(self):
         return f'<CourseContentFolder {self.title}>'
 
+class DriveFolderSync(db.Model):
+    """Link between an imported course folder and its Google Drive source, for incremental re-sync"""
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    folder_id = db.Column(db.Integer, db.ForeignKey('course_content_folder.id', ondelete='CASCADE'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Drive account used for syncing
+    drive_root_id = db.Column(db.String(100), nullable=False)
+    page_token = db.Column(db.String(200), nullable=False)  # Drive Changes API cursor
+    publish_new_items = db.Column(db.Boolean, default=True)
+    last_synced_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    folder = db.relationship('CourseContentFolder')
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f'<DriveFolderSync folder={self.folder_id} drive={self.drive_root_id}>'
+
 class CourseAssignment(db.Model):
     """Course assignments"""
     id = db.Column(db.Integer, primary_key=True)
@@ -461,6 +549,7 @@ class BackgroundJob(db.Model):
     id = db.Column(db.String(36), primary_key=True)  # UUID as string
     type = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    payload = db.Column(db.JSON)  # Input data for the job handler
     progress = db.Column(db.Integer, default=0)  # 0-100
     message = db.Column(db.Text)
     result = db.Column(db.JSON)  # Store result data as JSON
@@ -488,6 +577,32 @@ class BackgroundJob(db.Model):
         return f'<BackgroundJob {self.id} ({self.type})>'
 
 
+class FileHash(db.Model):
+    """Content hash index of files stored on Google Drive, used to deduplicate uploads"""
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), index=True)  # Computed while streaming uploads
+    md5 = db.Column(db.String(32), index=True)  # Matches Drive's md5Checksum for imports
+    drive_file_id = db.Column(db.String(100), nullable=False, index=True)
+    # Account that owns the Drive file; with the drive.file scope no other account can see it
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), index=True)
+    size = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    def __repr__(self):
+        return f'<FileHash {self.drive_file_id}>'
+
+
+class UserSession(db.Model):
+    """Server-side session data (see yonca.session_store)"""
+    __tablename__ = 'user_session'
+    session_id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # Tagged-JSON session contents
+    user_id = db.Column(db.Integer, nullable=True, index=True)  # Signed-in user, for signing out everywhere
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<UserSession {self.session_id[:8]}>'
+
 class AppSetting(db.Model):
     """Application settings model for storing configuration values securely"""
     id = db.Column(db.Integer, primary_key=True)
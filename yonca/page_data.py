@@ -0,0 +1,200 @@
+"""
+JSON payloads shared by the list endpoints in routes/api.py and /api/bootstrap.
+
+Each builder loads its rows and their translations with a fixed number of
+queries, so /api/bootstrap can assemble the first page render from the same
+prefetched data instead of one request per section.
+"""
+from flask_babel import _
+from yonca.content_translator import get_translated_fields
+from yonca.models import db, Course, ForumChannel, PDFDocument, Resource, user_courses, user_resource_access
+
+
+def course_payloads(courses, locale, enrolled_ids=None):
+    """
+    Serialize courses with their translated title, description and tags.
+
+    Args:
+        courses: Course rows
+        locale: Language to translate into
+        enrolled_ids: Set of course ids the user is enrolled in; adds is_enrolled when given
+    """
+    max_tags = max((len(c.tags or []) for c in courses), default=0)
+    # Tags keep their original text in English, matching get_translated_string_array
+    tag_fields = tuple(f"tags[{i}]" for i in range(max_tags)) if locale != 'en' else ()
+    translations = get_translated_fields('course', [c.id for c in courses], ('title', 'description') + tag_fields, locale)
+
+    payloads = []
+    for c in courses:
+        payload = {
+            'id': c.id,
+            'title': translations.get((c.id, 'title'), c.title),
+            'description': translations.get((c.id, 'description'), c.description),
+            'time_slot': c.time_slot,
+            'profile_emoji': c.profile_emoji,
+            'dropdown_menu': c.dropdown_menu,
+            'tags': [translations.get((c.id, f"tags[{i}]"), tag) for i, tag in enumerate(c.tags or [])] if c.tags else c.tags
+        }
+        if enrolled_ids is not None:
+            payload['is_enrolled'] = c.id in enrolled_ids
+        payloads.append(payload)
+    return payloads
+
+
+def enrolled_course_ids(user):
+    """Ids of the courses a user is enrolled in, without loading the relationship"""
+    if not user.is_authenticated:
+        return set()
+    return {row.course_id for row in db.session.query(user_courses.c.course_id).filter(user_courses.c.user_id == user.id)}
+
+
+def user_payload(user, enrolled_courses):
+    """The signed-in user with their enrolled courses (already serialized), or None"""
+    if not user.is_authenticated:
+        return None
+    return {
+        'id': user.id,
+        'username': user.username,
+        'is_admin': user.is_admin,
+        'courses': [{key: value for key, value in course.items() if key != 'is_enrolled'} for course in enrolled_courses]
+    }
+
+
+def forum_channel_payloads():
+    """Active forum channels in display order"""
+    channels = ForumChannel.query.filter_by(is_active=True).order_by(ForumChannel.sort_order).all()
+    return [{
+        'id': c.id,
+        'name': c.name,
+        'slug': c.slug,
+        'description': c.description,
+        'requires_login': c.requires_login,
+        'admin_only': c.admin_only
+    } for c in channels]
+
+
+def pdf_payloads(user):
+    """Active PDF documents (without sensitive info)"""
+    pdfs = PDFDocument.query.filter_by(is_active=True).all()
+    return [{
+        'id': p.id,
+        'title': p.title,
+        'description': p.description,
+        'file_size': p.file_size,
+        'upload_date': p.upload_date.isoformat() if p.upload_date else None,
+        'uploaded_by': p.uploaded_by,
+        # Only show PIN to the uploader
+        'access_pin': p.access_pin if (user.is_authenticated and p.uploaded_by == user.id) else None
+    } for p in pdfs]
+
+
+def resource_payloads(user, locale, limit=None, cursor=None):
+    """
+    Serialize active resources with the user's access state.
+
+    Args:
+        user: current_user
+        locale: Language to translate into
+        limit: Page size, or None for every resource
+        cursor: Last resource id of the previous page
+
+    Returns:
+        (payloads, next_cursor) - next_cursor is None on the last page
+    """
+    from yonca.image_variants import build_srcset
+
+    query = Resource.query.filter_by(is_active=True).order_by(Resource.id)
+    if cursor:
+        query = query.filter(Resource.id > cursor)
+    if limit:
+        query = query.limit(limit + 1)
+    resources = query.all()
+
+    next_cursor = None
+    if limit and len(resources) > limit:
+        resources = resources[:limit]
+        next_cursor = resources[-1].id
+
+    resource_ids = [r.id for r in resources]
+    translations = get_translated_fields('resource', resource_ids, ('title', 'description'), locale)
+
+    # Resources this user has already unlocked with a PIN
+    accessed_ids = set()
+    if user.is_authenticated and resource_ids:
+        accessed_ids = {
+            row.resource_id for row in db.session.query(user_resource_access.c.resource_id).filter(
+                user_resource_access.c.user_id == user.id,
+                user_resource_access.c.resource_id.in_(resource_ids)
+            )
+        }
+
+    result = []
+
+    for r in resources:
+        resource_data = {
+            'id': r.id,
+            'title': translations.get((r.id, 'title'), r.title),
+            'description': translations.get((r.id, 'description'), r.description),
+            'tags': ' '.join([_(tag.strip()) for tag in (r.tags or '').split() if tag.strip()]),
+            'preview_image': r.preview_image,
+            'preview_drive_file_id': r.preview_drive_file_id,
+            'preview_drive_view_link': r.preview_drive_view_link,
+            'preview_srcset': build_srcset(r.preview_variants),
+            'drive_view_link': r.drive_view_link,
+            'upload_date': r.upload_date.isoformat() if r.upload_date else None,
+            'pin_expires_at': r.pin_expires_at.isoformat() if r.pin_expires_at else None,
+            'pin_last_reset': r.pin_last_reset.isoformat() if r.pin_last_reset else None,
+            'has_pin': bool(r.access_pin),
+            'uploaded_by': r.uploaded_by
+        }
+
+        if r.id in accessed_ids:
+            # User has already accessed this resource, show view link directly
+            resource_data['permanent_access'] = True
+            resource_data['access_granted'] = True
+        elif not user.is_authenticated:
+            # Non-authenticated users need to log in
+            resource_data['permanent_access'] = False
+            resource_data['requires_login'] = True
+        else:
+            # Authenticated users who don't have permanent access need PIN
+            resource_data['permanent_access'] = False
+            resource_data['requires_pin'] = True
+            if user.is_admin or r.uploaded_by == user.id:
+                resource_data['access_pin'] = r.access_pin
+
+        result.append(resource_data)
+
+    return result, next_cursor
+
+
+# Sections every first render uses, and the ones added only for the page that needs them
+BOOTSTRAP_BASE_SECTIONS = ('user', 'courses', 'courses_en')
+BOOTSTRAP_OPTIONAL_SECTIONS = ('forum_channels', 'resources', 'pdfs')
+
+
+def bootstrap_payload(user, locale, sections=()):
+    """
+    Data for index.html's first render.
+
+    Always includes the user and the course lists; forum_channels, resources
+    and pdfs are built only when listed in sections.
+    """
+    courses = Course.query.all()
+    enrolled_ids = enrolled_course_ids(user) if user.is_authenticated else None
+    localized_courses = course_payloads(courses, locale, enrolled_ids)
+
+    payload = {
+        'locale': locale,
+        'user': user_payload(user, [c for c in localized_courses if c.get('is_enrolled')]),
+        'courses': localized_courses,
+        # English titles and tags, used to match featured-course categories
+        'courses_en': course_payloads(courses, 'en', enrolled_ids) if locale != 'en' else localized_courses,
+    }
+    if 'forum_channels' in sections:
+        payload['forum_channels'] = forum_channel_payloads()
+    if 'resources' in sections:
+        payload['resources'], _next_cursor = resource_payloads(user, locale)
+    if 'pdfs' in sections:
+        payload['pdfs'] = pdf_payloads(user)
+    return payload
@@ -0,0 +1,196 @@
+"""
+Per-request query counting and Server-Timing instrumentation.
+
+Every request gets a RequestTimer that counts SQL statements and adds up time
+spent in the database, in template rendering and in external services (Google
+Drive, translation). When the response goes out it gets a Server-Timing
+header (shown in the browser's network panel) and one structured log record
+on the 'yonca.request_timing' logger (see yonca.log). Requests slower than
+SLOW_REQUEST_THRESHOLD_MS also log their statements, grouped with repeat
+counts, which makes N+1 patterns easy to spot.
+
+Template time includes queries issued while rendering (lazy loads), and
+external time may include the queries those helpers run. External calls are
+also counted in yonca.metrics.
+"""
+import functools
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimer:
+    """Counters for one request"""
+
+    def __init__(self, max_statements=500):
+        self.started_at = time.perf_counter()
+        self.max_statements = max_statements
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.external_ms = Counter()  # kind -> milliseconds
+        self.statements = []  # (statement, milliseconds), capped at max_statements
+        self._template_starts = []
+        self._external_depth = Counter()
+
+    def record_query(self, statement, elapsed_ms):
+        self.query_count += 1
+        self.db_ms += elapsed_ms
+        if len(self.statements) < self.max_statements:
+            self.statements.append((statement, elapsed_ms))
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def server_timing(self, total_ms):
+        entries = [
+            f'db;dur={self.db_ms:.1f};desc="{self.query_count} queries"',
+            f'tpl;dur={self.template_ms:.1f}',
+        ]
+        entries += [f'{kind};dur={ms:.1f}' for kind, ms in sorted(self.external_ms.items())]
+        entries.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(entries)
+
+
+def current_timer():
+    """The current request's RequestTimer, or None outside an instrumented request"""
+    from flask import g, has_request_context
+
+    if not has_request_context():
+        return None
+    return g.get('request_timer')
+
+
+@contextmanager
+def external_call(kind, operation=None):
+    """
+    Count the time spent in the block as external service time of the given kind.
+
+    Also recorded in the external call metrics (per operation), in requests
+    and background jobs alike.
+    """
+    from yonca.metrics import observe_external_call
+
+    timer = current_timer()
+    if timer is not None:
+        timer._external_depth[kind] += 1
+    started_at = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started_at
+        observe_external_call(kind, operation or kind, elapsed, error)
+        if timer is not None:
+            timer._external_depth[kind] -= 1
+            # Nested calls of the same kind (a helper calling another) count once
+            if not timer._external_depth[kind]:
+                timer.external_ms[kind] += elapsed * 1000
+
+
+def timed_external(kind):
+    """Decorator form of external_call, using the function name as the operation"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with external_call(kind, func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_timer() is not None:
+        context._request_timing_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = current_timer()
+    started_at = getattr(context, '_request_timing_started_at', None)
+    if timer is not None and started_at is not None:
+        timer.record_query(statement, (time.perf_counter() - started_at) * 1000)
+
+
+def _template_started(sender, template, context, **extra):
+    timer = current_timer()
+    if timer is not None:
+        timer._template_starts.append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    timer = current_timer()
+    if timer is not None and timer._template_starts:
+        started_at = timer._template_starts.pop()
+        # Count only the outermost render; includes and extends are part of it
+        if not timer._template_starts:
+            timer.template_ms += (time.perf_counter() - started_at) * 1000
+
+
+def _log_request(timer, response, total_ms, slow_threshold_ms):
+    from flask import request
+
+    fields = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'total_ms': round(total_ms, 1),
+        'queries': timer.query_count,
+        'db_ms': round(timer.db_ms, 1),
+        'template_ms': round(timer.template_ms, 1),
+    }
+    fields.update({f'{kind}_ms': round(ms, 1) for kind, ms in sorted(timer.external_ms.items())})
+
+    if slow_threshold_ms and total_ms >= slow_threshold_ms:
+        counts = Counter(statement for statement, _ in timer.statements)
+        durations = Counter()
+        for statement, elapsed_ms in timer.statements:
+            durations[statement] += elapsed_ms
+        fields['statements'] = [
+            f'{count}x {durations[statement]:.1f}ms  {" ".join(statement.split())}'
+            for statement, count in counts.most_common()
+        ]
+        logger.warning('slow_request', extra={'fields': fields})
+    else:
+        logger.info('request', extra={'fields': fields})
+
+
+def init_request_timing(app):
+    """Instrument every request of the app"""
+    from flask import before_render_template, g, template_rendered
+
+    if not app.config.get('REQUEST_TIMING_ENABLED', True):
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_rendered, app)
+
+    @app.before_request
+    def start_request_timer():
+        from flask import request
+
+        if request.endpoint == 'static':
+            return
+        g.request_timer = RequestTimer(app.config.get('REQUEST_TIMING_MAX_STATEMENTS', 500))
+
+    @app.after_request
+    def finish_request_timer(response):
+        timer = g.pop('request_timer', None)
+        if timer is None:
+            return response
+        total_ms = timer.total_ms()
+        if app.config.get('SERVER_TIMING_HEADER', True):
+            response.headers['Server-Timing'] = timer.server_timing(total_ms)
+        _log_request(timer, response, total_ms, app.config.get('SLOW_REQUEST_THRESHOLD_MS', 1000))
+        return response
@@ -0,0 +1,193 @@
+"""
+Whole-response cache for public pages and endpoints served to anonymous visitors.
+
+    @main_bp.route('/about')
+    @cached_response(ttl=300, tags=('home_content',))
+    def about(): ...
+
+Logged-out GET requests are keyed by path, query string and locale, plus the
+current version of every tag the response depends on: a dataset name from
+yonca.conditional_get, or 'home_content'. Saving a model bumps its dataset
+version, so later requests miss and re-render; entries under the old version
+are dropped by this process at once and age out elsewhere. Signed-in users
+always get a fresh response.
+
+Entries live in a per-process LRU. Set RESPONSE_CACHE_REDIS_URL to also share
+them between workers and servers through Redis.
+"""
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBackend:
+    """Size-bounded in-memory LRU with per-entry expiry"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, tags, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, ttl, tags):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, frozenset(tags), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tags):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] & tags]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Shared entries in Redis; invalidation relies on the versioned keys"""
+
+    prefix = 'yonca:response:'
+
+    def __init__(self, url):
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get(self, key):
+        try:
+            return self._client.get(self.prefix + key)
+        except redis.RedisError as e:
+            logger.warning('Response cache: Redis read failed: %s', e)
+            return None
+
+    def set(self, key, value, ttl, tags):
+        try:
+            self._client.setex(self.prefix + key, int(ttl), value)
+        except redis.RedisError as e:
+            logger.warning('Response cache: Redis write failed: %s', e)
+
+
+class ResponseCache:
+    """Two-level (process, then shared) cache of rendered responses"""
+
+    def __init__(self):
+        self.enabled = True
+        self.local = LocalBackend()
+        self.shared = None
+
+    def init_app(self, app):
+        """Configure the cache from the Flask app config"""
+        from yonca.conditional_get import data_versions
+
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.local.max_entries = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', self.local.max_entries)
+        redis_url = app.config.get('RESPONSE_CACHE_REDIS_URL')
+        if redis_url:
+            if REDIS_AVAILABLE:
+                self.shared = RedisBackend(redis_url)
+            else:
+                logger.warning("redis not available, response cache is per-process only. Install with: pip install redis")
+        data_versions.add_listener(self.invalidate)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+        return value
+
+    def set(self, key, value, ttl, tags):
+        self.local.set(key, value, ttl, tags)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl, tags)
+
+    def invalidate(self, tags):
+        """Drop this process's entries that depend on any of the given tags"""
+        self.local.invalidate(set(tags))
+
+
+def _tag_version(tag):
+    if tag == 'home_content':
+        from yonca.home_content_cache import home_content_cache
+        return home_content_cache.get().version or ''
+    from yonca.conditional_get import data_versions
+    return data_versions.get(tag)
+
+
+def _request_key(tags):
+    from flask import request, session
+    from flask_babel import get_locale
+
+    parts = [
+        request.path,
+        '&'.join(sorted(f'{name}={value}' for name, value in request.args.items(multi=True))),
+        str(get_locale() or ''),
+        session.get('language', ''),
+    ] + [f'{tag}={_tag_version(tag)}' for tag in tags]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _pack(response):
+    return response.mimetype.encode('ascii') + b'\n' + response.get_data()
+
+
+def _unpack(value):
+    from flask import current_app
+
+    mimetype, _, body = value.partition(b'\n')
+    return current_app.response_class(body, mimetype=mimetype.decode('ascii'))
+
+
+def cached_response(ttl=60, tags=()):
+    """
+    Serve a GET view from the response cache for anonymous visitors.
+
+    Args:
+        ttl: Seconds an entry may be served
+        tags: Datasets (and/or 'home_content') the response is built from
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import make_response, request
+            from flask_login import current_user
+
+            if not response_cache.enabled or request.method not in ('GET', 'HEAD') or current_user.is_authenticated:
+                return view(*args, **kwargs)
+
+            key = _request_key(tags)
+            value = response_cache.get(key)
+            if value is not None:
+                return _unpack(value)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                response_cache.set(key, _pack(response), ttl, tags)
+            return response
+        return wrapper
+    return decorator
+
+
+# Global cache instance
+response_cache = ResponseCache()
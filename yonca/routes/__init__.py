@@ -4,10 +4,16 @@ from markupsafe import Markup
 from flask_babel import get_locale, force_locale
 from flask_login import current_user, login_required
 from yonca.models import HomeContent
+from yonca.home_content_cache import home_content_cache
+from yonca.response_cache import cached_response
+from yonca.log import lazy
 from werkzeug.utils import secure_filename
+import logging
 import os
 from datetime import datetime as dt
 
+logger = logging.getLogger(__name__)
+
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/', methods=['GET', 'POST'])
@@ -42,7 +48,8 @@ def index():
 
         # Delete resource
         if action == 'delete_resource' and current_user.is_authenticated:
-            from yonca.google_drive_service import authenticate, delete_file
+            from yonca.google_drive_service import authenticate
+            from yonca.file_dedup import delete_unreferenced_drive_file
             resource_id = request.form.get('resource_id')
             resource = Resource.query.get(resource_id)
             if not resource:
@@ -57,7 +64,7 @@ def index():
                 service = authenticate()
                 if service:
                     try:
-                        delete_file(service, resource.drive_file_id)
+                        delete_unreferenced_drive_file(service, resource.drive_file_id)
                     except Exception as e:
                         print(f"Error deleting resource from Google Drive: {e}")
             # Delete from database
@@ -68,7 +75,8 @@ def index():
 
         # Delete PDF
         if action == 'delete_pdf' and current_user.is_authenticated:
-            from yonca.google_drive_service import authenticate, delete_file
+            from yonca.google_drive_service import authenticate
+            from yonca.file_dedup import delete_unreferenced_drive_file
             pdf_id = request.form.get('pdf_id')
             pdf = PDFDocument.query.get(pdf_id)
             if not pdf:
@@ -83,7 +91,7 @@ def index():
                 service = authenticate()
                 if service:
                     try:
-                        delete_file(service, pdf.drive_file_id)
+                        delete_unreferenced_drive_file(service, pdf.drive_file_id)
                     except Exception as e:
                         print(f"Error deleting PDF from Google Drive: {e}")
             # Delete from database
@@ -94,7 +102,7 @@ def index():
 
     # Always return a response, even if database is unavailable
     try:
-        home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+        home_content = home_content_cache.get()
     except Exception as e:
         # Log the error but don't crash - return empty HomeContent
         print(f"Database error in index route: {e}")
@@ -104,6 +112,7 @@ def index():
 
 # Public course description/marketing page
 @main_bp.route('/courseDescription/<int:course_id>')
+@cached_response(ttl=120, tags=('courses', 'course_reviews', 'home_content'))
 def course_description_page(course_id):
     from yonca.models import Course, HomeContent, CourseReview
     from flask_login import current_user
@@ -112,7 +121,7 @@ def course_description_page(course_id):
     course = Course.query.get(course_id)
     if not course:
         abort(404)
-    home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+    home_content = home_content_cache.get()
     reviews = CourseReview.query.filter_by(course_id=course.id).order_by(CourseReview.created_at.desc()).all()
     return render_template('course_description.html', course=course, home_content=home_content, reviews=reviews, is_authenticated=current_user.is_authenticated, current_user=current_user)
 
@@ -129,12 +138,12 @@ def course_page_enrolled(course_id):
     if not course:
         abort(404)
 
-    # Debug user and enrollment status
-    print(f"DEBUG: current_user.is_authenticated: {getattr(current_user, 'is_authenticated', None)}")
-    print(f"DEBUG: current_user.is_teacher: {getattr(current_user, 'is_teacher', None)}")
-    print(f"DEBUG: current_user.id: {getattr(current_user, 'id', None)}")
-    print(f"DEBUG: course.users: {[getattr(u, 'id', None) for u in getattr(course, 'users', [])]}")
-    print(f"DEBUG: current_user in course.users: {current_user in getattr(course, 'users', [])}")
+    # Debug user and enrollment status (the user list is only loaded when debug logging is on)
+    logger.debug(
+        'course_page_enrolled course=%s user=%s authenticated=%s teacher=%s course_users=%s',
+        course.id, getattr(current_user, 'id', None), current_user.is_authenticated,
+        getattr(current_user, 'is_teacher', None), lazy(lambda: [u.id for u in course.users])
+    )
 
     # Check enrollment status
     enrolled = current_user.is_authenticated and (current_user in course.users or current_user.is_teacher)
@@ -234,7 +243,8 @@ def course_page_enrolled(course_id):
             temp_file_path = os.path.join(temp_dir, unique_filename)
             
             # Save the file temporarily
-            uploaded_file.save(temp_file_path)
+            from yonca.file_dedup import save_upload, upload_file_deduplicated
+            digests = save_upload(uploaded_file, temp_file_path)
             
             # Upload to Google Drive
             from yonca.google_drive_service import authenticate, upload_file, create_view_only_link, set_file_permissions
@@ -244,7 +254,7 @@ def course_page_enrolled(course_id):
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
             
             try:
-                drive_file_id = upload_file(service, temp_file_path, filename)
+                drive_file_id, _ = upload_file_deduplicated(service, temp_file_path, filename, digests)
             except Exception as e:
                 print(f"Error uploading to Drive: {e}")
                 if "insufficientPermissions" in str(e) or "403" in str(e):
@@ -332,10 +342,10 @@ def course_page_enrolled(course_id):
             folder_description = request.form.get('folder_description')
             
             # Debugging logs for create_folder
-            print("[DEBUG] Create Folder Action Triggered")
-            print("[DEBUG] Parent Folder ID:", parent_folder_id)
-            print("[DEBUG] Folder Title:", folder_title)
-            print("[DEBUG] Folder Description:", folder_description)
+            logger.debug('Create Folder Action Triggered')
+            logger.debug('Parent Folder ID: %s', parent_folder_id)
+            logger.debug('Folder Title: %s', folder_title)
+            logger.debug('Folder Description: %s', folder_description)
 
             new_folder = CourseContentFolder(
                 course_id=course.id,
@@ -361,11 +371,11 @@ def course_page_enrolled(course_id):
             uploaded_file = request.files.get('content_file')
             
             # Debugging logs for upload_file
-            print("[DEBUG] Upload File Action Triggered")
-            print("[DEBUG] File Folder ID:", file_folder_id)
-            print("[DEBUG] File Title:", file_title)
-            print("[DEBUG] File Description:", file_description)
-            print("[DEBUG] Uploaded File:", uploaded_file.filename if uploaded_file else "No file uploaded")
+            logger.debug('Upload File Action Triggered')
+            logger.debug('File Folder ID: %s', file_folder_id)
+            logger.debug('File Title: %s', file_title)
+            logger.debug('File Description: %s', file_description)
+            logger.debug('Uploaded File: %s', uploaded_file.filename if uploaded_file else "No file uploaded")
             
             if not uploaded_file:
                 flash('Please select a file to upload.', 'error')
@@ -382,7 +392,8 @@ def course_page_enrolled(course_id):
             temp_file_path = os.path.join(temp_dir, unique_filename)
             
             # Save the file temporarily
-            uploaded_file.save(temp_file_path)
+            from yonca.file_dedup import save_upload, upload_file_deduplicated
+            digests = save_upload(uploaded_file, temp_file_path)
             
             # Upload to Google Drive
             from yonca.google_drive_service import authenticate, upload_file, create_view_only_link, set_file_permissions
@@ -392,7 +403,7 @@ def course_page_enrolled(course_id):
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
             
             try:
-                drive_file_id = upload_file(service, temp_file_path, filename)
+                drive_file_id, _ = upload_file_deduplicated(service, temp_file_path, filename, digests)
             except Exception as e:
                 print(f"Error uploading to Drive: {e}")
                 if "insufficientPermissions" in str(e) or "403" in str(e):
@@ -459,7 +470,8 @@ def course_page_enrolled(course_id):
         # Delete course content
         elif action == 'delete_content' and (current_user.is_teacher or current_user.is_admin):
             from yonca.models import CourseContent
-            from yonca.google_drive_service import authenticate, delete_file
+            from yonca.google_drive_service import authenticate
+            from yonca.file_dedup import delete_unreferenced_drive_file
             
             content_id = request.form.get('content_id')
             content = CourseContent.query.get(content_id)
@@ -473,7 +485,7 @@ def course_page_enrolled(course_id):
                 service = authenticate()
                 if service:
                     try:
-                        delete_file(service, content.drive_file_id)
+                        delete_unreferenced_drive_file(service, content.drive_file_id)
                     except Exception as e:
                         print(f"Error deleting file from Google Drive: {e}")
             
@@ -486,7 +498,8 @@ def course_page_enrolled(course_id):
         # Delete assignment submission
         elif action == 'delete_submission' and current_user.is_authenticated:
             from yonca.models import CourseAssignmentSubmission
-            from yonca.google_drive_service import authenticate, delete_file
+            from yonca.google_drive_service import authenticate
+            from yonca.file_dedup import delete_unreferenced_drive_file
             
             submission_id = request.form.get('submission_id')
             submission = CourseAssignmentSubmission.query.get(submission_id)
@@ -505,7 +518,7 @@ def course_page_enrolled(course_id):
                 service = authenticate()
                 if service:
                     try:
-                        delete_file(service, submission.drive_file_id)
+                        delete_unreferenced_drive_file(service, submission.drive_file_id)
                     except Exception as e:
                         print(f"Error deleting file from Google Drive: {e}")
             
@@ -518,7 +531,8 @@ def course_page_enrolled(course_id):
         # Toggle content visibility
         elif action == 'toggle_content_visibility' and (current_user.is_teacher or current_user.is_admin):
             from yonca.models import CourseContent
-            from yonca.google_drive_service import authenticate, set_file_permissions
+            from yonca.google_drive_service import authenticate
+            from yonca.file_dedup import update_drive_file_visibility
             
             content_id = request.form.get('content_id')
             content = CourseContent.query.get(content_id)
@@ -535,7 +549,8 @@ def course_page_enrolled(course_id):
                 service = authenticate()
                 if service:
                     try:
-                        set_file_permissions(service, content.drive_file_id, make_public=content.allow_others_to_view)
+                        # Other records may share this file; it stays public while any of them is visible
+                        update_drive_file_visibility(service, content.drive_file_id)
                     except Exception as e:
                         print(f"Error updating Drive permissions: {e}")
             
@@ -546,7 +561,8 @@ def course_page_enrolled(course_id):
         # Toggle submission visibility
         elif action == 'toggle_submission_visibility' and current_user.is_authenticated:
             from yonca.models import CourseAssignmentSubmission
-            from yonca.google_drive_service import authenticate, set_file_permissions
+            from yonca.google_drive_service import authenticate
+            from yonca.file_dedup import update_drive_file_visibility
             
             submission_id = request.form.get('submission_id')
             submission = CourseAssignmentSubmission.query.get(submission_id)
@@ -568,7 +584,8 @@ def course_page_enrolled(course_id):
                 service = authenticate()
                 if service:
                     try:
-                        set_file_permissions(service, submission.drive_file_id, make_public=submission.allow_others_to_view)
+                        # Other records may share this file; it stays public while any of them is visible
+                        update_drive_file_visibility(service, submission.drive_file_id)
                     except Exception as e:
                         print(f"Error updating Drive permissions: {e}")
             
@@ -592,17 +609,10 @@ def course_page_enrolled(course_id):
                 flash('Folder does not belong to this course.', 'error')
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
             
-            def delete_folder_and_contents(folder):
-                # Recursively delete all subfolders and their contents
-                for subfolder in folder.subfolders:
-                    delete_folder_and_contents(subfolder)
-                # Delete all files in this folder
-                for item in folder.items:
-                    db.session.delete(item)
-                db.session.delete(folder)
-
             if delete_with_contents:
-                delete_folder_and_contents(folder)
+                from yonca.course_content_service import delete_course_content
+                # Deletes the whole subtree in bulk; Drive files are removed by a background job
+                delete_course_content(course, current_user, folder_ids=[folder.id])
                 db.session.commit()
                 flash('Folder and all its contents deleted successfully!', 'success')
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
@@ -669,7 +679,8 @@ def course_page_enrolled(course_id):
         # Delete assignment
         elif action == 'delete_assignment' and (current_user.is_teacher or current_user.is_admin):
             from yonca.models import CourseAssignment
-            from yonca.google_drive_service import authenticate, delete_file
+            from yonca.google_drive_service import authenticate
+            from yonca.file_dedup import delete_unreferenced_drive_file
             assignment_id = request.form.get('assignment_id')
             assignment = CourseAssignment.query.get(assignment_id)
             
@@ -689,7 +700,7 @@ def course_page_enrolled(course_id):
                     service = authenticate()
                     if service:
                         try:
-                            delete_file(service, submission.drive_file_id)
+                            delete_unreferenced_drive_file(service, submission.drive_file_id)
                         except Exception as e:
                             print(f"Error deleting submission file from Google Drive: {e}")
                 db.session.delete(submission)
@@ -802,20 +813,20 @@ def course_page_enrolled(course_id):
         # Import single file from Google Drive
         elif action == 'import_drive_file' and (current_user.is_teacher or current_user.is_admin):
             drive_url = request.form.get('drive_url', '').strip()
-            print(f"DEBUG: import_drive_file action called with drive_url: {drive_url}")
+            logger.debug('import_drive_file action called with drive_url: %s', drive_url)
             if not drive_url:
                 flash('Please provide a Google Drive file URL or ID.', 'error')
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
             
             from yonca.google_drive_service import authenticate, import_drive_file
             service = authenticate()
-            print(f"DEBUG: authenticate() returned: {service is not None}")
+            logger.debug('authenticate() returned: %s', service is not None)
             if not service:
                 flash(Markup('Failed to authenticate with Google Drive. Please <a href="/auth/link-google-account" class="alert-link">link your Google account</a> first.'), 'error')
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
             
             file_data = import_drive_file(service, drive_url)
-            print(f"DEBUG: import_drive_file() returned: {file_data}")
+            logger.debug('import_drive_file() returned: %s', file_data)
             if isinstance(file_data, dict) and 'error' in file_data:
                 error_msg = file_data["error"]
                 if 'error_code' in file_data and file_data['error_code'] == 404:
@@ -831,6 +842,7 @@ def course_page_enrolled(course_id):
             # Optional folder assignment
             folder_id = request.form.get('import_folder_id')
             
+            from yonca.course_content_service import next_content_order
             content = CourseContent(
                 course_id=course.id,
                 title=request.form.get('import_title') or file_data['name'],
@@ -839,36 +851,36 @@ def course_page_enrolled(course_id):
                 content_data=file_data['view_link'],
                 drive_file_id=file_data['file_id'],
                 drive_view_link=file_data['view_link'],
-                order=CourseContent.query.filter_by(course_id=course.id).count() + 1,
+                order=next_content_order(course.id),
                 folder_id=int(folder_id) if folder_id else None,
                 is_published=request.form.get('import_published') == 'on',
                 allow_others_to_view=request.form.get('import_allow_view') == 'on'
             )
-            print(f"DEBUG: Created CourseContent object: {content.title}, drive_file_id: {content.drive_file_id}")
+            logger.debug('Created CourseContent object: %s, drive_file_id: %s', content.title, content.drive_file_id)
             db.session.add(content)
-            print("DEBUG: Added content to session")
+            logger.debug('Added content to session')
             db.session.commit()
-            print("DEBUG: Committed to database")
+            logger.debug('Committed to database')
             flash(f'Successfully imported: {file_data["name"]}', 'success')
             return redirect(url_for('main.course_page_enrolled', course_id=course.id))
         
         # Import entire folder from Google Drive
         elif action == 'import_drive_folder' and (current_user.is_teacher or current_user.is_admin):
             folder_url = request.form.get('drive_url', '').strip()
-            print(f"DEBUG: import_drive_folder action called with folder_url: {folder_url}")
+            logger.debug('import_drive_folder action called with folder_url: %s', folder_url)
             if not folder_url:
                 flash('Please provide a Google Drive folder URL or ID.', 'error')
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
             
             from yonca.google_drive_service import authenticate, import_drive_folder
             service = authenticate()
-            print(f"DEBUG: authenticate() returned: {service is not None}")
+            logger.debug('authenticate() returned: %s', service is not None)
             if not service:
                 flash(Markup('Failed to authenticate with Google Drive. Please <a href="/auth/link-google-account" class="alert-link">link your Google account</a> first.'), 'error')
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
             
             folder_data = import_drive_folder(service, folder_url)
-            print(f"DEBUG: import_drive_folder() returned: {folder_data}")
+            logger.debug('import_drive_folder() returned: %s', folder_data)
             if isinstance(folder_data, dict) and 'error' in folder_data:
                 error_msg = folder_data["error"]
                 if 'error_code' in folder_data and folder_data['error_code'] == 404:
@@ -881,190 +893,36 @@ def course_page_enrolled(course_id):
                 flash(Markup('Failed to import folder from Google Drive. Please check the URL and ensure it\'s a folder. <a href="/auth/google-account-info" class="alert-link">Check linked account</a>'), 'error')
                 return redirect(url_for('main.course_page_enrolled', course_id=course.id))
             
-            # Create nested folder structure recursively
-            def create_course_folders_recursive(folder_structure, parent_folder_id=None, base_path=""):
-                """Recursively create course folders and add files"""
-                created_folders = {}
-                total_files = 0
-                
-                # Create subfolders first
-                for folder_info in folder_structure['folders']:
-                    folder_path = f"{base_path}/{folder_info['name']}" if base_path else folder_info['name']
-                    
-                    # Create course folder
-                    course_subfolder = CourseContentFolder(
-                        course_id=course.id,
-                        title=folder_info['name'],
-                        description=f'Imported from Google Drive: {folder_path}',
-                        order=CourseContentFolder.query.filter_by(course_id=course.id).count() + 1,
-                        parent_folder_id=parent_folder_id
-                    )
-                    db.session.add(course_subfolder)
-                    db.session.flush()
-                    
-                    created_folders[folder_path] = course_subfolder.id
-                    
-                    # Recursively process subfolder contents
-                    sub_files = create_course_folders_recursive(
-                        folder_info['structure'], 
-                        course_subfolder.id, 
-                        folder_path
-                    )
-                    total_files += sub_files
-                
-                # Add files to current folder level
-                for file_data in folder_structure['files']:
-                    content = CourseContent(
-                        course_id=course.id,
-                        title=file_data['name'],
-                        description=f'Imported from Google Drive: {file_data["full_path"]}',
-                        content_type='file',
-                        content_data=file_data['view_link'],
-                        drive_file_id=file_data['file_id'],
-                        drive_view_link=file_data['view_link'],
-                        order=CourseContent.query.filter_by(course_id=course.id).count() + 1,
-                        folder_id=parent_folder_id,
-                        is_published=request.form.get('import_published') == 'on',
-                        allow_others_to_view=True  # Default to visible for bulk imports
-                    )
-                    db.session.add(content)
-                    total_files += 1
-                
-                return total_files
-            
-            # Create the root course folder
-            root_course_folder = CourseContentFolder(
-                course_id=course.id,
-                title=folder_data['folder_name'],
-                description=f'Imported from Google Drive folder',
-                order=CourseContentFolder.query.filter_by(course_id=course.id).count() + 1
+            from yonca.course_content_service import import_drive_folder_to_course
+            root_folder_id, imported_count = import_drive_folder_to_course(
+                course, folder_data, current_user,
+                is_published=request.form.get('import_published') == 'on'
             )
-            db.session.add(root_course_folder)
-            db.session.flush()
-            
-            print(f"DEBUG: Created root course folder: {root_course_folder.title}, id: {root_course_folder.id}")
-            
-            # Reconstruct folder structure from flat file list
-            folder_structure = {'folders': [], 'files': []}
-            folder_map = {}
-            
-            # Group files by their folder paths
-            for file_data in folder_data['files']:
-                folder_path = file_data.get('folder_path', '')
-                
-                if folder_path:
-                    # This file is in a subfolder
-                    if folder_path not in folder_map:
-                        folder_map[folder_path] = {'folders': [], 'files': []}
-                    folder_map[folder_path]['files'].append(file_data)
-                else:
-                    # This file is in the root folder
-                    folder_structure['files'].append(file_data)
-            
-            # Build nested structure (simplified - assuming no deeply nested empty folders)
-            def build_nested_structure():
-                # For simplicity, we'll put all files in their respective folders
-                # This is a simplified approach - in a full implementation you'd rebuild the tree
-                pass
-            
-            # Add files to appropriate folders
-            imported_count = 0
-            current_folder_id = root_course_folder.id
-            
-            # Add root level files
-            for file_data in folder_data['files']:
-                folder_path = file_data.get('folder_path', '')
-                
-                if not folder_path:
-                    # Root level file
-                    content = CourseContent(
-                        course_id=course.id,
-                        title=file_data['name'],
-                        description=f'Imported from Google Drive: {file_data.get("full_path", file_data["name"])}',
-                        content_type='file',
-                        content_data=file_data['view_link'],
-                        drive_file_id=file_data['file_id'],
-                        drive_view_link=file_data['view_link'],
-                        order=imported_count + 1,
-                        folder_id=current_folder_id,
-                        is_published=request.form.get('import_published') == 'on',
-                        allow_others_to_view=True
-                    )
-                    db.session.add(content)
-                    imported_count += 1
-            
-            # For subfolders, create them and add their files
-            subfolder_files = [f for f in folder_data['files'] if f.get('folder_path')]
-            if subfolder_files:
-                # Group by immediate parent folder
-                folder_groups = {}
-                for file_data in subfolder_files:
-                    folder_path = file_data.get('folder_path', '')
-                    if folder_path:
-                        parent_folder = folder_path.split('/')[0]  # Get immediate parent
-                        if parent_folder not in folder_groups:
-                            folder_groups[parent_folder] = []
-                        folder_groups[parent_folder].append(file_data)
-                
-                # Create subfolders and add files
-                for subfolder_name, files in folder_groups.items():
-                    subfolder = CourseContentFolder(
-                        course_id=course.id,
-                        title=subfolder_name,
-                        description=f'Subfolder imported from Google Drive',
-                        order=CourseContentFolder.query.filter_by(course_id=course.id).count() + 1,
-                        parent_folder_id=current_folder_id
-                    )
-                    db.session.add(subfolder)
-                    db.session.flush()
-                    
-                    for file_data in files:
-                        content = CourseContent(
-                            course_id=course.id,
-                            title=file_data['name'],
-                            description=f'Imported from Google Drive: {file_data.get("full_path", file_data["name"])}',
-                            content_type='file',
-                            content_data=file_data['view_link'],
-                            drive_file_id=file_data['file_id'],
-                            drive_view_link=file_data['view_link'],
-                            order=imported_count + 1,
-                            folder_id=subfolder.id,
-                            is_published=request.form.get('import_published') == 'on',
-                            allow_others_to_view=True
-                        )
-                        db.session.add(content)
-                        imported_count += 1
-            
-            print(f"DEBUG: Added {imported_count} content items to session")
+            logger.debug('Imported %s content items into folder %s', imported_count, root_folder_id)
             db.session.commit()
-            print("DEBUG: Committed recursive folder import to database")
+            logger.debug('Committed recursive folder import to database')
             flash(f'Successfully imported folder "{folder_data["folder_name"]}" with {imported_count} files from all subfolders!', 'success')
             return redirect(url_for('main.course_page_enrolled', course_id=course.id))
         
+        # Re-sync a folder imported from Google Drive
+        elif action == 'sync_drive_folder' and (current_user.is_teacher or current_user.is_admin):
+            from yonca.models import DriveFolderSync
+            from yonca.drive_sync import queue_folder_sync
+            sync = DriveFolderSync.query.filter_by(course_id=course.id, folder_id=request.form.get('folder_id', type=int)).first()
+            if not sync:
+                flash('This folder is not linked to a Google Drive folder.', 'error')
+            else:
+                queue_folder_sync(sync)
+                flash('Google Drive sync started. New and changed files will appear shortly.', 'success')
+            return redirect(url_for('main.course_page_enrolled', course_id=course.id))
+        
         # Bulk delete content
         elif action == 'bulk_delete_content' and (current_user.is_teacher or current_user.is_admin):
-            from yonca.models import CourseContent
-            from yonca.google_drive_service import authenticate, delete_file
+            from yonca.course_content_service import delete_course_content
             
-            content_ids = request.form.getlist('content_ids')
-            deleted_count = 0
-            for content_id in content_ids:
-                content_id = content_id.strip()
-                if not content_id or not content_id.isdigit():
-                    continue
-                content = CourseContent.query.get(int(content_id))
-                if content and content.course_id == course.id:
-                    # Delete from Google Drive
-                    if content.drive_file_id:
-                        service = authenticate()
-                        if service:
-                            try:
-                                delete_file(service, content.drive_file_id)
-                            except Exception as e:
-                                print(f"Error deleting file from Google Drive: {e}")
-                    # Delete from database
-                    db.session.delete(content)
-                    deleted_count += 1
+            content_ids = [cid.strip() for cid in request.form.getlist('content_ids') if cid.strip().isdigit()]
+            # Drive files are removed afterwards by a background job
+            deleted_count, _ = delete_course_content(course, current_user, content_ids=content_ids)
             db.session.commit()
             flash(f'{deleted_count} items deleted successfully!', 'success')
             return redirect(url_for('main.course_page_enrolled', course_id=course.id))
@@ -1199,35 +1057,30 @@ def course_page_enrolled(course_id):
             flash(f'Visibility toggled for {toggled_count} items!', 'success')
             return redirect(url_for('main.course_page_enrolled', course_id=course.id))
 
-    home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+    home_content = home_content_cache.get()
     contents = CourseContent.query.filter_by(course_id=course.id, is_published=True).order_by(CourseContent.order).all()
-    content_folders = CourseContentFolder.query.filter_by(course_id=course.id).order_by(CourseContentFolder.order)
+    content_folders = CourseContentFolder.query.filter_by(course_id=course.id).order_by(CourseContentFolder.order).all()
+    # The folder tree is built in memory from the two lists above
+    from yonca.course_content_service import FolderTree
+    folder_tree = FolderTree(content_folders, contents)
     assignments = CourseAssignment.query.filter_by(course_id=course.id, is_published=True).order_by(CourseAssignment.due_date).all()
     announcements = CourseAnnouncement.query.filter_by(course_id=course.id, is_published=True).order_by(CourseAnnouncement.created_at.desc()).all()
     reviews = CourseReview.query.filter_by(course_id=course.id).order_by(CourseReview.created_at.desc()).all()
 
     is_teacher_or_admin = getattr(current_user, 'is_teacher', False) or getattr(current_user, 'is_admin', False)
+
+    # Submissions and reply threads are loaded up front so the template does not query per item
+    from yonca.course_activity import load_submission_index, load_reply_threads
+    submission_index = load_submission_index(assignments, current_user, include_all=is_teacher_or_admin)
+    reply_threads = load_reply_threads(announcements)
     
     # Generate folder paths for dropdown menus
     folder_paths = {folder.id: folder.title for folder in content_folders}
 
-    # Debugging folder paths
-    print("[DEBUG] Folder Paths:", folder_paths)
-
-    # Debugging content folders
-    print("[DEBUG] Content Folders:", content_folders)
-
-    # Debugging all folders in the database
-    all_folders = CourseContentFolder.query.all()
-    print("[DEBUG] All Folders in Database:", all_folders)
-
-    # Debugging is_teacher_or_admin
-    print("[DEBUG] is_teacher_or_admin:", is_teacher_or_admin)
-    print("[DEBUG] current_user.is_admin:", getattr(current_user, 'is_admin', None))
-    print("[DEBUG] current_user.is_teacher:", getattr(current_user, 'is_teacher', None))
-
-    # General debug log to confirm route access
-    print("[DEBUG] course_page_enrolled route accessed")
+    logger.debug(
+        'course_page_enrolled folders=%s teacher_or_admin=%s',
+        folder_paths, is_teacher_or_admin
+    )
 
     # Determine which assignments the current user has passed (for folder lock checks)
     passed_assignment_ids = set()
@@ -1239,13 +1092,22 @@ def course_page_enrolled(course_id):
     except Exception:
         passed_assignment_ids = set()
 
+    # Folders that can be re-synced from Google Drive
+    from yonca.models import DriveFolderSync
+    synced_folder_ids = set()
+    if is_teacher_or_admin:
+        synced_folder_ids = {row[0] for row in db.session.query(DriveFolderSync.folder_id).filter_by(course_id=course.id)}
+
     return render_template('course_page_enrolled.html',
                           course=course,
                           home_content=home_content,
                           contents=contents,
                           content_folders=content_folders,
+                          folder_tree=folder_tree,
                           assignments=assignments,
+                          submission_index=submission_index,
                           announcements=announcements,
+                          reply_threads=reply_threads,
                           reviews=reviews,
                           is_teacher_or_admin=is_teacher_or_admin,
                           folder_paths=folder_paths,
@@ -1253,6 +1115,7 @@ def course_page_enrolled(course_id):
                           current_user=current_user,
                           is_authenticated=current_user.is_authenticated,
                           passed_assignment_ids=passed_assignment_ids,
+                          synced_folder_ids=synced_folder_ids,
                           datetime=dt)
     if user:
         user.is_teacher = is_teacher
@@ -1273,7 +1136,7 @@ def courses():
     """Serve courses page"""
     from yonca.models import HomeContent
     try:
-        home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+        home_content = home_content_cache.get()
     except Exception as e:
         print(f"Database error in courses route: {e}")
         home_content = HomeContent()
@@ -1286,7 +1149,7 @@ def forum():
     """Serve forum page"""
     from yonca.models import HomeContent
     try:
-        home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+        home_content = home_content_cache.get()
     except Exception as e:
         print(f"Database error in forum route: {e}")
         home_content = HomeContent()
@@ -1299,7 +1162,7 @@ def resources():
     """Serve resources page"""
     from yonca.models import HomeContent
     try:
-        home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+        home_content = home_content_cache.get()
     except Exception as e:
         print(f"Database error in resources route: {e}")
         home_content = HomeContent()
@@ -1312,7 +1175,7 @@ def tavi_test():
     """Serve TAVI test page"""
     from yonca.models import HomeContent
     try:
-        home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+        home_content = home_content_cache.get()
     except Exception as e:
         print(f"Database error in tavi-test route: {e}")
         home_content = HomeContent()
@@ -1321,11 +1184,12 @@ def tavi_test():
                          home_content=home_content, initial_page='tavi-test')
 
 @main_bp.route('/about')
+@cached_response(ttl=300, tags=('home_content',))
 def about():
     """Serve about page"""
     from yonca.models import HomeContent
     try:
-        home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+        home_content = home_content_cache.get()
     except Exception as e:
         print(f"Database error in about route: {e}")
         home_content = HomeContent()
@@ -1385,7 +1249,8 @@ def edit_course_page(slug):
             temp_file_path = os.path.join(temp_dir, unique_filename)
             
             # Save the file temporarily
-            uploaded_file.save(temp_file_path)
+            from yonca.file_dedup import save_upload, upload_file_deduplicated
+            digests = save_upload(uploaded_file, temp_file_path)
             
             # Upload to Google Drive
             from yonca.google_drive_service import authenticate, upload_file, create_view_only_link
@@ -1395,7 +1260,7 @@ def edit_course_page(slug):
                 return redirect(request.url, code=303)
             
             try:
-                drive_file_id = upload_file(service, temp_file_path, filename)
+                drive_file_id, _ = upload_file_deduplicated(service, temp_file_path, filename, digests)
             except Exception as e:
                 print(f"Error uploading to Drive: {e}")
                 if "insufficientPermissions" in str(e) or "403" in str(e):
@@ -1433,6 +1298,7 @@ def edit_course_page(slug):
             # Optional folder assignment
             folder_id = request.form.get('content_folder_id')
 
+            from yonca.course_content_service import next_content_order
             content = CourseContent(
                 course_id=course.id,
                 title=request.form.get('content_title', ''),
@@ -1441,7 +1307,7 @@ def edit_course_page(slug):
                 content_data=view_link,  # Store the Google Drive view link
                 drive_file_id=drive_file_id,
                 drive_view_link=view_link,
-                order=CourseContent.query.filter_by(course_id=course.id).count() + 1,
+                order=next_content_order(course.id),
                 folder_id=int(folder_id) if folder_id else None,
                 is_published=request.form.get('content_published') == 'on'
             )
@@ -1452,20 +1318,20 @@ def edit_course_page(slug):
         elif action == 'import_drive_file':
             # Import a single file from Google Drive
             drive_url = request.form.get('drive_url', '').strip()
-            print(f"DEBUG: import_drive_file action called with drive_url: {drive_url}")
+            logger.debug('import_drive_file action called with drive_url: %s', drive_url)
             if not drive_url:
                 flash('Please provide a Google Drive file URL or ID.', 'error')
                 return redirect(request.url, code=303)
             
             from yonca.google_drive_service import authenticate, import_drive_file
             service = authenticate()
-            print(f"DEBUG: authenticate() returned: {service is not None}")
+            logger.debug('authenticate() returned: %s', service is not None)
             if not service:
                 flash(Markup('Failed to authenticate with Google Drive. Please <a href="/auth/link-google-account" class="alert-link">link your Google account</a> first.'), 'error')
                 return redirect(request.url, code=303)
             
             file_data = import_drive_file(service, drive_url)
-            print(f"DEBUG: import_drive_file() returned: {file_data}")
+            logger.debug('import_drive_file() returned: %s', file_data)
             if isinstance(file_data, dict) and 'error' in file_data:
                 error_msg = file_data["error"]
                 if 'error_code' in file_data and file_data['error_code'] == 404:
@@ -1481,6 +1347,7 @@ def edit_course_page(slug):
             # Optional folder assignment
             folder_id = request.form.get('import_folder_id')
             
+            from yonca.course_content_service import next_content_order
             content = CourseContent(
                 course_id=course.id,
                 title=request.form.get('import_title') or file_data['name'],
@@ -1489,35 +1356,35 @@ def edit_course_page(slug):
                 content_data=file_data['view_link'],
                 drive_file_id=file_data['file_id'],
                 drive_view_link=file_data['view_link'],
-                order=CourseContent.query.filter_by(course_id=course.id).count() + 1,
+                order=next_content_order(course.id),
                 folder_id=int(folder_id) if folder_id else None,
                 is_published=request.form.get('import_published') == 'on',
                 allow_others_to_view=request.form.get('import_allow_view') == 'on'
             )
-            print(f"DEBUG: Created CourseContent object: {content.title}, drive_file_id: {content.drive_file_id}")
+            logger.debug('Created CourseContent object: %s, drive_file_id: %s', content.title, content.drive_file_id)
             db.session.add(content)
-            print("DEBUG: Added content to session")
+            logger.debug('Added content to session')
             db.session.commit()
-            print("DEBUG: Committed to database")
+            logger.debug('Committed to database')
             flash(f'Successfully imported: {file_data["name"]}', 'success')
             
         elif action == 'import_drive_folder':
             # Import entire folder from Google Drive
             folder_url = request.form.get('drive_url', '').strip()
-            print(f"DEBUG: import_drive_folder action called with folder_url: {folder_url}")
+            logger.debug('import_drive_folder action called with folder_url: %s', folder_url)
             if not folder_url:
                 flash('Please provide a Google Drive folder URL or ID.', 'error')
                 return redirect(request.url, code=303)
             
             from yonca.google_drive_service import authenticate, import_drive_folder
             service = authenticate()
-            print(f"DEBUG: authenticate() returned: {service is not None}")
+            logger.debug('authenticate() returned: %s', service is not None)
             if not service:
                 flash(Markup('Failed to authenticate with Google Drive. Please <a href="/auth/link-google-account" class="alert-link">link your Google account</a> first.'), 'error')
                 return redirect(request.url, code=303)
             
             folder_data = import_drive_folder(service, folder_url)
-            print(f"DEBUG: import_drive_folder() returned: {folder_data}")
+            logger.debug('import_drive_folder() returned: %s', folder_data)
             if isinstance(folder_data, dict) and 'error' in folder_data:
                 error_msg = folder_data["error"]
                 if 'error_code' in folder_data and folder_data['error_code'] == 404:
@@ -1530,156 +1397,14 @@ def edit_course_page(slug):
                 flash(Markup('Failed to import folder from Google Drive. Please check the URL and ensure it\'s a folder. <a href="/auth/google-account-info" class="alert-link">Check linked account</a>'), 'error')
                 return redirect(request.url, code=303)
             
-            # Create nested folder structure recursively
-            def create_course_folders_recursive_enrolled(folder_structure, parent_folder_id=None, base_path=""):
-                """Recursively create course folders and add files for enrolled users"""
-                created_folders = {}
-                total_files = 0
-                
-                # Create subfolders first
-                for folder_info in folder_structure['folders']:
-                    folder_path = f"{base_path}/{folder_info['name']}" if base_path else folder_info['name']
-                    
-                    # Create course folder
-                    course_subfolder = CourseContentFolder(
-                        course_id=course.id,
-                        title=folder_info['name'],
-                        description=f'Imported from Google Drive: {folder_path}',
-                        order=CourseContentFolder.query.filter_by(course_id=course.id).count() + 1,
-                        parent_folder_id=parent_folder_id
-                    )
-                    db.session.add(course_subfolder)
-                    db.session.flush()
-                    
-                    created_folders[folder_path] = course_subfolder.id
-                    
-                    # Recursively process subfolder contents
-                    sub_files = create_course_folders_recursive_enrolled(
-                        folder_info['structure'], 
-                        course_subfolder.id, 
-                        folder_path
-                    )
-                    total_files += sub_files
-                
-                # Add files to current folder level
-                for file_data in folder_structure['files']:
-                    content = CourseContent(
-                        course_id=course.id,
-                        title=file_data['name'],
-                        description=f'Imported from Google Drive: {file_data["full_path"]}',
-                        content_type='file',
-                        content_data=file_data['view_link'],
-                        drive_file_id=file_data['file_id'],
-                        drive_view_link=file_data['view_link'],
-                        order=CourseContent.query.filter_by(course_id=course.id).count() + 1,
-                        folder_id=parent_folder_id,
-                        is_published=request.form.get('import_published') == 'on',
-                        allow_others_to_view=True  # Default to visible for bulk imports
-                    )
-                    db.session.add(content)
-                    total_files += 1
-                
-                return total_files
-            
-            # Create the root course folder
-            course_folder = CourseContentFolder(
-                course_id=course.id,
-                title=folder_data['folder_name'],
-                description=f'Imported from Google Drive folder',
-                order=CourseContentFolder.query.filter_by(course_id=course.id).count() + 1
+            from yonca.course_content_service import import_drive_folder_to_course
+            root_folder_id, imported_count = import_drive_folder_to_course(
+                course, folder_data, current_user,
+                is_published=request.form.get('import_published') == 'on'
             )
-            db.session.add(course_folder)
-            db.session.flush()
-            
-            print(f"DEBUG: Created root course folder: {course_folder.title}, id: {course_folder.id}")
-            
-            # Reconstruct folder structure from flat file list
-            folder_structure = {'folders': [], 'files': []}
-            folder_map = {}
-            
-            # Group files by their folder paths
-            for file_data in folder_data['files']:
-                folder_path = file_data.get('folder_path', '')
-                
-                if folder_path:
-                    # This file is in a subfolder
-                    if folder_path not in folder_map:
-                        folder_map[folder_path] = {'folders': [], 'files': []}
-                    folder_map[folder_path]['files'].append(file_data)
-                else:
-                    # This file is in the root folder
-                    folder_structure['files'].append(file_data)
-            
-            # Add files to appropriate folders
-            imported_count = 0
-            
-            # Add root level files
-            for file_data in folder_data['files']:
-                folder_path = file_data.get('folder_path', '')
-                
-                if not folder_path:
-                    # Root level file
-                    content = CourseContent(
-                        course_id=course.id,
-                        title=file_data['name'],
-                        description=f'Imported from Google Drive: {file_data.get("full_path", file_data["name"])}',
-                        content_type='file',
-                        content_data=file_data['view_link'],
-                        drive_file_id=file_data['file_id'],
-                        drive_view_link=file_data['view_link'],
-                        order=imported_count + 1,
-                        folder_id=course_folder.id,
-                        is_published=request.form.get('import_published') == 'on',
-                        allow_others_to_view=True
-                    )
-                    db.session.add(content)
-                    imported_count += 1
-            
-            # For subfolders, create them and add their files
-            subfolder_files = [f for f in folder_data['files'] if f.get('folder_path')]
-            if subfolder_files:
-                # Group by immediate parent folder
-                folder_groups = {}
-                for file_data in subfolder_files:
-                    folder_path = file_data.get('folder_path', '')
-                    if folder_path:
-                        parent_folder = folder_path.split('/')[0]  # Get immediate parent
-                        if parent_folder not in folder_groups:
-                            folder_groups[parent_folder] = []
-                        folder_groups[parent_folder].append(file_data)
-                
-                # Create subfolders and add files
-                for subfolder_name, files in folder_groups.items():
-                    subfolder = CourseContentFolder(
-                        course_id=course.id,
-                        title=subfolder_name,
-                        description=f'Subfolder imported from Google Drive',
-                        order=CourseContentFolder.query.filter_by(course_id=course.id).count() + 1,
-                        parent_folder_id=course_folder.id
-                    )
-                    db.session.add(subfolder)
-                    db.session.flush()
-                    
-                    for file_data in files:
-                        content = CourseContent(
-                            course_id=course.id,
-                            title=file_data['name'],
-                            description=f'Imported from Google Drive: {file_data.get("full_path", file_data["name"])}',
-                            content_type='file',
-                            content_data=file_data['view_link'],
-                            drive_file_id=file_data['file_id'],
-                            drive_view_link=file_data['view_link'],
-                            order=imported_count + 1,
-                            folder_id=subfolder.id,
-                            is_published=request.form.get('import_published') == 'on',
-                            allow_others_to_view=True
-                        )
-                        db.session.add(content)
-                        imported_count += 1
-            
-            print(f"DEBUG: Added {imported_count} content items to session")
+            logger.debug('Imported %s content items into folder %s', imported_count, root_folder_id)
             db.session.commit()
-            print("DEBUG: Committed recursive folder import to database")
+            logger.debug('Committed recursive folder import to database')
             flash(f'Successfully imported folder "{folder_data["folder_name"]}" with {imported_count} files from all subfolders!', 'success')
             
         elif action == 'add_assignment':
@@ -1721,11 +1446,12 @@ def edit_course_page(slug):
 
             if folder_title:
                 from yonca.models import CourseContentFolder
+                from yonca.course_content_service import next_folder_order
                 folder = CourseContentFolder(
                     course_id=course.id,
                     title=folder_title,
                     description=folder_description or '',
-                    order=course.content_folders.count() + 1
+                    order=next_folder_order(course.id)
                 )
                 db.session.add(folder)
                 # Log DB URI for debugging (resolve sqlite path if used)
@@ -1767,28 +1493,11 @@ def edit_course_page(slug):
                 flash('Content not found or permission denied.', 'error')
         
         elif action == 'bulk_delete_content' and (current_user.is_teacher or current_user.is_admin):
-            from yonca.models import CourseContent
-            from yonca.google_drive_service import authenticate, delete_file
-            
-            content_ids = request.form.getlist('content_ids')
-            deleted_count = 0
-            
-            for content_id in content_ids:
-                content = CourseContent.query.get(content_id)
-                if content and content.course_id == course.id:
-                    # Delete from Google Drive
-                    if content.drive_file_id:
-                        service = authenticate()
-                        if service:
-                            try:
-                                delete_file(service, content.drive_file_id)
-                            except Exception as e:
-                                print(f"Error deleting file from Google Drive: {e}")
-                    
-                    # Delete from database
-                    db.session.delete(content)
-                    deleted_count += 1
+            from yonca.course_content_service import delete_course_content
             
+            content_ids = [cid.strip() for cid in request.form.getlist('content_ids') if cid.strip().isdigit()]
+            # Drive files are removed afterwards by a background job
+            deleted_count, _ = delete_course_content(course, current_user, content_ids=content_ids)
             db.session.commit()
             flash(f'{deleted_count} items deleted successfully!', 'success')
         
@@ -1913,21 +1622,21 @@ def set_language(lang):
     """Set the language for the current session"""
     from flask import session, redirect, request, make_response
     
-    print(f"DEBUG: Attempting to set language to: {lang}")
-    print(f"DEBUG: Session before: {dict(session)}")
+    logger.debug('Attempting to set language to: %s', lang)
+    logger.debug('Session before: %s', dict(session))
     
     if lang in ['en', 'az', 'ru']:
         session['language'] = lang
         session.modified = True
         session.permanent = True
-        print(f"DEBUG: Language set to: {lang}")
-        print(f"DEBUG: Session after: {dict(session)}")
+        logger.debug('Language set to: %s', lang)
+        logger.debug('Session after: %s', dict(session))
     else:
-        print(f"DEBUG: Invalid language: {lang}")
+        logger.debug('Invalid language: %s', lang)
     
     # Redirect back to the referring page or home
     redirect_url = request.referrer or url_for('main.index')
-    print(f"DEBUG: Redirecting to: {redirect_url}")
+    logger.debug('Redirecting to: %s', redirect_url)
     return redirect(redirect_url)
 
 
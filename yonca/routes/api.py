@@ -1,6 +1,7 @@
 """
 API routes for courses, forum, and resources
 """
+import logging
 import os
 import time
 from werkzeug.utils import secure_filename
@@ -9,9 +10,13 @@ from flask_login import current_user, login_required
 from flask_babel import _
 from yonca.models import Course, ForumMessage, ForumChannel, Resource, PDFDocument, Translation, db
 from yonca.translation_service import translation_service
+from yonca.forum_events import notify_forum_event
+from yonca.conditional_get import conditional_get
+from yonca.response_cache import cached_response
 from yonca.google_drive_service import authenticate, upload_file, create_view_only_link, set_file_permissions, import_drive_file, import_drive_folder
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
 
 def api_unauthorized():
     """Return JSON 401 for API unauthorized requests"""
@@ -30,107 +35,100 @@ def is_image_file(filename):
 api_bp.unauthorized = api_unauthorized
 
 @api_bp.route('/courses')
+@conditional_get('courses', per_user=True)
+@cached_response(ttl=60, tags=('courses',))
 def get_courses():
     """Get all courses with enrollment status for authenticated users"""
     from flask import session, request
-    from yonca.content_translator import get_translated_content, get_translated_string_array
-    
+    from yonca.page_data import course_payloads, enrolled_course_ids
+
     # Get language from query parameter, or fall back to session language
     user_locale = request.args.get('lang', session.get('language', 'en'))
-    
-    if current_user.is_authenticated:
-        # Get all courses
-        all_courses = Course.query.all()
-        # Get user's enrolled course IDs
-        enrolled_course_ids = {course.id for course in current_user.courses}
-
-        return jsonify([{
-            'id': c.id,
-            'title': get_translated_content('course', c.id, 'title', c.title, user_locale),
-            'description': get_translated_content('course', c.id, 'description', c.description, user_locale),
-            'time_slot': c.time_slot,
-            'profile_emoji': c.profile_emoji,
-            'dropdown_menu': c.dropdown_menu,
-            'tags': get_translated_string_array('course', c.id, 'tags', c.tags, user_locale),
-            'is_enrolled': c.id in enrolled_course_ids
-        } for c in all_courses])
-    else:
-        # For non-authenticated users, return all courses without enrollment status
-        courses = Course.query.all()
-
-        return jsonify([{
-            'id': c.id,
-            'title': get_translated_content('course', c.id, 'title', c.title, user_locale),
-            'description': get_translated_content('course', c.id, 'description', c.description, user_locale),
-            'time_slot': c.time_slot,
-            'profile_emoji': c.profile_emoji,
-            'dropdown_menu': c.dropdown_menu,
-            'tags': get_translated_string_array('course', c.id, 'tags', c.tags, user_locale)
-        } for c in courses])
+
+    # Non-authenticated users get all courses without enrollment status
+    enrolled_ids = enrolled_course_ids(current_user) if current_user.is_authenticated else None
+    return jsonify(course_payloads(Course.query.all(), user_locale, enrolled_ids))
 
 @api_bp.route('/user')
 def get_current_user():
     """Get current user information"""
     from flask import session
-    from yonca.content_translator import get_translated_content, get_translated_string_array
-    
+    from yonca.page_data import course_payloads, user_payload
+
     # Get user's current locale
     user_locale = session.get('language', 'en')
-    
+
     if current_user.is_authenticated:
-        return jsonify({
-            'id': current_user.id,
-            'username': current_user.username,
-            'is_admin': current_user.is_admin,
-            'courses': [{
-                'id': c.id,
-                'title': get_translated_content('course', c.id, 'title', c.title, user_locale),
-                'description': get_translated_content('course', c.id, 'description', c.description, user_locale),
-                'time_slot': c.time_slot,
-                'profile_emoji': c.profile_emoji,
-                'dropdown_menu': c.dropdown_menu,
-                'tags': get_translated_string_array('course', c.id, 'tags', c.tags, user_locale)
-            } for c in current_user.courses]
-        })
+        return jsonify(user_payload(current_user, course_payloads(current_user.courses, user_locale)))
     else:
         return jsonify(None)
 
+@api_bp.route('/bootstrap')
+@conditional_get('courses', 'forum_channels', 'resources', 'pdfs', per_user=True)
+@cached_response(ttl=60, tags=('courses', 'forum_channels', 'resources', 'pdfs'))
+def get_bootstrap():
+    """
+    Data for index.html's first render, in one response.
+
+    Always returns user, courses and courses_en; ?sections=forum_channels,resources,pdfs
+    adds those for the page being opened. Each section is shaped exactly like
+    the response of its own endpoint.
+    """
+    from flask import session
+    from yonca.page_data import bootstrap_payload, BOOTSTRAP_OPTIONAL_SECTIONS
+
+    requested = request.args.get('sections', '').split(',')
+    sections = [name for name in BOOTSTRAP_OPTIONAL_SECTIONS if name in requested]
+    return jsonify(bootstrap_payload(current_user, session.get('language', 'en'), sections))
+
 @api_bp.route('/forum/channels')
+@conditional_get('forum_channels')
+@cached_response(ttl=300, tags=('forum_channels',))
 def get_forum_channels():
     """Get all active forum channels"""
-    channels = ForumChannel.query.filter_by(is_active=True).order_by(ForumChannel.sort_order).all()
-    
-    return jsonify([{
-        'id': c.id,
-        'name': c.name,
-        'slug': c.slug,
-        'description': c.description,
-        'requires_login': c.requires_login,
-        'admin_only': c.admin_only
-    } for c in channels])
+    from yonca.page_data import forum_channel_payloads
 
-@api_bp.route('/forum/messages')
-def get_forum_messages():
-    """Get forum messages, optionally filtered by channel"""
-    channel_slug = request.args.get('channel', 'general')
-    
-    # Get channel from database
+    return jsonify(forum_channel_payloads())
+
+def check_forum_channel_access(channel_slug):
+    """
+    Look up an active forum channel and check the current user may read it.
+
+    Returns:
+        (channel, error_response) - error_response is None if access is allowed
+    """
     channel = ForumChannel.query.filter_by(slug=channel_slug, is_active=True).first()
     if not channel:
-        return jsonify({'error': 'Channel not found'}), 404
+        return None, (jsonify({'error': 'Channel not found'}), 404)
     
     # Check access permissions
     if channel.admin_only:
         if not current_user.is_authenticated or not current_user.is_admin:
-            return jsonify({'error': 'Admin access required for this channel'}), 403
+            return None, (jsonify({'error': 'Admin access required for this channel'}), 403)
     elif channel.requires_login and not current_user.is_authenticated:
-        return jsonify({'error': 'Authentication required for this channel'}), 403
+        return None, (jsonify({'error': 'Authentication required for this channel'}), 403)
+    return channel, None
+
+@api_bp.route('/forum/messages')
+def get_forum_messages():
+    """Get forum messages, optionally filtered by channel"""
+    channel_slug = request.args.get('channel', 'general')
+    channel, error_response = check_forum_channel_access(channel_slug)
+    if error_response:
+        return error_response
     
-    def build_thread(message, depth=0):
-        """Recursively build message thread"""
-        # Get user's preferred language
-        user_language = current_user.preferred_language if current_user.is_authenticated else 'en'
+    from yonca.forum_service import load_thread_page
 
+    limit = min(request.args.get('limit', current_app.config['FORUM_PAGE_SIZE'], type=int), current_app.config['FORUM_MAX_PAGE_SIZE'])
+    max_depth = min(request.args.get('max_depth', current_app.config['FORUM_MAX_DEPTH'], type=int), current_app.config['FORUM_MAX_DEPTH'])
+    page = load_thread_page(channel_slug, max(limit, 1), request.args.get('cursor'), max(max_depth, 0))
+
+    # Get user's preferred language
+    user_language = current_user.preferred_language if current_user.is_authenticated else 'en'
+
+    def build_thread(message, depth=0):
+        """Build a message thread from the preloaded page"""
+        replies = page.replies(message)
         result = {
             'id': message.id,
             'username': message.username,
@@ -140,23 +138,67 @@ def get_forum_messages():
             'is_current_user': current_user.is_authenticated and message.username == current_user.username,
             'depth': depth,
             'user_language': user_language,
-            'replies': []
+            'replies': [],
+            'has_more_replies': False
         }
 
-        # Get replies sorted by timestamp
-        for reply in message.replies.order_by(ForumMessage.timestamp.asc()).all():
-            result['replies'].append(build_thread(reply, depth + 1))
+        # Replies are already sorted by timestamp
+        if depth < page.max_depth:
+            result['replies'] = [build_thread(reply, depth + 1) for reply in replies]
+        else:
+            result['has_more_replies'] = bool(replies)
 
         return result
     
-    # Get messages for the specified channel
-    top_level_messages = ForumMessage.query.filter_by(channel=channel_slug, parent_id=None).order_by(ForumMessage.timestamp.desc()).all()
-    
     return jsonify({
         'channel': channel_slug,
         'channel_name': channel.name,
         'requires_login': channel.requires_login,
-        'messages': [build_thread(msg) for msg in top_level_messages]
+        'messages': [build_thread(msg) for msg in page.roots],
+        'next_cursor': page.next_cursor
+    })
+
+@api_bp.route('/forum/stream')
+def stream_forum_events():
+    """Server-Sent Events stream of new, edited and deleted messages in a channel"""
+    import json
+    import queue
+    from flask import Response
+    from yonca.forum_events import forum_event_broker
+
+    channel_slug = request.args.get('channel', 'general')
+    channel, error_response = check_forum_channel_access(channel_slug)
+    if error_response:
+        return error_response
+    if not forum_event_broker.available:
+        return jsonify({'error': 'Real-time updates are not available'}), 503
+
+    keepalive = current_app.config['FORUM_STREAM_KEEPALIVE']
+    subscription = forum_event_broker.subscribe(channel_slug)
+    if subscription is None:
+        # Every stream holds a server thread; past the cap the client polls instead
+        response = jsonify({'error': 'Too many open real-time connections, try again later'})
+        response.headers['Retry-After'] = '60'
+        return response, 503
+    # The stream stays open for a long time, so give the database connection back now
+    db.session.remove()
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = subscription.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            forum_event_broker.unsubscribe(channel_slug, subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
     })
 
 @api_bp.route('/forum/messages', methods=['POST'])
@@ -213,6 +255,8 @@ def post_forum_message():
         )
     
     db.session.add(new_message)
+    db.session.flush()
+    notify_forum_event('created', new_message)
     db.session.commit()
     
     # Refresh to get the server-generated timestamp
@@ -243,6 +287,7 @@ def edit_forum_message(message_id):
         return jsonify({'error': 'Message required'}), 400
     
     message.message = data['message']
+    notify_forum_event('updated', message)
     db.session.commit()
     
     return jsonify({'success': True}), 200
@@ -257,6 +302,7 @@ def delete_forum_message(message_id):
     if message.user_id != current_user.id and not current_user.is_admin:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    notify_forum_event('deleted', message)
     db.session.delete(message)
     db.session.commit()
     
@@ -336,6 +382,9 @@ def upload_resource():
                     # Create view-only link for preview image
                     preview_image_url = create_view_only_link(service, preview_drive_file_id, is_image=True)
                     preview_drive_view_link = preview_image_url  # Store the view link
+                    # Generate resized variants so listings don't load the full-size image
+                    from yonca.image_variants import upload_image_variants
+                    _, preview_variants = upload_image_variants(service, preview_temp_path, preview_filename)
             except Exception as e:
                 print(f"Error uploading preview to Drive: {e}")
                 if "insufficientPermissions" in str(e) or "403" in str(e):
@@ -357,11 +406,12 @@ def upload_resource():
         temp_file_path = os.path.join(temp_dir, unique_filename)
         
         # Save file temporarily
-        file.save(temp_file_path)
+        from yonca.file_dedup import save_upload, upload_file_deduplicated
+        digests = save_upload(file, temp_file_path)
         
         # Upload to Google Drive
         try:
-            drive_file_id = upload_file(service, temp_file_path, filename)
+            drive_file_id, _ = upload_file_deduplicated(service, temp_file_path, filename, digests)
         except Exception as e:
             print(f"Error uploading to Drive: {e}")
             if "insufficientPermissions" in str(e) or "403" in str(e):
@@ -374,14 +424,14 @@ def upload_resource():
         # Set file permissions to make it publicly accessible
         try:
             success = set_file_permissions(service, drive_file_id, make_public=True)
-            print(f"DEBUG: set_file_permissions for resource {drive_file_id} returned: {success}")
+            logger.debug('set_file_permissions for resource %s returned: %s', drive_file_id, success)
         except Exception as e:
             print(f"Error setting file permissions: {e}")
             # Continue anyway - view link creation might still work
         
         # Create view-only link - check if file is an image
         is_image = is_image_file(file.filename)
-        print(f"DEBUG: File {file.filename} detected as image: {is_image}")
+        logger.debug('File %s detected as image: %s', file.filename, is_image)
         view_link = create_view_only_link(service, drive_file_id, is_image=is_image)
         if not view_link:
             return jsonify({'error': 'Failed to create view link'}), 500
@@ -394,6 +444,7 @@ def upload_resource():
             preview_image=preview_image_url,
             preview_drive_file_id=preview_drive_file_id if 'preview_drive_file_id' in locals() and preview_drive_file_id else None,
             preview_drive_view_link=preview_drive_view_link if 'preview_drive_view_link' in locals() and preview_drive_view_link else None,
+            preview_variants=preview_variants if 'preview_variants' in locals() and preview_variants else None,
             drive_file_id=drive_file_id,
             drive_view_link=view_link,
             is_image_file=is_image,
@@ -436,66 +487,91 @@ def upload_resource():
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
 @api_bp.route('/resources')
+@conditional_get('resources', per_user=True)
 def get_resources():
-    """Get all learning resources"""
+    """
+    Get learning resources.
+
+    Without a limit every active resource is returned. With ?limit=N the list is
+    paged by id; pass the X-Next-Cursor response header back as ?cursor= to get
+    the next page (the header is absent on the last page).
+    """
     from flask_login import current_user
-    from datetime import datetime
     from flask import session
-    from yonca.content_translator import get_translated_content
+    from yonca.page_data import resource_payloads
 
     # Get user's current locale from session
     user_locale = session.get('language', 'en')
 
-    resources = Resource.query.filter_by(is_active=True).all()
-    result = []
+    limit = request.args.get('limit', type=int)
+    if limit:
+        limit = min(max(limit, 1), current_app.config['RESOURCES_MAX_PAGE_SIZE'])
+    result, next_cursor = resource_payloads(current_user, user_locale, limit, request.args.get('cursor', type=int))
 
-    for r in resources:
-        # Check if PIN has expired and regenerate if needed
-        if r.is_pin_expired():
-            r.reset_pin()
-            db.session.commit()
+    response = jsonify(result)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
 
-        # Get translated title and description
-        translated_title = get_translated_content('resource', r.id, 'title', r.title, user_locale)
-        translated_description = get_translated_content('resource', r.id, 'description', r.description, user_locale)
-
-        resource_data = {
-            'id': r.id,
-            'title': translated_title,
-            'description': translated_description,
-            'tags': ' '.join([_(tag.strip()) for tag in (r.tags or '').split() if tag.strip()]),
-            'preview_image': r.preview_image,
-            'preview_drive_file_id': r.preview_drive_file_id,
-            'preview_drive_view_link': r.preview_drive_view_link,
-            'drive_view_link': r.drive_view_link,
-            'upload_date': r.upload_date.isoformat() if r.upload_date else None,
-            'pin_expires_at': r.pin_expires_at.isoformat() if r.pin_expires_at else None,
-            'pin_last_reset': r.pin_last_reset.isoformat() if r.pin_last_reset else None,
-            'has_pin': bool(r.access_pin),
-            'uploaded_by': r.uploaded_by
-        }
+@api_bp.route('/search')
+def search():
+    """
+    Ranked full-text search over resources and courses.
 
-        # Check if user has permanent access to this resource
-        has_permanent_access = current_user.is_authenticated and r in current_user.accessed_resources
-        
-        if has_permanent_access:
-            # User has already accessed this resource, show view link directly
-            resource_data['permanent_access'] = True
-            resource_data['access_granted'] = True
-        elif not current_user.is_authenticated:
-            # Non-authenticated users need to log in
-            resource_data['permanent_access'] = False
-            resource_data['requires_login'] = True
-        else:
-            # Authenticated users who don't have permanent access need PIN
-            resource_data['permanent_access'] = False
-            resource_data['requires_pin'] = True
-            if current_user.is_admin or r.uploaded_by == current_user.id:
-                resource_data['access_pin'] = r.access_pin
+    Matches titles, descriptions and tags in every language. Query parameters:
+    q (required), type ('resource' or 'course', optional), limit, lang.
+    """
+    from flask import session
+    from yonca.content_translator import get_translated_fields
+    from yonca.search_index import search_documents
+
+    text = request.args.get('q', '').strip()
+    content_type = request.args.get('type') or None
+    if content_type not in (None, 'resource', 'course'):
+        return jsonify({'error': "type must be 'resource' or 'course'"}), 400
+    if not text:
+        return jsonify({'error': 'q is required'}), 400
 
-        result.append(resource_data)
+    limit = min(max(request.args.get('limit', current_app.config['SEARCH_PAGE_SIZE'], type=int), 1), current_app.config['SEARCH_MAX_PAGE_SIZE'])
+    user_locale = request.args.get('lang', session.get('language', 'en'))
 
-    return jsonify(result)
+    hits = search_documents(text, content_type, limit)
+    resource_ids = [content_id for hit_type, content_id, _rank in hits if hit_type == 'resource']
+    course_ids = [content_id for hit_type, content_id, _rank in hits if hit_type == 'course']
+
+    resources = {r.id: r for r in Resource.query.filter(Resource.id.in_(resource_ids), Resource.is_active == True)} if resource_ids else {}
+    courses = {c.id: c for c in Course.query.filter(Course.id.in_(course_ids))} if course_ids else {}
+    resource_translations = get_translated_fields('resource', resources, ('title', 'description'), user_locale)
+    max_tags = max((len(c.tags or []) for c in courses.values()), default=0)
+    course_translations = get_translated_fields(
+        'course', courses, ('title', 'description') + tuple(f"tags[{i}]" for i in range(max_tags)), user_locale
+    )
+
+    results = []
+    for hit_type, content_id, rank in hits:
+        if hit_type == 'resource' and content_id in resources:
+            r = resources[content_id]
+            results.append({
+                'type': 'resource',
+                'id': r.id,
+                'title': resource_translations.get((r.id, 'title'), r.title),
+                'description': resource_translations.get((r.id, 'description'), r.description),
+                'tags': [_(tag) for tag in (r.tags or '').split()],
+                'has_pin': bool(r.access_pin),
+                'rank': rank
+            })
+        elif hit_type == 'course' and content_id in courses:
+            c = courses[content_id]
+            results.append({
+                'type': 'course',
+                'id': c.id,
+                'title': course_translations.get((c.id, 'title'), c.title),
+                'description': course_translations.get((c.id, 'description'), c.description),
+                'tags': [course_translations.get((c.id, f"tags[{i}]"), tag) for i, tag in enumerate(c.tags or [])],
+                'rank': rank
+            })
+
+    return jsonify({'query': text, 'results': results})
 
 @api_bp.route('/resources/<int:resource_id>/reset-pin', methods=['POST'])
 @login_required
@@ -521,20 +597,13 @@ def reset_resource_pin(resource_id):
     }), 200
 
 @api_bp.route('/pdfs')
+@conditional_get('pdfs', per_user=True)
 def get_pdfs():
     """Get all active PDF documents (without sensitive info)"""
     from flask_login import current_user
-    pdfs = PDFDocument.query.filter_by(is_active=True).all()
-    return jsonify([{
-        'id': p.id,
-        'title': p.title,
-        'description': p.description,
-        'file_size': p.file_size,
-        'upload_date': p.upload_date.isoformat() if p.upload_date else None,
-        'uploaded_by': p.uploaded_by,
-        # Only show PIN to the uploader
-        'access_pin': p.access_pin if (current_user.is_authenticated and p.uploaded_by == current_user.id) else None
-    } for p in pdfs])
+    from yonca.page_data import pdf_payloads
+
+    return jsonify(pdf_payloads(current_user))
 
 @api_bp.route('/resources/<int:resource_id>/access', methods=['POST'])
 @login_required
@@ -649,7 +718,8 @@ def upload_pdf():
         temp_file_path = os.path.join(temp_dir, unique_filename)
         
         # Save file temporarily
-        file.save(temp_file_path)
+        from yonca.file_dedup import save_upload, upload_file_deduplicated
+        digests = save_upload(file, temp_file_path)
         
         # Upload to Google Drive
         from yonca.google_drive_service import authenticate, upload_file, create_view_only_link
@@ -658,7 +728,7 @@ def upload_pdf():
             return jsonify({'error': 'Failed to authenticate with Google Drive'}), 500
         
         try:
-            drive_file_id = upload_file(service, temp_file_path, filename)
+            drive_file_id, _ = upload_file_deduplicated(service, temp_file_path, filename, digests)
         except Exception as e:
             print(f"Error uploading to Drive: {e}")
             if "insufficientPermissions" in str(e) or "403" in str(e):
@@ -829,6 +899,7 @@ def translate_batch():
         return jsonify({'error': 'Batch translation failed'}), 500
 
 @api_bp.route('/languages')
+@conditional_get()
 def get_supported_languages():
     """Get list of supported languages for translation"""
     return jsonify(translation_service.get_supported_languages())
@@ -988,7 +1059,7 @@ def upload_logo():
 
         # Make the logo publicly viewable
         success = set_file_permissions(service, drive_file_id, make_public=True)
-        print(f"DEBUG: set_file_permissions for logo {drive_file_id} returned: {success}")
+        logger.debug('set_file_permissions for logo %s returned: %s', drive_file_id, success)
 
         # Clean up temporary file
         try:
@@ -1006,31 +1077,12 @@ def upload_logo():
     else:
         return jsonify({'error': 'Invalid file type. Only images are allowed.'}), 400
 
-@api_bp.route('/file/<file_id>')
-@login_required
-def serve_file(file_id):
-    """Serve a Google Drive file after authentication"""
-    from yonca.models import CourseAssignmentSubmission, CourseContent, Resource, PDFDocument
-    from flask_login import current_user
-    from flask import redirect, render_template, url_for
-    
-    # Find the file in any of the models that store files
-    submission = CourseAssignmentSubmission.query.filter_by(drive_file_id=file_id).first()
-    course_content = CourseContent.query.filter_by(drive_file_id=file_id).first()
-    resource = Resource.query.filter_by(drive_file_id=file_id).first()
-    resource_preview = Resource.query.filter_by(preview_drive_file_id=file_id).first()
-    pdf_doc = PDFDocument.query.filter_by(drive_file_id=file_id).first()
-    
-    file_record = submission or course_content or resource or resource_preview or pdf_doc
-    
-    if not file_record:
-        return jsonify({'error': 'File not found'}), 404
-    
+def _file_record_access_error(file_record, course_content, is_preview):
+    """Return an error response if the current user may not view a file through this record, else None"""
     # Determine ownership and permissions
     is_owner = False
     is_admin = current_user.is_authenticated and current_user.is_admin
     is_teacher = current_user.is_authenticated and current_user.is_teacher
-    is_preview = resource_preview is not None  # Preview images are always public
     is_public = getattr(file_record, 'allow_others_to_view', True)  # Default to True if field doesn't exist
     
     # Check ownership based on file type
@@ -1047,22 +1099,62 @@ def serve_file(file_id):
     
     if is_preview:
         # Preview images are always accessible
-        pass
-    elif not is_public:
+        return None
+    if not is_public:
         if not (is_owner or is_admin or is_teacher):
             return jsonify({'error': 'This file is private and you do not have permission to view it'}), 403
-    else:
+    elif course_content:
         # For public course content, check enrollment
-        if course_content:
-            if current_user.is_authenticated:
-                from yonca.models import Course
-                course = Course.query.get(course_content.course_id)
-                is_enrolled = course and current_user in course.users
-                
-                if not (is_owner or is_admin or is_teacher or is_enrolled):
-                    return jsonify({'error': 'You must be enrolled in this course to view this file'}), 403
-            else:
-                return jsonify({'error': 'You must be logged in to view course content'}), 403
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'You must be logged in to view course content'}), 403
+        from yonca.models import Course
+        course = Course.query.get(course_content.course_id)
+        is_enrolled = course and current_user in course.users
+        
+        if not (is_owner or is_admin or is_teacher or is_enrolled):
+            return jsonify({'error': 'You must be enrolled in this course to view this file'}), 403
+    return None
+
+def check_file_access(file_id):
+    """
+    Find a record that points at a Drive file and lets the current user view it.
+
+    Deduplicated uploads can share one Drive file between several records, so
+    access is granted if any of them allows it.
+
+    Returns:
+        (file_record, course_content, error_response) - error_response is None when access is allowed
+    """
+    from yonca.models import CourseAssignmentSubmission, CourseContent, Resource, PDFDocument
+    
+    # Every record in the models that store files, as (record, course_content, is_preview)
+    candidates = [(content, content, False) for content in CourseContent.query.filter_by(drive_file_id=file_id)]
+    candidates += [(resource, None, True) for resource in Resource.query.filter_by(preview_drive_file_id=file_id)]
+    candidates += [(resource, None, False) for resource in Resource.query.filter_by(drive_file_id=file_id)]
+    candidates += [(pdf_doc, None, False) for pdf_doc in PDFDocument.query.filter_by(drive_file_id=file_id)]
+    candidates += [(submission, None, False)
+                   for submission in CourseAssignmentSubmission.query.filter_by(drive_file_id=file_id)]
+    
+    if not candidates:
+        return None, None, (jsonify({'error': 'File not found'}), 404)
+    
+    first_error = None
+    for file_record, course_content, is_preview in candidates:
+        error_response = _file_record_access_error(file_record, course_content, is_preview)
+        if error_response is None:
+            return file_record, course_content, None
+        first_error = first_error or (file_record, course_content, error_response)
+    return first_error
+
+@api_bp.route('/file/<file_id>')
+@login_required
+def serve_file(file_id):
+    """Serve a Google Drive file after authentication"""
+    from flask import redirect, render_template, url_for
+    
+    file_record, course_content, error_response = check_file_access(file_id)
+    if error_response:
+        return error_response
     
     # For course content files, use the embedded viewer (no download)
     if course_content:
@@ -1081,12 +1173,20 @@ def serve_file(file_id):
                 file_type = 'video'
             elif any(ext in title_lower for ext in ['.zip', '.rar', '.7z', '.tar', '.gz']):
                 file_type = 'unsupported'
+            elif title_lower.endswith('.pdf'):
+                file_type = 'pdf'
+        
+        # Stream media through the caching proxy when it is enabled
+        proxy_url = None
+        if current_app.config.get('FILE_PROXY_ENABLED'):
+            proxy_url = url_for('api.stream_file', file_id=file_id)
         
         return render_template('file_viewer.html', 
                              file_id=file_id, 
                              file_title=file_title,
                              file_type=file_type,
-                             back_url=back_url)
+                             back_url=back_url,
+                             proxy_url=proxy_url)
     
     # For other files (submissions, resources, etc.), redirect to the drive_view_link
     if hasattr(file_record, 'drive_view_link') and file_record.drive_view_link:
@@ -1095,6 +1195,62 @@ def serve_file(file_id):
     # If no view link exists, try to construct a direct Google Drive link
     return redirect(f'https://drive.google.com/file/d/{file_id}/view')
 
+@api_bp.route('/file/<file_id>/content')
+@login_required
+def stream_file(file_id):
+    """Stream a Drive file from the local cache, with Range and ETag/If-None-Match support"""
+    from flask import send_file
+    from yonca.models import User
+    from yonca.file_cache import drive_file_cache, FILE_ID_PATTERN
+    from yonca.google_drive_service import fetch_file_content, fetch_public_file_content
+    
+    if not current_app.config.get('FILE_PROXY_ENABLED'):
+        return jsonify({'error': 'File proxy is disabled'}), 404
+    
+    if not FILE_ID_PATTERN.match(file_id):
+        return jsonify({'error': 'File not found'}), 404
+    
+    file_record, course_content, error_response = check_file_access(file_id)
+    if error_response:
+        return error_response
+    
+    def fetch(local_path):
+        """Download with the viewer's or the owner's Drive account, then fall back to the public link"""
+        owner_id = getattr(file_record, 'user_id', None) or getattr(file_record, 'uploaded_by', None)
+        candidates = [current_user]
+        if owner_id and owner_id != current_user.id:
+            owner = db.session.get(User, owner_id)
+            if owner:
+                candidates.append(owner)
+        
+        for user in candidates:
+            if not user.google_access_token:
+                continue
+            service = authenticate(user)
+            if service:
+                metadata = fetch_file_content(service, file_id, local_path)
+                if metadata:
+                    return metadata
+        
+        return fetch_public_file_content(file_id, local_path, current_app.config.get('GOOGLE_API_KEY'))
+    
+    cached = drive_file_cache.get_or_fetch(file_id, fetch)
+    if not cached:
+        return jsonify({'error': 'Failed to fetch file from Google Drive'}), 502
+    
+    path, metadata = cached
+    # send_file answers Range requests with 206 and If-None-Match with 304
+    response = send_file(
+        path,
+        mimetype=metadata.get('mime_type') or 'application/octet-stream',
+        conditional=True,
+        etag=metadata.get('etag') or True,
+        max_age=current_app.config.get('FILE_CACHE_MAX_AGE', 3600)
+    )
+    response.cache_control.private = True
+    response.cache_control.public = False
+    return response
+
 @api_bp.route('/import-drive-file', methods=['POST'])
 @login_required
 def import_drive_file_endpoint():
@@ -1191,6 +1347,9 @@ def import_drive_file_to_resource():
                 return jsonify({'error': 'Resource not found'}), 404
             
             # Update resource with imported file data
+            if resource.drive_file_id:
+                from yonca.file_cache import drive_file_cache
+                drive_file_cache.invalidate(resource.drive_file_id)
             resource.name = file_data.get('name')
             resource.drive_file_id = file_data.get('file_id')
             resource.drive_view_link = file_data.get('view_link')
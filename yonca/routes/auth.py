@@ -4,7 +4,8 @@ Authentication routes
 from flask import Blueprint, request, redirect, url_for, flash, jsonify, render_template, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from flask_babel import get_locale
-from yonca.models import User, db, HomeContent
+from yonca.models import User, db
+from yonca.home_content_cache import home_content_cache
 import logging
 import requests
 import secrets
@@ -116,7 +117,7 @@ def login():
         
         flash('Invalid username or password')
     
-    home_content = HomeContent.query.filter_by(is_active=True).first() or HomeContent()
+    home_content = home_content_cache.get()
     return render_template('login.html', home_content=home_content)
 
 @auth_bp.route('/logout')
@@ -0,0 +1,208 @@
+"""
+Full-text search over resources and courses.
+
+Each searchable item has one SearchDocument row holding its title, tags and
+description in every language (originals plus ContentTranslation rows). On
+PostgreSQL the row also carries a weighted tsvector with a GIN index, so a
+search is one indexed, ranked query. Other databases fall back to LIKE.
+
+Documents are kept current by session hooks: any flush that touches a
+Resource, Course or one of their ContentTranslation rows queues the item,
+and its document is rebuilt just before the transaction commits.
+"""
+import re
+from sqlalchemy import event, update, func, or_, case, literal_column
+from sqlalchemy.orm import Session
+from yonca.models import db, Resource, Course, ContentTranslation, SearchDocument
+
+INDEXED_MODELS = {'resource': Resource, 'course': Course}
+SEARCH_LANGUAGES = ('en', 'az', 'ru')
+# 'simple' lower-cases without stemming; there is no Azerbaijani stemmer
+TS_CONFIG = literal_column("'simple'::regconfig")
+MAX_QUERY_TERMS = 8
+
+_PENDING_KEY = 'search_index_pending'
+
+
+def _is_postgres(session):
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def _search_vector():
+    """Titles rank above tags, tags above descriptions"""
+    def weighted(column, weight):
+        return func.setweight(func.to_tsvector(TS_CONFIG, func.coalesce(column, '')), weight)
+    return weighted(SearchDocument.title, 'A').op('||')(weighted(SearchDocument.tags, 'B')).op('||')(weighted(SearchDocument.body, 'C'))
+
+
+def _catalog_tags(tag):
+    """A resource tag plus its gettext translations (resource tags are translated through the message catalog)"""
+    from flask_babel import force_locale, gettext
+
+    translated = {tag}
+    for language in SEARCH_LANGUAGES:
+        with force_locale(language):
+            translated.add(gettext(tag))
+    return translated
+
+
+def _document_fields(content_type, item, translations):
+    """Return (title, tags, body) text for an item and its ContentTranslation rows"""
+    titles = [item.title]
+    bodies = [item.description]
+    tags = []
+    if content_type == 'resource':
+        for tag in (item.tags or '').split():
+            tags.extend(_catalog_tags(tag))
+    else:
+        tags.extend(tag for tag in (item.tags or []) if isinstance(tag, str))
+
+    for translation in translations:
+        if translation.field_name == 'title':
+            titles.append(translation.translated_text)
+        elif translation.field_name == 'description':
+            bodies.append(translation.translated_text)
+        elif translation.field_name.startswith('tags'):
+            tags.append(translation.translated_text)
+
+    unique_tags = dict.fromkeys(tag.strip().lower() for tag in tags if tag and tag.strip())
+    return (
+        '\n'.join(dict.fromkeys(t for t in titles if t)),
+        ' '.join(unique_tags),
+        '\n'.join(dict.fromkeys(b for b in bodies if b)),
+    )
+
+
+def refresh_search_documents(items, session=None):
+    """
+    Rebuild the search documents for a set of items.
+
+    Args:
+        items: Iterable of (content_type, content_id) pairs
+        session: SQLAlchemy session to use (defaults to db.session)
+    """
+    session = session or db.session
+    ids_by_type = {}
+    for content_type, content_id in items:
+        if content_type in INDEXED_MODELS and content_id is not None:
+            ids_by_type.setdefault(content_type, set()).add(content_id)
+
+    for content_type, ids in ids_by_type.items():
+        model = INDEXED_MODELS[content_type]
+        records = {record.id: record for record in session.query(model).filter(model.id.in_(ids))}
+        translations = {}
+        for translation in session.query(ContentTranslation).filter(
+            ContentTranslation.content_type == content_type,
+            ContentTranslation.content_id.in_(ids)
+        ):
+            translations.setdefault(translation.content_id, []).append(translation)
+        documents = {
+            document.content_id: document for document in session.query(SearchDocument).filter(
+                SearchDocument.content_type == content_type,
+                SearchDocument.content_id.in_(ids)
+            )
+        }
+
+        for content_id in ids:
+            record = records.get(content_id)
+            document = documents.get(content_id)
+            # Deleted and deactivated items drop out of the index
+            if record is None or getattr(record, 'is_active', True) is False:
+                if document is not None:
+                    session.delete(document)
+                continue
+            if document is None:
+                document = SearchDocument(content_type=content_type, content_id=content_id)
+                session.add(document)
+            document.title, document.tags, document.body = _document_fields(
+                content_type, record, translations.get(content_id, [])
+            )
+
+        if _is_postgres(session):
+            session.flush()
+            session.execute(
+                update(SearchDocument)
+                .where(SearchDocument.content_type == content_type, SearchDocument.content_id.in_(ids))
+                .values(search_vector=_search_vector())
+                .execution_options(synchronize_session=False)
+            )
+
+
+def search_documents(text, content_type=None, limit=20):
+    """
+    Find resources and courses matching every word of a query, best matches first.
+
+    Each word also matches as a prefix, so "alg" finds "algebra".
+
+    Returns:
+        List of (content_type, content_id, rank) tuples
+    """
+    terms = re.findall(r'\w+', (text or '').lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    query = db.session.query(SearchDocument.content_type, SearchDocument.content_id)
+    if content_type:
+        query = query.filter(SearchDocument.content_type == content_type)
+
+    if _is_postgres(db.session):
+        tsquery = func.to_tsquery(TS_CONFIG, ' & '.join(f"{term}:*" for term in terms))
+        rank = func.ts_rank(SearchDocument.search_vector, tsquery)
+        query = query.filter(SearchDocument.search_vector.op('@@')(tsquery))
+    else:
+        for term in terms:
+            pattern = f"%{term}%"
+            query = query.filter(or_(
+                SearchDocument.title.ilike(pattern),
+                SearchDocument.tags.ilike(pattern),
+                SearchDocument.body.ilike(pattern)
+            ))
+        rank = case((SearchDocument.title.ilike(f"%{terms[0]}%"), 1.0), else_=0.5)
+
+    query = query.add_columns(rank.label('rank')).order_by(rank.desc(), SearchDocument.id)
+    return [(row.content_type, row.content_id, float(row.rank)) for row in query.limit(limit)]
+
+
+def _collect_changes(session, flush_context):
+    """Queue every indexed item touched by this flush"""
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Resource):
+            pending.add(('resource', obj.id))
+        elif isinstance(obj, Course):
+            pending.add(('course', obj.id))
+        elif isinstance(obj, ContentTranslation) and obj.content_type in INDEXED_MODELS:
+            pending.add((obj.content_type, obj.content_id))
+
+
+def _apply_changes(session):
+    """Rebuild queued documents inside the transaction that is about to commit"""
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        refresh_search_documents(pending, session)
+
+
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_search_hooks():
+    """Keep search documents in sync with every session (safe to call more than once)"""
+    if not event.contains(Session, 'after_flush', _collect_changes):
+        event.listen(Session, 'after_flush', _collect_changes)
+        event.listen(Session, 'before_commit', _apply_changes)
+        event.listen(Session, 'after_rollback', _discard_changes)
+
+
+def rebuild_search_index(session=None, chunk_size=500):
+    """Index every resource and course from scratch; returns the number of items processed"""
+    session = session or db.session
+    total = 0
+    for content_type, model in INDEXED_MODELS.items():
+        ids = [row.id for row in session.query(model.id).order_by(model.id)]
+        for start in range(0, len(ids), chunk_size):
+            refresh_search_documents(((content_type, content_id) for content_id in ids[start:start + chunk_size]), session)
+            session.commit()
+        total += len(ids)
+    return total
@@ -0,0 +1,184 @@
+"""
+Database-backed sessions, with signed-cookie sessions for anonymous visitors.
+
+Selected with SESSION_TYPE = 'database'. Signed-in users (and any session too
+large for a cookie) are stored in the user_session table and the cookie only
+carries "sid:<id>". Anonymous visitors keep their few keys (language, OAuth
+state) in a signed cookie when SESSION_ANONYMOUS_COOKIE is on, so they never
+touch the table.
+
+Loading a stored session is one primary-key lookup. A stored session is only
+written back when it changed, or when less than half of its lifetime is left.
+Expired rows are deleted in batches by purge_expired_sessions(), which the
+background job worker runs periodically.
+"""
+import secrets
+from datetime import datetime
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import select, update, insert, delete
+from werkzeug.datastructures import CallbackDict
+from yonca.models import db, UserSession
+
+SID_PREFIX = 'sid:'
+# Larger anonymous sessions go to the database instead of the cookie
+MAX_COOKIE_BYTES = 3800
+
+
+class DatabaseSession(CallbackDict, SessionMixin):
+    """Session dict that remembers where it was loaded from and whether it changed"""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.loaded_user_id = (initial or {}).get('_user_id')
+        self.modified = False
+        self.accessed = False
+
+
+class DatabaseSessionInterface(SessionInterface):
+    """Flask session interface backed by the user_session table"""
+
+    salt = 'yonca-session'
+
+    def __init__(self, anonymous_cookie=True):
+        self.anonymous_cookie = anonymous_cookie
+
+    def _signer(self, app):
+        return URLSafeTimedSerializer(app.secret_key, salt=self.salt, serializer=session_json_serializer)
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        value = request.cookies.get(self.get_cookie_name(app))
+        if not value:
+            return DatabaseSession()
+
+        if value.startswith(SID_PREFIX):
+            sid = value[len(SID_PREFIX):]
+            with db.engine.connect() as conn:
+                row = conn.execute(
+                    select(UserSession.data, UserSession.expires_at)
+                    .where(UserSession.session_id == sid, UserSession.expires_at > datetime.utcnow())
+                ).first()
+            if row is None:
+                return DatabaseSession()
+            try:
+                data = session_json_serializer.loads(row.data)
+            except ValueError:
+                return DatabaseSession()
+            return DatabaseSession(data, sid=sid, expires_at=row.expires_at)
+
+        try:
+            max_age = int(app.permanent_session_lifetime.total_seconds())
+            return DatabaseSession(self._signer(app).loads(value, max_age=max_age))
+        except BadSignature:
+            return DatabaseSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        cookie_options = {
+            'domain': domain,
+            'path': path,
+            'httponly': self.get_cookie_httponly(app),
+            'secure': self.get_cookie_secure(app),
+            'samesite': self.get_cookie_samesite(app),
+        }
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        # Emptied session (e.g. logout): forget it everywhere
+        if not session:
+            if session.modified:
+                if session.sid:
+                    _delete_session(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = datetime.utcnow()
+        lifetime = app.permanent_session_lifetime
+        data = session_json_serializer.dumps(dict(session))
+        user_id = session.get('_user_id')
+        use_database = user_id is not None or not self.anonymous_cookie or len(data) > MAX_COOKIE_BYTES
+
+        if not use_database:
+            if session.sid:
+                # Signed out but kept some keys: move back into the cookie
+                _delete_session(session.sid)
+            elif not self.should_set_cookie(app, session):
+                return
+            value = self._signer(app).dumps(dict(session))
+            response.set_cookie(name, value, expires=self.get_expiration_time(app, session), **cookie_options)
+            return
+
+        sid = session.sid
+        if sid and user_id != session.loaded_user_id:
+            # New identity in this session: issue a fresh id so an old cookie can't ride along
+            _delete_session(sid)
+            sid = None
+
+        half_life_left = session.expires_at is not None and session.expires_at - now > lifetime / 2
+        if sid and not session.modified and half_life_left:
+            return
+
+        expires_at = now + lifetime
+        if sid:
+            _store_session(sid, data, user_id, expires_at)
+        else:
+            sid = secrets.token_urlsafe(32)
+            _store_session(sid, data, user_id, expires_at, new=True)
+        response.set_cookie(name, SID_PREFIX + sid, expires=self.get_expiration_time(app, session), **cookie_options)
+
+
+def _store_session(sid, data, user_id, expires_at, new=False):
+    values = {'data': data, 'user_id': int(user_id) if user_id is not None else None, 'expires_at': expires_at}
+    with db.engine.begin() as conn:
+        if new or conn.execute(update(UserSession).where(UserSession.session_id == sid).values(**values)).rowcount == 0:
+            conn.execute(insert(UserSession).values(session_id=sid, **values))
+
+
+def _delete_session(sid):
+    with db.engine.begin() as conn:
+        conn.execute(delete(UserSession).where(UserSession.session_id == sid))
+
+
+def delete_user_sessions(user_id):
+    """Sign a user out everywhere by dropping all of their stored sessions"""
+    with db.engine.begin() as conn:
+        conn.execute(delete(UserSession).where(UserSession.user_id == user_id))
+
+
+def purge_expired_sessions(batch_size=1000):
+    """Delete expired sessions in batches along the expiry index; returns the number deleted"""
+    total = 0
+    while True:
+        with db.engine.begin() as conn:
+            expired = (
+                select(UserSession.session_id)
+                .where(UserSession.expires_at < datetime.utcnow())
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            deleted = conn.execute(delete(UserSession).where(UserSession.session_id.in_(expired))).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def init_session(app):
+    """Install the session backend chosen by SESSION_TYPE"""
+    if app.config.get('SESSION_TYPE') == 'database':
+        app.session_interface = DatabaseSessionInterface(
+            anonymous_cookie=app.config.get('SESSION_ANONYMOUS_COOKIE', True)
+        )
+    else:
+        from flask_session import Session
+        Session(app)
@@ -9,6 +9,8 @@ import signal
 import platform
 import threading
 from yonca.models import Translation, db
+from yonca.request_timing import external_call, timed_external
+from yonca.metrics import observe_translation_lookup
 from flask import current_app
 
 try:
@@ -116,6 +118,7 @@ class TranslationService:
             restored_text = restored_text.replace(placeholder, original_term)
         return restored_text
 
+    @timed_external('translate')
     def _translate_with_libretranslate(self, text, source_language, target_language):
         """
         Translate text using LibreTranslate API.
@@ -270,6 +273,7 @@ class TranslationService:
             source_language=source_language
         ).first()
 
+        observe_translation_lookup(hit=cached is not None)
         if cached:
             current_app.logger.debug(f"Translation cache hit for: {text[:50]}...")
             return cached.translated_text
@@ -334,8 +338,9 @@ class TranslationService:
                         
                         translate_thread = threading.Thread(target=translate_with_timeout)
                         translate_thread.daemon = True
-                        translate_thread.start()
-                        translate_thread.join(timeout_seconds)
+                        with external_call('translate', 'google_translate'):
+                            translate_thread.start()
+                            translate_thread.join(timeout_seconds)
                         
                         if not translate_thread.is_alive() and not exception[0]:
                             translated_text = result[0]
@@ -0,0 +1,95 @@
+"""
+Lightweight signed-in user for Flask-Login, cached per process.
+
+load_user() used to fetch the whole User row, OAuth tokens included, on every
+request. It now returns a UserPrincipal built from a short-lived cache of
+(id, username, roles, preferred language). Anything else - relationships,
+tokens, password - loads the full User row on first access and is delegated
+to it, so handlers that need the model still get it transparently.
+
+Cached entries are dropped whenever a flush changes or deletes the user
+(role and token changes included). Other worker processes pick up the change
+within USER_PRINCIPAL_TTL seconds.
+"""
+import threading
+import time
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from yonca.models import db, User
+
+PRINCIPAL_FIELDS = ('id', 'username', 'is_admin', 'is_teacher', 'preferred_language')
+
+
+class UserPrincipal(UserMixin):
+    """Signed-in user with the fields most requests need; other attributes come from the full User row"""
+
+    def __init__(self, **fields):
+        for name in PRINCIPAL_FIELDS:
+            object.__setattr__(self, name, fields.get(name))
+        object.__setattr__(self, '_model', None)
+
+    @property
+    def model(self):
+        """The full User row, loaded on first use"""
+        if self._model is None:
+            object.__setattr__(self, '_model', db.session.get(User, self.id))
+        return self._model
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __setattr__(self, name, value):
+        if name in PRINCIPAL_FIELDS:
+            object.__setattr__(self, name, value)
+        setattr(self.model, name, value)
+
+    def __repr__(self):
+        return f'<UserPrincipal {self.username}>'
+
+
+class UserPrincipalCache:
+    """Per-process cache of principal fields keyed by user id"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = {}  # user id -> (fields, loaded_at)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the cache from the Flask app config and watch for user changes"""
+        self.ttl = app.config.get('USER_PRINCIPAL_TTL', self.ttl)
+        if not event.contains(Session, 'after_flush', _invalidate_changed_users):
+            event.listen(Session, 'after_flush', _invalidate_changed_users)
+
+    def load(self, user_id):
+        """Return a UserPrincipal for a user id, or None if the user does not exist"""
+        user_id = int(user_id)
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return UserPrincipal(**entry[0])
+
+        row = db.session.query(*(getattr(User, name) for name in PRINCIPAL_FIELDS)).filter(User.id == user_id).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+        fields = dict(zip(PRINCIPAL_FIELDS, row))
+        with self._lock:
+            self._entries[user_id] = (fields, time.monotonic())
+        return UserPrincipal(**fields)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def _invalidate_changed_users(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            user_principal_cache.invalidate(obj.id)
+
+
+# Global cache instance
+user_principal_cache = UserPrincipalCache()